@@ -0,0 +1,401 @@
+# import modules to work with json, time and threads and make online requests
+import json, time, threading, requests
+from concurrent.futures import ThreadPoolExecutor
+
+
+# build the abi entry of a function from (name, type) inputs and outputs
+def make_function(name, inputs, outputs, state_mutability="view"):
+    return {
+        "inputs": [{"internalType": t, "name": n, "type": t} for n, t in inputs],
+        "name": name,
+        "outputs": [{"internalType": t, "name": n, "type": t} for n, t in outputs],
+        "stateMutability": state_mutability,
+        "type": "function",
+    }
+
+
+# build the abi entry of an event from (name, type, indexed) inputs
+def make_event(name, inputs):
+    return {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": indexed, "internalType": t, "name": n, "type": t}
+            for n, t, indexed in inputs
+        ],
+        "name": name,
+        "type": "event",
+    }
+
+
+# the factory, pair and router of uniswap v2 and its forks e.g. pancakeswap, biswap, sushiswap, mdex and apeswap
+# share these functions so their abis are bundled instead of being downloaded for every dex
+UNISWAP_V2_FACTORY_ABI = [
+    make_event(
+        "PairCreated",
+        [
+            ("token0", "address", True),
+            ("token1", "address", True),
+            ("pair", "address", False),
+            ("", "uint256", False),
+        ],
+    ),
+    make_function("allPairs", [("", "uint256")], [("pair", "address")]),
+    make_function("allPairsLength", [], [("", "uint256")]),
+    make_function(
+        "createPair",
+        [("tokenA", "address"), ("tokenB", "address")],
+        [("pair", "address")],
+        "nonpayable",
+    ),
+    make_function("feeTo", [], [("", "address")]),
+    make_function("feeToSetter", [], [("", "address")]),
+    make_function(
+        "getPair", [("tokenA", "address"), ("tokenB", "address")], [("pair", "address")]
+    ),
+    make_function("setFeeTo", [("", "address")], [], "nonpayable"),
+    make_function("setFeeToSetter", [("", "address")], [], "nonpayable"),
+]
+
+UNISWAP_V2_PAIR_ABI = [
+    make_event(
+        "Approval",
+        [
+            ("owner", "address", True),
+            ("spender", "address", True),
+            ("value", "uint256", False),
+        ],
+    ),
+    make_event(
+        "Burn",
+        [
+            ("sender", "address", True),
+            ("amount0", "uint256", False),
+            ("amount1", "uint256", False),
+            ("to", "address", True),
+        ],
+    ),
+    make_event(
+        "Mint",
+        [
+            ("sender", "address", True),
+            ("amount0", "uint256", False),
+            ("amount1", "uint256", False),
+        ],
+    ),
+    make_event(
+        "Swap",
+        [
+            ("sender", "address", True),
+            ("amount0In", "uint256", False),
+            ("amount1In", "uint256", False),
+            ("amount0Out", "uint256", False),
+            ("amount1Out", "uint256", False),
+            ("to", "address", True),
+        ],
+    ),
+    make_event(
+        "Sync", [("reserve0", "uint112", False), ("reserve1", "uint112", False)]
+    ),
+    make_event(
+        "Transfer",
+        [
+            ("from", "address", True),
+            ("to", "address", True),
+            ("value", "uint256", False),
+        ],
+    ),
+    make_function("DOMAIN_SEPARATOR", [], [("", "bytes32")]),
+    make_function("MINIMUM_LIQUIDITY", [], [("", "uint256")]),
+    make_function("PERMIT_TYPEHASH", [], [("", "bytes32")]),
+    make_function(
+        "allowance", [("owner", "address"), ("spender", "address")], [("", "uint256")]
+    ),
+    make_function(
+        "approve",
+        [("spender", "address"), ("value", "uint256")],
+        [("", "bool")],
+        "nonpayable",
+    ),
+    make_function("balanceOf", [("owner", "address")], [("", "uint256")]),
+    make_function(
+        "burn",
+        [("to", "address")],
+        [("amount0", "uint256"), ("amount1", "uint256")],
+        "nonpayable",
+    ),
+    make_function("decimals", [], [("", "uint8")]),
+    make_function("factory", [], [("", "address")]),
+    make_function(
+        "getReserves",
+        [],
+        [
+            ("_reserve0", "uint112"),
+            ("_reserve1", "uint112"),
+            ("_blockTimestampLast", "uint32"),
+        ],
+    ),
+    make_function("initialize", [("", "address"), ("", "address")], [], "nonpayable"),
+    make_function("kLast", [], [("", "uint256")]),
+    make_function(
+        "mint", [("to", "address")], [("liquidity", "uint256")], "nonpayable"
+    ),
+    make_function("name", [], [("", "string")]),
+    make_function("nonces", [("owner", "address")], [("", "uint256")]),
+    make_function(
+        "permit",
+        [
+            ("owner", "address"),
+            ("spender", "address"),
+            ("value", "uint256"),
+            ("deadline", "uint256"),
+            ("v", "uint8"),
+            ("r", "bytes32"),
+            ("s", "bytes32"),
+        ],
+        [],
+        "nonpayable",
+    ),
+    make_function("price0CumulativeLast", [], [("", "uint256")]),
+    make_function("price1CumulativeLast", [], [("", "uint256")]),
+    make_function("skim", [("to", "address")], [], "nonpayable"),
+    make_function(
+        "swap",
+        [
+            ("amount0Out", "uint256"),
+            ("amount1Out", "uint256"),
+            ("to", "address"),
+            ("data", "bytes"),
+        ],
+        [],
+        "nonpayable",
+    ),
+    make_function("symbol", [], [("", "string")]),
+    make_function("sync", [], [], "nonpayable"),
+    make_function("token0", [], [("", "address")]),
+    make_function("token1", [], [("", "address")]),
+    make_function("totalSupply", [], [("", "uint256")]),
+    make_function(
+        "transfer",
+        [("to", "address"), ("value", "uint256")],
+        [("", "bool")],
+        "nonpayable",
+    ),
+    make_function(
+        "transferFrom",
+        [("from", "address"), ("to", "address"), ("value", "uint256")],
+        [("", "bool")],
+        "nonpayable",
+    ),
+]
+
+# the quote and swap functions of the router, liquidity functions aren't used by the scanners or traders
+UNISWAP_V2_ROUTER_ABI = [
+    make_function("WETH", [], [("", "address")]),
+    make_function("factory", [], [("", "address")]),
+    make_function(
+        "getAmountIn",
+        [("amountOut", "uint256"), ("reserveIn", "uint256"), ("reserveOut", "uint256")],
+        [("amountIn", "uint256")],
+        "pure",
+    ),
+    make_function(
+        "getAmountOut",
+        [("amountIn", "uint256"), ("reserveIn", "uint256"), ("reserveOut", "uint256")],
+        [("amountOut", "uint256")],
+        "pure",
+    ),
+    make_function(
+        "getAmountsIn",
+        [("amountOut", "uint256"), ("path", "address[]")],
+        [("amounts", "uint256[]")],
+    ),
+    make_function(
+        "getAmountsOut",
+        [("amountIn", "uint256"), ("path", "address[]")],
+        [("amounts", "uint256[]")],
+    ),
+    make_function(
+        "quote",
+        [("amountA", "uint256"), ("reserveA", "uint256"), ("reserveB", "uint256")],
+        [("amountB", "uint256")],
+        "pure",
+    ),
+    make_function(
+        "swapETHForExactTokens",
+        [
+            ("amountOut", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "payable",
+    ),
+    make_function(
+        "swapExactETHForTokens",
+        [
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "payable",
+    ),
+    make_function(
+        "swapExactETHForTokensSupportingFeeOnTransferTokens",
+        [
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [],
+        "payable",
+    ),
+    make_function(
+        "swapExactTokensForETH",
+        [
+            ("amountIn", "uint256"),
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "nonpayable",
+    ),
+    make_function(
+        "swapExactTokensForETHSupportingFeeOnTransferTokens",
+        [
+            ("amountIn", "uint256"),
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [],
+        "nonpayable",
+    ),
+    make_function(
+        "swapExactTokensForTokens",
+        [
+            ("amountIn", "uint256"),
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "nonpayable",
+    ),
+    make_function(
+        "swapExactTokensForTokensSupportingFeeOnTransferTokens",
+        [
+            ("amountIn", "uint256"),
+            ("amountOutMin", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [],
+        "nonpayable",
+    ),
+    make_function(
+        "swapTokensForExactETH",
+        [
+            ("amountOut", "uint256"),
+            ("amountInMax", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "nonpayable",
+    ),
+    make_function(
+        "swapTokensForExactTokens",
+        [
+            ("amountOut", "uint256"),
+            ("amountInMax", "uint256"),
+            ("path", "address[]"),
+            ("to", "address"),
+            ("deadline", "uint256"),
+        ],
+        [("amounts", "uint256[]")],
+        "nonpayable",
+    ),
+]
+
+# bundled abis by the ending of the abi file names e.g. biswap_factory, biswap_factory_pool, biswap_router
+BUNDLED_ABIS = {
+    "_factory_pool": UNISWAP_V2_PAIR_ABI,
+    "_factory": UNISWAP_V2_FACTORY_ABI,
+    "_router": UNISWAP_V2_ROUTER_ABI,
+}
+
+
+# get the bundled abi of an abi file name, None when the contract isn't a standard uniswap v2 contract
+def get_bundled_abi(file_name):
+    for ending, abi in BUNDLED_ABIS.items():
+        if str(file_name).endswith(ending):
+            return abi
+    return None
+
+
+# token bucket that allows rate requests per second on average and bursts of up to capacity requests
+def make_bucket(rate, capacity):
+    return {
+        "rate": rate,
+        "capacity": capacity,
+        "tokens": capacity,
+        "updated": time.monotonic(),
+        "lock": threading.Lock(),
+    }
+
+
+# wait until the bucket has a token and take it, the bucket is shared by every fetching thread
+def take_token(bucket):
+    while True:
+        with bucket["lock"]:
+            now = time.monotonic()
+            bucket["tokens"] = min(
+                bucket["capacity"],
+                bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"],
+            )
+            bucket["updated"] = now
+            if bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                return
+            wait = (1 - bucket["tokens"]) / bucket["rate"]
+        time.sleep(wait)
+
+
+# download the abi of a contract from the explorer api e.g. bscscan
+def download_abi(api_url, contract_address, bucket):
+    take_token(bucket)
+    r = requests.get(
+        url=api_url,
+        params={"module": "contract", "action": "getabi", "address": contract_address},
+    )
+    response = r.json()
+    # parse json string and load it to a dictionary variable
+    return json.loads(response["result"])
+
+
+# download the abis of many contracts at once without going over the rate limit of the explorer api
+# targets is a dictionary of abi file name -> contract address and settings come from the abi_fetcher entry
+# of the config data, abis that can't be downloaded are left out and reported
+def fetch_abis(api_url, targets, settings):
+    bucket = make_bucket(settings["rate"], settings["burst"])
+
+    def fetch(file_name):
+        try:
+            return file_name, download_abi(api_url, targets[file_name], bucket)
+        except Exception as e:
+            print(f"Could not get the abi of {file_name}: {e}")
+            return file_name, None
+
+    with ThreadPoolExecutor(settings["workers"]) as executor:
+        results = executor.map(fetch, list(targets))
+        return {file_name: abi for file_name, abi in results if abi != None}
@@ -0,0 +1,854 @@
+# import asyncio to run many calls at once and time to time the scan cycles
+import asyncio, time
+
+# import tqdm for a progress bar
+from tqdm import tqdm
+
+# import web3 and its async eth module to interact with EVM without waiting on each call
+from web3 import Web3
+from web3.eth import AsyncEth
+
+# import aiohttp to give the async provider a session on the running event loop
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+# import the endpoint pool that spreads calls over the rpc endpoints of a chain and retries transient failures
+from rpc import RetriesExhausted
+from providers import AsyncPoolProvider
+
+# import the decoder used for batched calls so async results look the same as sync ones
+from multicall import (
+    decode_call_result,
+    get_call_key,
+    is_cacheable,
+    prune_call_cache,
+    CALL_CACHE_LOCK,
+)
+
+# import the metrics that contract calls and scan cycles are recorded in
+from metrics import record_contract_calls, record_dropped_calls, record_cycle
+
+# import the pair registry to keep factory pairs on disk between runs
+from registry import (
+    open_registry,
+    get_stored_length,
+    store_pairs,
+    load_pairs,
+    has_token,
+)
+
+# import the cross dex pair index to match pools without a getPair call per pool
+from pair_index import build_pair_index, match_secondary_pools
+
+# import the token cache so decimals and symbols are read once per token
+from tokens import (
+    ERC20_ABI,
+    ERC20_BYTES32_ABI,
+    DEFAULT_DECIMALS,
+    open_token_cache,
+    load_tokens,
+    store_tokens,
+    read_token,
+)
+
+# import the append only sinks that scan hits are written to
+from sinks import open_sink, write_row, close_sink
+
+# import the history store that keeps every step of scan_by_name on disk
+from history import open_history, record_step, flush_history, close_history
+
+# import the off chain quote engine to price swaps from pool reserves
+from quotes import quote_pools, solve_pools
+
+# import the shared parts of the synchronous scanners so both paths give the same results
+from components import (
+    load_config,
+    get_web3,
+    get_rpc_pool,
+    getContract,
+    load_abi,
+    get_fee,
+    round_trip_fee_perc,
+    prep_export_dict,
+    arb_value,
+    price_specific_pair,
+    recommend_trade,
+    get_arb_row,
+    get_blind_trade,
+    print_blind_trade,
+    play_alert,
+    print_complete,
+    ARB_COL_LIST,
+    BLIND_COL_LIST,
+    start_registry_walk,
+    finish_registry_walk,
+    CALL_CACHE,
+    TOKEN_CACHE,
+)
+
+
+# connect to a blockchain with the async http provider
+# web3 keeps one aiohttp session per endpoint and thread, a session from an earlier asyncio.run is bound
+# to a closed event loop so every scan gives the provider a new session and closes it when it is done
+async def get_async_web3(blockchain, max_in_flight):
+    config = load_config()
+    pool = get_rpc_pool(blockchain)
+    session = ClientSession(
+        raise_for_status=True, connector=TCPConnector(limit=max_in_flight)
+    )
+    # every endpoint gets its own provider on the same session
+    providers = {}
+    for endpoint in pool["endpoints"]:
+        provider = Web3.AsyncHTTPProvider(
+            endpoint["url"],
+            request_kwargs={
+                "timeout": ClientTimeout(config[blockchain]["rpc"]["timeout"])
+            },
+        )
+        await provider.cache_async_session(session)
+        providers[endpoint["url"]] = provider
+    # requests go through the same endpoint pool as the sync client
+    async_w3 = Web3(
+        AsyncPoolProvider(pool, providers),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
+    return async_w3, session
+
+
+# async version of pin_block
+async def async_pin_block(async_w3):
+    block = await async_w3.eth.block_number
+    prune_call_cache(CALL_CACHE, block)
+    return block
+
+
+# async version of wait_for_block, wait until the chain has moved on from the given block
+async def async_wait_for_block(async_w3, block, poll_interval):
+    while await async_w3.eth.block_number <= block:
+        await asyncio.sleep(poll_interval)
+
+
+# send one contract view call e.g. contract.functions.token0() through the async provider
+# the semaphore caps how many requests are in flight and each call gets a (success, value) result
+# calls pinned to a block number share the call cache of the synchronous scanners
+async def async_call(async_w3, semaphore, call, block_identifier="latest"):
+    cacheable = is_cacheable(CALL_CACHE, block_identifier)
+    if cacheable:
+        key = get_call_key(block_identifier, call)
+        with CALL_CACHE_LOCK:
+            cached = CALL_CACHE.get(key)
+        if cached != None:
+            record_contract_calls([key[2]], cached=True)
+            return cached
+
+    record_contract_calls([call._encode_transaction_data()])
+    async with semaphore:
+        try:
+            return_data = await async_w3.eth.call(
+                {"to": call.address, "data": call._encode_transaction_data()},
+                block_identifier,
+            )
+        except RetriesExhausted:
+            # the provider kept failing, the call fails like in run_batch and is recorded as dropped
+            record_dropped_calls([call._encode_transaction_data()])
+            return (False, None)
+        except Exception:
+            return (False, None)
+    result = decode_call_result(async_w3, call, True, return_data)
+    # failed calls are left out of the cache so they are tried again
+    if cacheable and result[0] == True:
+        with CALL_CACHE_LOCK:
+            CALL_CACHE[key] = result
+    return result
+
+
+# run worker_fn over all items with a fixed number of workers
+# every result is handed to on_result as soon as it is ready so pools are evaluated while others are still loading
+async def run_workers(items, worker_fn, on_result, workers, description):
+    item_iter = iter(items)
+    progress = tqdm(total=len(items), desc=description, leave=False)
+
+    async def worker():
+        for item in item_iter:
+            result = await worker_fn(item)
+            progress.update(1)
+            if result != None:
+                on_result(result)
+
+    await asyncio.gather(*[worker() for i in range(workers)])
+    progress.close()
+
+
+# get the pool address, token0 and token1 of one factory index
+async def async_get_pool_by_index(async_w3, semaphore, factory_contract, pool_class, i):
+    success, pool_address = await async_call(
+        async_w3, semaphore, factory_contract.functions.allPairs(i)
+    )
+    if success == False:
+        return None
+
+    pool_contract = pool_class(address=pool_address)
+    (token0_success, token0), (token1_success, token1) = await asyncio.gather(
+        async_call(async_w3, semaphore, pool_contract.functions.token0()),
+        async_call(async_w3, semaphore, pool_contract.functions.token1()),
+    )
+    if token0_success == False or token1_success == False:
+        return None
+
+    return {"id": i, "pool_address": pool_address, "token0": token0, "token1": token1}
+
+
+# read the decimals and symbol of one token, returns None when its decimals can't be read
+async def async_fetch_token(async_w3, semaphore, token_class, bytes32_class, address):
+    token_contract = token_class(address=address)
+    decimals_result, symbol_result = await asyncio.gather(
+        async_call(async_w3, semaphore, token_contract.functions.decimals()),
+        async_call(async_w3, semaphore, token_contract.functions.symbol()),
+    )
+    # ask again for a symbol that didn't decode as a string
+    bytes32_symbol_result = None
+    if decimals_result[0] == True and symbol_result[0] == False:
+        bytes32_symbol_result = await async_call(
+            async_w3, semaphore, bytes32_class(address=address).functions.symbol()
+        )
+    return read_token(decimals_result, symbol_result, bytes32_symbol_result)
+
+
+# async version of get_token_metadata, tokens share the caches of the synchronous scanners
+async def async_get_token_metadata(async_w3, semaphore, blockchain, addresses):
+    tokens = {}
+    missing = []
+    for address in dict.fromkeys(addresses):
+        if (blockchain, address) in TOKEN_CACHE:
+            tokens[address] = TOKEN_CACHE[(blockchain, address)]
+        else:
+            missing.append(address)
+
+    if len(missing) > 0:
+        conn = open_token_cache(load_config()[blockchain]["token_cache"])
+        found = load_tokens(conn, blockchain, missing)
+        unknown = [address for address in missing if address not in found]
+        if len(unknown) > 0:
+            w3 = Web3()
+            token_class = w3.eth.contract(abi=ERC20_ABI)
+            bytes32_class = w3.eth.contract(abi=ERC20_BYTES32_ABI)
+            fetched = await asyncio.gather(
+                *[
+                    async_fetch_token(
+                        async_w3, semaphore, token_class, bytes32_class, address
+                    )
+                    for address in unknown
+                ]
+            )
+            fetched = {
+                address: token
+                for address, token in zip(unknown, fetched)
+                if token != None
+            }
+            store_tokens(conn, blockchain, fetched)
+            found.update(fetched)
+        conn.close()
+        for address, token in found.items():
+            TOKEN_CACHE[(blockchain, address)] = token
+            tokens[address] = token
+
+    # tokens that can't be read are not cached so they are tried again next time
+    for address in addresses:
+        if address not in tokens:
+            tokens[address] = {"decimals": DEFAULT_DECIMALS, "symbol": None}
+    return tokens
+
+
+# async version of get_registered_pools - new pairs are read concurrently and then stored
+async def async_get_registered_pools(
+    async_w3,
+    semaphore,
+    workers,
+    blockchain,
+    factory_contract,
+    pool_class,
+    selected_ids=None,
+    token=None,
+):
+    config = load_config()
+    conn = open_registry(config[blockchain]["pair_registry"])
+    factory_address = factory_contract.address
+    stored_length = get_stored_length(conn, blockchain, factory_address)
+
+    if selected_ids == None:
+        # the confirmed length and the discovery of new pairs are the same as in the sync path, they take a few
+        # calls on the shared sync client before the workers start, the pairs left to fetch by index are read
+        # by the workers
+        w3 = get_web3(blockchain)
+        walk = start_registry_walk(
+            conn,
+            w3,
+            blockchain,
+            getContract(blockchain, factory_address, factory_contract.abi),
+        )
+        new_ids = walk["new_range"]
+    else:
+        new_ids = [i for i in selected_ids if i >= stored_length]
+
+    new_pools = []
+
+    async def fetch(i):
+        return await async_get_pool_by_index(
+            async_w3, semaphore, factory_contract, pool_class, i
+        )
+
+    await run_workers(new_ids, fetch, new_pools.append, workers, "Registering: ")
+    stored_length = store_pairs(conn, blockchain, factory_address, new_pools)
+    new_pools = [p for p in new_pools if has_token(p, token)]
+
+    if selected_ids == None:
+        # pools after a failed read can't be stored yet but are still scanned this time
+        unstored_pools = sorted(
+            [p for p in new_pools if p["id"] >= stored_length], key=lambda p: p["id"]
+        )
+        unstored_pools += finish_registry_walk(
+            conn, w3, blockchain, factory_address, walk, token
+        )
+        pools = load_pairs(conn, blockchain, factory_address, token=token)
+        pools += unstored_pools
+    else:
+        by_id = {
+            p["id"]: p
+            for p in load_pairs(conn, blockchain, factory_address, selected_ids, token)
+            + new_pools
+        }
+        pools = [by_id[i] for i in selected_ids if i in by_id]
+
+    conn.close()
+    return pools
+
+
+# async version of get_pair_index - the pair registry of every given dex is brought up to date concurrently
+async def async_get_pair_index(
+    async_w3, semaphore, workers, blockchain, dex_names, token=None
+):
+    config = load_config()
+    # a web3 instance without a provider is enough to build contract calls
+    w3 = Web3()
+    pools_by_dex = {}
+    for dex_name in dex_names:
+        factory_contract = w3.eth.contract(
+            abi=load_abi(dex_name + "_factory"),
+            address=w3.toChecksumAddress(
+                config[blockchain][dex_name][dex_name + "_factory"]
+            ),
+        )
+        pool_class = w3.eth.contract(abi=load_abi(dex_name + "_factory_pool"))
+        pools_by_dex[dex_name] = await async_get_registered_pools(
+            async_w3,
+            semaphore,
+            workers,
+            blockchain,
+            factory_contract,
+            pool_class,
+            token=token,
+        )
+    return build_pair_index(pools_by_dex)
+
+
+# get the reserves of the primary and secondary pool, returns None when either can't be read
+async def async_get_pool_reserves(
+    async_w3, semaphore, pool_class, sdex_pool_class, pool, block_identifier="latest"
+):
+    (success, reserves), (s_success, s_reserves) = await asyncio.gather(
+        async_call(
+            async_w3,
+            semaphore,
+            pool_class(address=pool["pool_address"]).functions.getReserves(),
+            block_identifier,
+        ),
+        async_call(
+            async_w3,
+            semaphore,
+            sdex_pool_class(address=pool["s_pool_address"]).functions.getReserves(),
+            block_identifier,
+        ),
+    )
+    if success == False or s_success == False:
+        return None
+    return dict(pool, reserves=reserves, s_reserves=s_reserves)
+
+
+# load the factory and pool contracts of a dex pair the same way the synchronous scanners do
+def get_scan_contracts(w3, config, blockchain, factory_name, sdex_factory_name):
+    # load factory abi json
+    factory_abi = load_abi(str(factory_name))
+
+    # load pool sample abi json
+    pool_abi = load_abi(str(factory_name) + "_pool")
+
+    # load factory abi json
+    sdex_factory_abi = load_abi(str(sdex_factory_name))
+
+    # load pool sample abi json
+    sdex_pool_abi = load_abi(str(sdex_factory_name) + "_pool")
+
+    factory_contract = w3.eth.contract(
+        abi=factory_abi,
+        address=w3.toChecksumAddress(
+            config[blockchain][factory_name.split("_")[0]][factory_name]
+        ),
+    )
+    sdex_contract = w3.eth.contract(
+        abi=sdex_factory_abi,
+        address=w3.toChecksumAddress(
+            config[blockchain][sdex_factory_name.split("_")[0]][sdex_factory_name]
+        ),
+    )
+    pool_class = w3.eth.contract(abi=pool_abi)
+    sdex_pool_class = w3.eth.contract(abi=sdex_pool_abi)
+
+    return factory_contract, sdex_contract, pool_class, sdex_pool_class
+
+
+# async version of scan_by_ID
+# max_in_flight limits the number of open requests, it defaults to the async setting in the config data
+# the scan runs until a trade is found or for max_cycles cycles when it is set, a cycle starts on every new block
+# there is no reserve tracker, every cycle reads the reserves of every pool again with the calls spread over
+# max_in_flight requests, scan_by_ID follows Sync events instead and only quotes the pools that changed
+# returns the time each cycle took, not counting the wait for a new block
+async def async_scan_by_ID(
+    primary_dex,
+    secondary_dex,
+    blockchain,
+    selected_ids,
+    save_name,
+    base_token,
+    max_in_flight=None,
+    max_cycles=None,
+):
+    print("")
+    sink = open_sink(save_name, ARB_COL_LIST, load_config()[blockchain]["sink"])
+
+    config = load_config()
+    if max_in_flight == None:
+        max_in_flight = config[blockchain]["async"]["max_in_flight"]
+    semaphore = asyncio.Semaphore(max_in_flight)
+    async_w3, session = await get_async_web3(blockchain, max_in_flight)
+    # a web3 instance without a provider is enough to build contract calls
+    w3 = Web3()
+
+    factory_contract, sdex_contract, pool_class, sdex_pool_class = get_scan_contracts(
+        w3,
+        config,
+        blockchain,
+        str(primary_dex) + "_factory",
+        str(secondary_dex) + "_factory",
+    )
+
+    # get the swap fee of both dexes and the gas allowance of the chain
+    fee = get_fee(config, blockchain, primary_dex)
+    s_fee = get_fee(config, blockchain, secondary_dex)
+    gas_allowance = config[blockchain]["gas_allowance"]
+    base_token_in = Web3.toWei(1, "ether")
+
+    # pool addresses and tokens never change so get them once from the pair registry
+    pools = await async_get_registered_pools(
+        async_w3,
+        semaphore,
+        max_in_flight,
+        blockchain,
+        factory_contract,
+        pool_class,
+        selected_ids,
+        base_token,
+    )
+
+    # see if the same pools exist in the secondary dex
+    pair_index = await async_get_pair_index(
+        async_w3, semaphore, max_in_flight, blockchain, [secondary_dex], base_token
+    )
+    matched_pools = match_secondary_pools(pair_index, pools, secondary_dex)
+
+    count = 0
+    scan_state = {"SEARCHING": True, "block": "latest", "candidates": 0, "hits": 0}
+
+    # evaluate a pool as soon as its reserves arrive
+    def evaluate(pool):
+        amount_outs, s_amount_outs, end_trades, valid = quote_pools(
+            [pool], base_token, base_token_in, fee, s_fee
+        )
+        optimal_ins, profits, buy_on_primary = solve_pools(
+            [pool], base_token, fee, s_fee
+        )
+        # skip pools the router would reject
+        if valid[0] == False:
+            return
+        scan_state["candidates"] += 1
+
+        return_list = get_arb_row(
+            pool=pool,
+            dex_name=primary_dex,
+            s_dex_name=secondary_dex,
+            quote=(amount_outs[0], s_amount_outs[0], end_trades[0]),
+            base_token_in=base_token_in,
+            optimal=(optimal_ins[0], profits[0], buy_on_primary[0]),
+            gas_allowance=gas_allowance,
+        )
+
+        if return_list != None:
+            write_row(sink, return_list)
+            scan_state["hits"] += 1
+            play_alert(20)
+            scan_state["SEARCHING"] = False
+
+    async def fetch(pool):
+        return await async_get_pool_reserves(
+            async_w3, semaphore, pool_class, sdex_pool_class, pool, scan_state["block"]
+        )
+
+    poll_interval = config[blockchain]["reserve_tracker"]["poll_interval"]
+    cycle_times = []
+    while scan_state["SEARCHING"] == True and (
+        max_cycles == None or count < max_cycles
+    ):
+        if count > 0:
+            await async_wait_for_block(async_w3, scan_state["block"], poll_interval)
+
+        # every pool of a cycle is read at the same block
+        cycle_start = time.time()
+        scan_state["candidates"] = 0
+        scan_state["hits"] = 0
+        scan_state["block"] = await async_pin_block(async_w3)
+
+        # reserves change so refresh them every cycle
+        await run_workers(matched_pools, fetch, evaluate, max_in_flight, "Evaluating: ")
+
+        count += 1
+        cycle_times.append(time.time() - cycle_start)
+        record_cycle(
+            "scan_by_ID",
+            len(matched_pools),
+            scan_state["candidates"],
+            scan_state["hits"],
+            cycle_times[-1],
+        )
+
+        print(f"Cycle {count} complete")
+
+    close_sink(sink)
+    await session.close()
+    print_complete()
+    return cycle_times
+
+
+# async version of blind_scan
+# max_in_flight limits the number of open requests, it defaults to the async setting in the config data
+# the sweep isn't checkpointed and can't run in scheduler rounds, an interrupted scan starts again from the first
+# pool and every pool is read on every call, blind_scan has both
+async def async_blind_scan(
+    primary_dex,
+    secondary_dex,
+    blockchain,
+    save_name,
+    base_token,
+    small_cap_threshold,
+    exchange,
+    max_in_flight=None,
+    sink=None,
+):
+    print("")
+    scan_start = time.time()
+    # a sink can be passed in to keep the hits of many scans in one file
+    own_sink = sink == None
+    if own_sink:
+        sink = open_sink(save_name, BLIND_COL_LIST, load_config()[blockchain]["sink"])
+
+    config = load_config()
+    if max_in_flight == None:
+        max_in_flight = config[blockchain]["async"]["max_in_flight"]
+    semaphore = asyncio.Semaphore(max_in_flight)
+    async_w3, session = await get_async_web3(blockchain, max_in_flight)
+    # a web3 instance without a provider is enough to build contract calls
+    w3 = Web3()
+
+    factory_contract, sdex_contract, pool_class, sdex_pool_class = get_scan_contracts(
+        w3,
+        config,
+        blockchain,
+        str(primary_dex) + "_factory",
+        str(secondary_dex) + "_factory",
+    )
+
+    # get the swap fee of both dexes
+    fee = get_fee(config, blockchain, primary_dex)
+    s_fee = get_fee(config, blockchain, secondary_dex)
+
+    # get the pools that hold the base token from the token index of the pair registry
+    # the other pools are never loaded so no calls are made for them
+    pools = await async_get_registered_pools(
+        async_w3,
+        semaphore,
+        max_in_flight,
+        blockchain,
+        factory_contract,
+        pool_class,
+        token=base_token,
+    )
+
+    # see if the same pool exists in both DEXes
+    pair_index = await async_get_pair_index(
+        async_w3, semaphore, max_in_flight, blockchain, [secondary_dex], base_token
+    )
+    pools = match_secondary_pools(pair_index, pools, secondary_dex)
+
+    # quote one whole base token using its decimals from the token cache
+    base_decimals = (
+        await async_get_token_metadata(async_w3, semaphore, blockchain, [base_token])
+    )[base_token]["decimals"]
+    base_token_in = 10**base_decimals
+
+    trades = []
+    counts = {"candidates": 0}
+
+    # evaluate a pool as soon as its reserves arrive
+    def evaluate(pool):
+        amount_outs, s_amount_outs, end_trades, valid = quote_pools(
+            [pool], base_token, base_token_in, fee, s_fee
+        )
+        optimal_ins, profits, buy_on_primary = solve_pools(
+            [pool], base_token, fee, s_fee
+        )
+        # skip pools the router would reject
+        if valid[0] == False:
+            return
+        counts["candidates"] += 1
+
+        trade = get_blind_trade(
+            pool=pool,
+            base_token=base_token,
+            small_cap_threshold=small_cap_threshold,
+            primary_dex=primary_dex,
+            secondary_dex=secondary_dex,
+            quote=(amount_outs[0], s_amount_outs[0], end_trades[0]),
+            base_token_in=base_token_in,
+            optimal=(optimal_ins[0], profits[0], buy_on_primary[0]),
+            base_decimals=base_decimals,
+        )
+
+        if trade != None:
+            print_blind_trade(trade, base_token, small_cap_threshold, exchange)
+            trades.append(trade["return_list"])
+            write_row(sink, trade["return_list"])
+
+    # get the reserves of both pools, every pool of the scan is read at the same block
+    block = await async_pin_block(async_w3)
+
+    async def fetch(pool):
+        return await async_get_pool_reserves(
+            async_w3, semaphore, pool_class, sdex_pool_class, pool, block
+        )
+
+    await run_workers(pools, fetch, evaluate, max_in_flight, "Evaluating: ")
+
+    if own_sink:
+        close_sink(sink)
+
+    await session.close()
+    record_cycle(
+        "blind_scan",
+        len(pools),
+        counts["candidates"],
+        len(trades),
+        time.time() - scan_start,
+    )
+
+    # rank the trades by the profit at their best size, the last column of the return list
+    trades = sorted(trades, key=lambda row: row[-1], reverse=True)
+
+    print_complete()
+    return trades
+
+
+# async version of get_specific_pair
+async def async_get_specific_pair(
+    async_w3,
+    semaphore,
+    pool_class,
+    config,
+    xch_name,
+    blockchain,
+    address,
+    pair_name,
+    base_token,
+    block_identifier="latest",
+):
+    pair_contract = pool_class(address=Web3.toChecksumAddress(address))
+    (
+        (reserve_success, reserve),
+        (token0_success, token0_address),
+        (token1_success, token1_address),
+    ) = await asyncio.gather(
+        async_call(
+            async_w3, semaphore, pair_contract.functions.getReserves(), block_identifier
+        ),
+        async_call(
+            async_w3, semaphore, pair_contract.functions.token0(), block_identifier
+        ),
+        async_call(
+            async_w3, semaphore, pair_contract.functions.token1(), block_identifier
+        ),
+    )
+    if reserve_success == False or token0_success == False or token1_success == False:
+        raise ValueError(f"Could not read {pair_name} on {xch_name}")
+
+    tokens = await async_get_token_metadata(
+        async_w3, semaphore, blockchain, [token0_address, token1_address]
+    )
+
+    return price_specific_pair(
+        config=config,
+        blockchain=blockchain,
+        xch_name=xch_name,
+        pair_name=pair_name,
+        base_token=base_token,
+        reserve=reserve,
+        token0_address=token0_address,
+        token1_address=token1_address,
+        decimals=(
+            tokens[token0_address]["decimals"],
+            tokens[token1_address]["decimals"],
+        ),
+    )
+
+
+# async version of scan_by_name
+# max_in_flight limits the number of open requests, it defaults to the async setting in the config data
+# hour is the number of steps and nap the seconds between them, as in scan_by_name
+# there is no scheduler, every step reads every pair
+async def async_scan_by_name(
+    pair_names,
+    xch_names,
+    blockchain,
+    base_token,
+    max_in_flight=None,
+    hour=5,
+    nap=300,
+):
+    print("")
+
+    small_cap = False
+
+    best_set = {
+        "pair_name": "",
+        "trade_value": 0,
+        "trade_path": "",
+        "xch0": "",
+        "xch1": "",
+        "base_token": "",
+        "other_token": "",
+    }
+
+    config = load_config()
+    if max_in_flight == None:
+        max_in_flight = config[blockchain]["async"]["max_in_flight"]
+    semaphore = asyncio.Semaphore(max_in_flight)
+    async_w3, session = await get_async_web3(blockchain, max_in_flight)
+    w3 = Web3()
+
+    # build one pool contract class per exchange
+    pool_classes = {}
+    for j in xch_names:
+        pool_classes[j] = w3.eth.contract(abi=load_abi(str(j) + "_factory_pool"))
+
+    # get dictionaries
+    over_dict = prep_export_dict(pair_names, xch_names)
+
+    # percentage lost to swap fees when buying on one exchange and selling on the other
+    deductable = round_trip_fee_perc(config, blockchain, xch_names)
+
+    # every step is appended to the history store instead of being kept in memory
+    history = open_history(config[blockchain]["history"])
+    state = {"step": 0, "block": "latest", "hits": 0}
+
+    # get a pair from all exchanges at once
+    async def fetch(i):
+        priced = await asyncio.gather(
+            *[
+                async_get_specific_pair(
+                    async_w3,
+                    semaphore,
+                    pool_classes[j],
+                    config,
+                    j,
+                    blockchain,
+                    config[blockchain][j]["pool_pairs"][i],
+                    i,
+                    base_token,
+                    state["block"],
+                )
+                for j in xch_names
+            ]
+        )
+        return (i, priced)
+
+    # record a pair as soon as it has been read from all exchanges
+    def evaluate(result):
+        i, priced = result
+        for j, (
+            t0_reserve,
+            t1_reserve,
+            swap_ratio,
+            split_pair_name,
+            base_token_address,
+            other_token_address,
+            base_reserve,
+        ) in zip(xch_names, priced):
+            # save onchain data to dictionary for export to excel
+            over_dict[i][j + str("_") + str(split_pair_name[0])].append(t0_reserve)
+            over_dict[i][j + str("_") + str(split_pair_name[1])].append(t1_reserve)
+            over_dict[i][j + str("_buy_with_base")].append(swap_ratio)
+
+        # get arbitrage value
+        arb_value(
+            over_dict=over_dict,
+            xch_names=xch_names,
+            pair=i,
+            small_cap=small_cap,
+            deductable=deductable,
+        )
+
+        # give a recommendation of trade path
+        recommend_trade(
+            over_dict=over_dict,
+            pair=i,
+            xch_names=xch_names,
+            best_set=best_set,
+            base_token_address=base_token_address,
+            other_token_address=other_token_address,
+            config=config,
+            blockchain=blockchain,
+        )
+        record_step(history, over_dict, i, xch_names, state["step"])
+        if over_dict[i]["potential_trade"][-1] == True:
+            state["hits"] += 1
+
+    for step in range(hour):
+        if step > 0:
+            await asyncio.sleep(nap)
+        state["step"] = step
+        state["hits"] = 0
+        step_start = time.time()
+        # every pair of a step is read at the same block so the exchanges can be compared
+        state["block"] = await async_pin_block(async_w3)
+
+        # for each pair search all exchanges provided
+        await run_workers(pair_names, fetch, evaluate, max_in_flight, "Scanning: ")
+        flush_history(history)
+        # every pair that is read gets a quote so all of them are candidates
+        record_cycle(
+            "scan_by_name",
+            len(pair_names),
+            len(pair_names),
+            state["hits"],
+            time.time() - step_start,
+        )
+
+    close_history(history)
+    await session.close()
+    print_complete()
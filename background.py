@@ -1,4 +1,12 @@
-from components import store_new_abi, get_pairs_from_factory, load_config
+from components import (
+    store_new_abis,
+    get_pairs_from_factory,
+    get_cross_dex_pairs,
+    get_all_token_metadata,
+    load_config,
+)
+from multiprocessing import freeze_support
+
 
 # this uses the functions from the components to build the background data
 def main():
@@ -25,9 +33,23 @@ def main():
         "apeswap_factory",
         "apeswap_factory_pool",
     ]
-    for i in ABI_to_load:
-        # if the abi doesn't exist then store it as a json file
-        store_new_abi(blockchain=BLOCKCHAIN, file_name=i)
+    # the uniswap v2 abis are bundled so only abis of other contracts are downloaded, all at once
+    store_new_abis(blockchain=BLOCKCHAIN, file_names=ABI_to_load)
+
+    # this function finds the pairs listed on more than one of the given exchanges in a single pass
+    # each factory is enumerated once so every pairing of exchanges comes out of the same index
+    get_cross_dex_pairs(
+        blockchain=BLOCKCHAIN,
+        dex_names=["sushiswapB", "pancakeswap", "biswap", "mdex", "apeswap"],
+        save_name="./Outputs/binance_cross_dex_pairs.xlsx",
+        base_token="0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c",
+    )
+
+    # read the decimals and symbol of every token of these dexes into the token cache in bulk
+    get_all_token_metadata(
+        blockchain=BLOCKCHAIN,
+        dex_names=["sushiswapB", "pancakeswap", "biswap", "mdex", "apeswap"],
+    )
 
     # uncomment/comment as needed
     # this function gets all pairs that are common to both exchanges based on a ref exchange defined in filename
@@ -40,8 +62,11 @@ def main():
         save_name="./Outputs/binance_pairs.xlsx",
         selected_ids=SELECTED_IDS,
         base_token="0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c",
+        # set to True to carry on from the last checkpoint of an interrupted run
+        resume=False,
     )
 
 
 if __name__ == "__main__":
+    freeze_support()
     main()
@@ -0,0 +1,335 @@
+# import modules to interact with the os, work with json, time and processes and delete folders
+import os, sys, json, time, copy, queue, shutil, subprocess, multiprocessing
+from contextlib import redirect_stdout, redirect_stderr
+
+# peak memory is read with the resource module, which windows doesn't have
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# import numpy for the percentiles of the cycle times
+import numpy as np
+
+# import the scanners that are measured
+from components import (
+    load_config,
+    get_web3,
+    blind_scan,
+    scan_by_ID,
+    get_pairs_from_factory,
+    scan_by_name,
+)
+
+# import the simulated chain that stands in for the rpc endpoint
+from simchain import (
+    make_sim_chain,
+    serve_sim_chain,
+    start_sim_miner,
+    stop_sim_miner,
+    count_sim_requests,
+)
+
+# scanners in the order they are run
+BENCHMARK_SCANS = ["blind_scan", "scan_by_ID", "get_pairs_from_factory", "scan_by_name"]
+
+# metrics where a higher value is better, for the others a lower value is better
+HIGHER_IS_BETTER = ["pools_per_sec"]
+
+
+# get the pairs of the simulated chain that hold the base token and are listed on both dexes
+# as (pair name, primary pool, secondary pool) with the pair name made of the symbols of token0 and token1
+def get_sim_matches(chain, dex_names):
+    factories = {f["name"]: f for f in chain["factories"].values()}
+    primary = factories[dex_names[0]]
+    secondary = factories[dex_names[1]]
+    matches = []
+    for key, pool in primary["index"].items():
+        if chain["base_token"] in key and key in secondary["index"]:
+            name = "_".join(chain["tokens"][t]["symbol"] for t in key)
+            matches.append((name, pool, secondary["index"][key]))
+    return matches
+
+
+# build the config data of the benchmark from the config data of a blockchain
+# the rpc, multicall, sink and other settings are kept so the scanners run as they are set up, the endpoints,
+# files and dexes are swapped for the simulated chain and the benchmark folder
+def make_benchmark_config(config, blockchain, settings, chain, url, pair_names):
+    bench_config = copy.deepcopy(config[blockchain])
+    bench_config["network"]["mainnet"] = url
+    bench_config["network"]["endpoints"] = [url]
+    bench_config["pair_registry"] = "./Outputs/pair_registry.db"
+    bench_config["token_cache"] = "./Outputs/token_cache.db"
+    bench_config["history"]["folder"] = "./Outputs/history"
+    bench_config["checkpoints"]["file"] = "./Outputs/checkpoints.db"
+    bench_config["sink"]["excel_export"] = False
+    # the tracker of scan_by_ID looks for a new block a few times per simulated block
+    bench_config["reserve_tracker"]["poll_interval"] = settings["block_time"] / 5
+
+    for factory, router in zip(chain["factories"], chain["routers"]):
+        dex_name = chain["factories"][factory]["name"]
+        bench_config[dex_name] = {
+            dex_name + "_factory": factory,
+            dex_name + "_router": router,
+            "fee": config[blockchain][dex_name]["fee"],
+            "pool_pairs": {
+                name: (primary if dex_name == settings["dexes"][0] else secondary)
+                for name, primary, secondary in pair_names
+            },
+        }
+    return {blockchain: bench_config}
+
+
+# run a scanner for a number of cycles in the benchmark folder, called in a process of its own so the peak
+# memory is that of the scanner alone, the output of the scanner goes to a log file in the folder
+def run_scan_cycles(scan, folder, blockchain, kwargs, cycles, outcomes):
+    os.chdir(folder)
+    try:
+        with open(f"./Outputs/{scan}.log", "w") as log, redirect_stdout(
+            log
+        ), redirect_stderr(log):
+            if scan == "scan_by_ID":
+                # the cycles of scan_by_ID follow the new blocks of the simulated chain
+                cycle_times = scan_by_ID(max_cycles=cycles, **kwargs)
+            else:
+                cycle_times = []
+                for cycle in range(cycles):
+                    # every cycle reads a new block so the reads aren't served from the call cache
+                    get_web3(blockchain).provider.make_request("evm_mine", [])
+                    start = time.time()
+                    if scan == "blind_scan":
+                        blind_scan(cycle=cycle, **kwargs)
+                    elif scan == "get_pairs_from_factory":
+                        get_pairs_from_factory(**kwargs)
+                    else:
+                        scan_by_name(hour=1, **kwargs)
+                    cycle_times.append(time.time() - start)
+
+        peak_rss = None
+        if resource != None:
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # linux gives the peak in kilobytes and macos in bytes
+            peak_rss = peak_rss / 1024 if sys.platform == "darwin" else peak_rss
+            peak_rss = round(peak_rss / 1024, 1)
+        outcomes.put({"cycle_times": cycle_times, "peak_rss_mb": peak_rss})
+    except Exception as e:
+        outcomes.put({"error": f"{type(e).__name__}: {e}"})
+
+
+# arguments of every scanner for the simulated chain, scan_by_name reads the named pairs of the config data
+def get_scan_kwargs(blockchain, settings, chain, name_pairs):
+    primary_dex, secondary_dex = settings["dexes"]
+    n_pairs = len(chain["factories"][list(chain["factories"])[0]]["pairs"])
+    return {
+        "blind_scan": {
+            "primary_dex": primary_dex,
+            "secondary_dex": secondary_dex,
+            "blockchain": blockchain,
+            "save_name": "./Outputs/blind_scan.xlsx",
+            "base_token": chain["base_token"],
+            "small_cap_threshold": 0,
+            "exchange": settings["dexes"],
+        },
+        "scan_by_ID": {
+            "primary_dex": primary_dex,
+            "secondary_dex": secondary_dex,
+            "blockchain": blockchain,
+            "selected_ids": list(range(n_pairs)),
+            "save_name": "./Outputs/scan_by_ID.xlsx",
+            "base_token": chain["base_token"],
+        },
+        "get_pairs_from_factory": {
+            "file_name": primary_dex + "_factory",
+            "blockchain": blockchain,
+            "secondary_dex": secondary_dex + "_factory",
+            "selected_ids": None,
+            "save_name": "./Outputs/get_pairs_from_factory.xlsx",
+            "base_token": chain["base_token"],
+        },
+        "scan_by_name": {
+            "pair_names": [name for name, primary, secondary in name_pairs],
+            "xch_names": settings["dexes"],
+            "blockchain": blockchain,
+            "base_token": settings["base_symbol"],
+        },
+    }
+
+
+# work out the metrics of a scanner from its cycle times, the pools it compares per cycle and the number
+# of rpc requests the simulated chain answered while it ran
+def get_scan_metrics(cycle_times, pools, rpc_calls, peak_rss_mb):
+    cycle_times = np.array(cycle_times)
+    return {
+        "cycles": len(cycle_times),
+        "pools": pools,
+        "pools_per_sec": round(pools * len(cycle_times) / cycle_times.sum(), 1),
+        "rpc_calls_per_pool": round(rpc_calls / (pools * len(cycle_times)), 3),
+        "first_cycle": round(float(cycle_times[0]), 3),
+        "p50_cycle": round(float(np.percentile(cycle_times, 50)), 3),
+        "p99_cycle": round(float(np.percentile(cycle_times, 99)), 3),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+# wait for the outcome of a scanner process, a process that dies without one gives its exit code as the error
+def wait_for_outcome(process, outcomes):
+    while True:
+        try:
+            return outcomes.get(timeout=1)
+        except queue.Empty:
+            if process.is_alive() == False:
+                return {"error": f"the process exited with code {process.exitcode}"}
+
+
+# get the commit the benchmark was run on, None when git isn't there
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+# run every scanner against a simulated chain and append the results to the results file
+# settings come from the benchmark entry of the config data of the blockchain
+# the first cycle of each scanner includes filling the pair registry and token cache, the others are warm
+def run_benchmark(blockchain, scans=BENCHMARK_SCANS):
+    config = load_config()
+    settings = config[blockchain]["benchmark"]
+    dex_fees = {
+        dex_name: config[blockchain][dex_name]["fee"] for dex_name in settings["dexes"]
+    }
+    chain = make_sim_chain(
+        dex_fees,
+        settings["pools"],
+        settings["overlap"],
+        base_symbol=settings["base_symbol"],
+        multicall_address=config[blockchain]["multicall"]["address"],
+    )
+    server, url = serve_sim_chain(chain, settings["latency"])
+    miner = start_sim_miner(
+        chain, settings["block_time"], settings["updates_per_block"]
+    )
+
+    matches = get_sim_matches(chain, settings["dexes"])
+    name_pairs = matches[: settings["name_pairs"]]
+
+    # every run starts from an empty folder so the first cycles always fill the registry and caches
+    folder = os.path.abspath(settings["folder"])
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    os.makedirs(os.path.join(folder, "Outputs"))
+    with open(os.path.join(folder, "config.json"), "w") as file:
+        json.dump(
+            make_benchmark_config(config, blockchain, settings, chain, url, name_pairs),
+            file,
+            indent=2,
+        )
+
+    scan_kwargs = get_scan_kwargs(blockchain, settings, chain, name_pairs)
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    try:
+        for scan in scans:
+            print(f"Running {scan} for {settings['cycles']} cycles")
+            outcomes = context.Queue()
+            start_calls = count_sim_requests(chain)
+            process = context.Process(
+                target=run_scan_cycles,
+                args=(
+                    scan,
+                    folder,
+                    blockchain,
+                    scan_kwargs[scan],
+                    settings["cycles"],
+                    outcomes,
+                ),
+            )
+            process.start()
+            outcome = wait_for_outcome(process, outcomes)
+            process.join()
+            if "error" in outcome:
+                print(f"{scan} failed: {outcome['error']}")
+                continue
+
+            pools = len(name_pairs) if scan == "scan_by_name" else len(matches)
+            results[scan] = get_scan_metrics(
+                outcome["cycle_times"],
+                pools,
+                count_sim_requests(chain) - start_calls,
+                outcome["peak_rss_mb"],
+            )
+    finally:
+        stop_sim_miner(miner)
+        server.shutdown()
+
+    run = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": get_commit(),
+        "settings": settings,
+        "results": results,
+    }
+    previous = get_previous_run(settings["results"], settings)
+    save_run(settings["results"], run)
+    print_benchmark(run, previous, settings["tolerance"])
+    return run
+
+
+# get the last saved run that was made with the same settings, None when there isn't one
+def get_previous_run(file_path, settings):
+    if os.path.exists(file_path) == False:
+        return None
+    previous = None
+    with open(file_path) as file:
+        for line in file:
+            run = json.loads(line)
+            if run["settings"] == settings:
+                previous = run
+    return previous
+
+
+# append a run to the results file, one json line per run
+def save_run(file_path, run):
+    folder = os.path.dirname(file_path)
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+    with open(file_path, "a") as file:
+        file.write(json.dumps(run) + "\n")
+
+
+# print the metrics of a run next to the change from the previous run with the same settings
+# a metric that got worse by more than the tolerance e.g. 0.1 for 10% is marked as a regression
+def print_benchmark(run, previous, tolerance):
+    print("")
+    print(f"Benchmark of {run['commit']} at {run['time']}")
+    if previous != None:
+        print(f"compared to {previous['commit']} at {previous['time']}")
+    for scan, metrics in run["results"].items():
+        print("")
+        print(scan)
+        for metric, value in metrics.items():
+            line = f"  {metric}: {value}"
+            old = None
+            if previous != None:
+                old = previous["results"].get(scan, {}).get(metric)
+            if (
+                old not in [None, 0]
+                and value != None
+                and metric not in ["cycles", "pools"]
+            ):
+                change = (value - old) / old
+                line += f" ({change:+.1%})"
+                worse = -change if metric in HIGHER_IS_BETTER else change
+                if worse > tolerance:
+                    line += " REGRESSION"
+            print(line)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    run_benchmark("binance")
@@ -0,0 +1,60 @@
+# import modules to interact with the os and work with sqlite
+import os, sqlite3
+
+
+# function to open the checkpoint store and create the table the first time
+def open_checkpoints(file_path):
+    # make sure the folder for the database exists
+    folder = os.path.dirname(file_path)
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(file_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            scan TEXT NOT NULL,
+            factory TEXT NOT NULL,
+            cycle INTEGER NOT NULL,
+            last_index INTEGER NOT NULL,
+            PRIMARY KEY (scan, factory)
+        )
+        """)
+    conn.commit()
+    return conn
+
+
+# get the (cycle, last completed pair index) of a scan of a factory, None when there is no checkpoint
+def load_checkpoint(conn, scan, factory):
+    row = conn.execute(
+        "SELECT cycle, last_index FROM checkpoints WHERE scan = ? AND factory = ?",
+        (scan, factory),
+    ).fetchone()
+    if row == None:
+        return None
+    return (row[0], row[1])
+
+
+# record that every pair index up to last_index has been done in a cycle
+# the row is committed straight away so it survives a crash
+def save_checkpoint(conn, scan, factory, cycle, last_index):
+    conn.execute(
+        "INSERT OR REPLACE INTO checkpoints (scan, factory, cycle, last_index) VALUES (?, ?, ?, ?)",
+        (scan, factory, cycle, last_index),
+    )
+    conn.commit()
+
+
+# remove the checkpoint of a scan once it has finished
+def clear_checkpoint(conn, scan, factory):
+    conn.execute(
+        "DELETE FROM checkpoints WHERE scan = ? AND factory = ?", (scan, factory)
+    )
+    conn.commit()
+
+
+# last completed pair index to resume a cycle from, -1 to start the cycle from the beginning
+def get_resume_index(conn, scan, factory, cycle):
+    checkpoint = load_checkpoint(conn, scan, factory)
+    if checkpoint == None or checkpoint[0] != cycle:
+        return -1
+    return checkpoint[1]
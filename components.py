@@ -1,12 +1,9 @@
-# import modules to interact with the os, manipulate json, work with time, produce specific audio alert, and make online requests
-import os, json, time, simpleaudio, requests
+# import modules to interact with the os, manipulate json, work with time and produce specific audio alert
+import os, json, time, simpleaudio
 
 # import pandas to work with dataframes
 import pandas as pd
 
-# import modules from openpyxl to work with excel
-from openpyxl import Workbook, load_workbook
-
 # import tqdm for a progress bar
 from tqdm import tqdm
 
@@ -16,74 +13,255 @@ from web3 import Web3
 # import colorama to add color to printed texts
 from colorama import init, Fore
 
+# import the bundled uniswap v2 abis and the rate limited abi fetcher
+from abis import get_bundled_abi, make_bucket, download_abi, fetch_abis
+
+# import the endpoint pool that spreads calls over the rpc endpoints of a chain and retries transient failures
+from providers import make_endpoint_pool, PoolProvider, get_pool_stats
+
+# import multicall to batch contract view calls into aggregate calls
+from multicall import multicall, prune_call_cache, repeat_call
+
+# import the pair registry to keep factory pairs on disk between runs
+from registry import (
+    open_registry,
+    get_stored_length,
+    store_pairs,
+    iter_pairs,
+    load_pairs,
+    has_token,
+    save_discovered_block,
+)
+
+# import the discovery of new pairs from the PairCreated events of the factories
+from discovery import discover_pairs
+
+# import the reserve tracker that follows Sync events
+from reserve_tracker import (
+    start_tracker,
+    update_tracker,
+    wait_for_block,
+    get_tracked_reserves,
+    add_tracked_pools,
+)
+
+# import the cross dex pair index to match pools without a getPair call per pool
+from pair_index import build_pair_index, get_overlap, iter_matched_pools
+
+# import the pool graph used to search for cycles over more than two pools
+from triangular import (
+    prune_leaf_pools,
+    build_pool_graph,
+    update_graph_reserves,
+    find_cycles,
+    quote_cycle,
+)
+
+# import the append only sinks that scan hits are written to
+from sinks import open_sink, write_row, close_sink
+
+# import the history store that keeps every step of scan_by_name on disk
+from history import (
+    open_history,
+    record_step,
+    flush_history,
+    close_history,
+    export_history_excel,
+)
+
+# import the process pool used to read big factories in shards
+from sharding import split_shards, report_progress, run_sharded
+
+# import the token cache so decimals and symbols are read once per token
+from tokens import (
+    ERC20_ABI,
+    ERC20_BYTES32_ABI,
+    DEFAULT_DECIMALS,
+    open_token_cache,
+    load_tokens,
+    store_tokens,
+    read_token,
+)
+
+# import the metrics that every scan cycle is recorded in
+from metrics import record_cycle, record_tiers
+
+# import the profiler that times the phases of every scan cycle when profiling is on
+from profiler import start_cycle, set_phase, end_cycle
+
+# import the stages of the scan pipeline that blind_scan, scan_by_ID and get_pairs_from_factory are built from
+from pipeline import filter_pools, run_scan
+
+# import the scheduler that reads hot pools every block and cold ones rarely within a call budget
+from scheduler import start_round, select_due, record_read, get_edge, count_tiers
+
+# import the checkpoint store so long sweeps can carry on after a restart
+from checkpoint import (
+    open_checkpoints,
+    save_checkpoint,
+    clear_checkpoint,
+    get_resume_index,
+)
+
+# import the off chain quote engine to price swaps from pool reserves
+from quotes import get_fee, get_amount_out, round_trip_fee_perc
+
+# every init wraps stdout again, so colours are set up once and not for every printed trade
+init(autoreset=True)
+
+# caches shared by every scan so that files are parsed and connections are made only once
+CONFIG_CACHE = {}
+ABI_CACHE = {}
+ABI_KEYS = {}
+WEB3_CLIENTS = {}
+RPC_POOLS = {}
+CONTRACT_CACHE = {}
+# results of calls pinned to a block, keyed by (block, contract, calldata)
+CALL_CACHE = {}
+# decimals and symbol of tokens, keyed by (blockchain, address)
+TOKEN_CACHE = {}
+
 
 # function to load config data
+# the parsed config is reused until config.json changes on disk
 def load_config():
-    # open the config.json file
-    with open("./config.json", "r") as file:
-        # parse json string and load it to a dictionary variable
-        config = json.loads(file.read())
-    return config
+    modified = os.path.getmtime("./config.json")
+    if CONFIG_CACHE.get("modified") != modified:
+        # open the config.json file
+        with open("./config.json", "r") as file:
+            # parse json string and load it to a dictionary variable
+            CONFIG_CACHE["config"] = json.loads(file.read())
+        CONFIG_CACHE["modified"] = modified
+    return CONFIG_CACHE["config"]
+
+
+# function to load an abi - each abi is only parsed once
+# a file in the ABIs folder takes the place of the bundled uniswap v2 abi e.g. for a fork with extra functions
+def load_abi(file_name):
+    if file_name not in ABI_CACHE:
+        if os.path.exists("./ABIs/" + str(file_name) + ".json"):
+            with open("./ABIs/" + str(file_name) + ".json", "r") as file:
+                ABI_CACHE[file_name] = json.loads(file.read())
+        elif get_bundled_abi(file_name) != None:
+            ABI_CACHE[file_name] = get_bundled_abi(file_name)
+        else:
+            raise FileNotFoundError(
+                f"No abi for {file_name}, store it with store_new_abi"
+            )
+    return ABI_CACHE[file_name]
+
+
+# function to get the shared web3 client of a blockchain
+# the client sends every call through the endpoint pool of the blockchain, whose endpoints keep their http
+# connections alive so calls don't pay for a new connection each time
+def get_web3(blockchain):
+    if blockchain not in WEB3_CLIENTS:
+        # use Web3 to connect to blockchain
+        WEB3_CLIENTS[blockchain] = Web3(PoolProvider(get_rpc_pool(blockchain)))
+    return WEB3_CLIENTS[blockchain]
+
+
+# get the rpc endpoints of a blockchain, the endpoints entry of the network config or else just the mainnet
+def get_rpc_endpoints(blockchain):
+    network = load_config()[blockchain]["network"]
+    return network.get("endpoints", [network["mainnet"]])
+
+
+# get the endpoint pool of a blockchain, it is shared by the sync and async clients
+def get_rpc_pool(blockchain):
+    if blockchain not in RPC_POOLS:
+        config = load_config()
+        RPC_POOLS[blockchain] = make_endpoint_pool(
+            get_rpc_endpoints(blockchain),
+            config[blockchain]["network"],
+            config[blockchain]["rpc"],
+        )
+    return RPC_POOLS[blockchain]
+
+
+# print how many calls were made to each rpc endpoint of a blockchain and how many failed by class
+def print_rpc_stats(blockchain):
+    stats = get_pool_stats(get_rpc_pool(blockchain))
+    print(f"{stats['retries']} rpc retries, {stats['hedges']} hedged calls")
+    for url, endpoint in stats["endpoints"].items():
+        print(
+            f"{url}: {endpoint['calls']} rpc calls, errors {endpoint['errors']}, "
+            + f"{endpoint['latency']}s latency, {endpoint['concurrency']} calls in flight at the end"
+            + (", out of rotation" if endpoint["ejected"] else "")
+        )
+
+
+# drop the shared web3 clients, contracts and endpoint pools, used when a worker process starts so it doesn't
+# reuse the http connections it inherited from the main process
+def reset_web3_clients():
+    WEB3_CLIENTS.clear()
+    CONTRACT_CACHE.clear()
+    RPC_POOLS.clear()
 
 
 # get ABI based on a contract address and API
 def get_abi(contract_address, port_addy):
-    # compose API endpoint based on specific API endpoint format
-    API_ENDPOINT = (
-        port_addy + "?module=contract&action=getabi&address=" + str(contract_address)
-    )
-    # make a request for the ABI in JSON
-    r = requests.get(url=API_ENDPOINT)
-    response = r.json()
-    # parse json string and load it to a dictionary variable
-    abi = json.loads(response["result"])
-    # wait a little so that the connection doesn't get blocked for spamming
-    time.sleep(5)
-    return abi
+    # a single download only needs a bucket with one token
+    return download_abi(port_addy, contract_address, make_bucket(1, 1))
 
 
-# function to get and store new ABIs
-def store_new_abi(file_name, blockchain):
-    # check to see if the ABI exists based on the filename if the ABI doesn't exist then get and save one
-    if os.path.exists("./ABIs/" + str(file_name) + ".json") == False:
-        # load config data
-        config = load_config()
-        # split the file name so that it can be used in subsequent lines
-        split_fn = file_name.split("_")
-        try:
-            # check for a contract address
-            CONTRACT_ADDRESS = config[blockchain][split_fn[0]][file_name]
-        except KeyError:
-            # if there isn't a contract address then assume it's a pair contract being targeted find it and get the contract address
-            # split_fn = file_name.split("_")
-            factory_name = "_".join([split_fn[0], split_fn[1]])
-            # get the address from the config data
-            factory_address = config[blockchain][split_fn[0]][factory_name]
-            # load abi json
-            with open("./ABIs/" + str(factory_name) + ".json", "r") as file:
-                factory_abi = json.loads(file.read())
-            # get the contract object
-            factory_contract = getContract(blockchain, factory_address, factory_abi)
-            # use contract object to get contract address for a pair, which can be used to obtain a sample ABI for all pairs created by that factory
-            CONTRACT_ADDRESS = factory_contract.functions.allPairs(0).call()
-
-        # use get_abi to get a sample abi
-        abi = get_abi(
-            contract_address=CONTRACT_ADDRESS,
-            port_addy=config[blockchain]["abi_api"],
+# get the address of the contract an abi file name refers to e.g. biswap_router
+# pool abis are taken from the first pair of the factory as every pair of a factory has the same abi
+def get_abi_address(file_name, blockchain):
+    # load config data
+    config = load_config()
+    # split the file name so that it can be used in subsequent lines
+    split_fn = file_name.split("_")
+    try:
+        # check for a contract address
+        return config[blockchain][split_fn[0]][file_name]
+    except KeyError:
+        # if there isn't a contract address then assume it's a pair contract being targeted find it and get the contract address
+        factory_name = "_".join([split_fn[0], split_fn[1]])
+        # get the address from the config data
+        factory_address = config[blockchain][split_fn[0]][factory_name]
+        # get the contract object
+        factory_contract = getContract(
+            blockchain, factory_address, load_abi(factory_name)
         )
+        # use contract object to get contract address for a pair, which can be used to obtain a sample ABI for all pairs created by that factory
+        return factory_contract.functions.allPairs(0).call()
+
 
+# function to get and store new ABIs
+# uniswap v2 factories, pairs and routers use the bundled abis so only other contracts are downloaded
+# downloads run at the same time within the rate limit of the explorer api set in the config data
+def store_new_abis(file_names, blockchain):
+    # load config data
+    config = load_config()
+    # only abis that aren't bundled or already in the ABIs folder are downloaded
+    targets = {}
+    for file_name in file_names:
+        if os.path.exists("./ABIs/" + str(file_name) + ".json"):
+            continue
+        if get_bundled_abi(file_name) != None:
+            continue
+        targets[file_name] = get_abi_address(file_name, blockchain)
+
+    abis = fetch_abis(
+        config[blockchain]["abi_api"], targets, config[blockchain]["abi_fetcher"]
+    )
+    for file_name, abi in abis.items():
         # dump result to a json file
         with open("./ABIs/" + str(file_name) + ".json", "w") as file:
             json.dump(abi, file)
+    return abis
+
+
+# function to get and store a new ABI
+def store_new_abi(file_name, blockchain):
+    store_new_abis([file_name], blockchain)
 
 
 # function to get the gas fees and gas limit
 def check_gas_fee(blockchain):
-    # get config data
-    config = load_config()
-    # use Web3 to connect to blockchain
-    w3 = Web3(Web3.HTTPProvider(config[blockchain]["network"]["mainnet"]))
+    # get the shared connection to the blockchain
+    w3 = get_web3(blockchain)
     # get gas price in wei
     gas_fee_wei = w3.eth.gas_price
     # get priority fee or miner tip in wei
@@ -115,24 +293,403 @@ def check_gas_fee(blockchain):
     return tip_and_gas_wei, gas_limit, max_total_gas_eth
 
 
-# builds a new contract based on abi and address
+# key of an abi in the contract cache, the abis from load_abi are shared so each one is only serialised once
+# the abi is kept next to its key so its id can't be reused by another list
+def get_abi_key(abi):
+    if id(abi) not in ABI_KEYS:
+        ABI_KEYS[id(abi)] = (abi, json.dumps(abi, sort_keys=True))
+    return ABI_KEYS[id(abi)][1]
+
+
+# builds a contract based on abi and address
+# contracts are cached by abi and address so the same contract is only built once
 def getContract(blockchain, address, abi):
-    # load config data
-    config = load_config()
-    # use Web3 to connect to blockchain
-    w3 = Web3(Web3.HTTPProvider(config[blockchain]["network"]["mainnet"]))
+    # get the shared connection to the blockchain
+    w3 = get_web3(blockchain)
     # make sure address is in acceptable
     address = w3.toChecksumAddress(address)
-    # build contract object based on address and abi
-    contract = w3.eth.contract(abi=abi, address=address)
-    return contract
+    contract_key = (blockchain, get_abi_key(abi), address)
+    if contract_key not in CONTRACT_CACHE:
+        # build contract object based on address and abi
+        CONTRACT_CACHE[contract_key] = w3.eth.contract(abi=abi, address=address)
+    return CONTRACT_CACHE[contract_key]
+
+
+# pin a scan cycle to the latest block so every call of the cycle reads the same state
+# cached calls of older blocks are dropped as they can't be used again
+def pin_block(w3):
+    block = w3.eth.block_number
+    prune_call_cache(CALL_CACHE, block)
+    return block
+
+
+# run a list of contract view calls through the multicall contract of a given blockchain
+# calls pinned to a block number are cached so repeating them in the same block costs nothing
+def batch_call(w3, blockchain, calls, block_identifier="latest"):
+    # load config data
+    config = load_config()
+    return multicall(
+        w3=w3,
+        multicall_address=config[blockchain]["multicall"]["address"],
+        calls=calls,
+        batch_size=config[blockchain]["multicall"]["batch_size"],
+        block_identifier=block_identifier,
+        call_cache=CALL_CACHE,
+    )
+
+
+# get the pool address, token0 and token1 for each factory index using batched calls
+def get_pools_by_index(w3, blockchain, factory_contract, pool_abi, sample_range):
+    # build a pool contract class once and only swap in the address per pool
+    pool_class = w3.eth.contract(abi=pool_abi)
+
+    # get the pool addresses
+    pool_results = batch_call(
+        w3, blockchain, [factory_contract.functions.allPairs(i) for i in sample_range]
+    )
+    pools = []
+    for i, (success, pool_address) in zip(sample_range, pool_results):
+        if success == True:
+            pools.append({"id": i, "pool_address": w3.toChecksumAddress(pool_address)})
+
+    # get both tokens of every pool
+    token_calls = []
+    for pool in pools:
+        pool_contract = pool_class(address=pool["pool_address"])
+        token_calls.append(pool_contract.functions.token0())
+        token_calls.append(pool_contract.functions.token1())
+    token_results = batch_call(w3, blockchain, token_calls)
+
+    # drop pools where either token could not be read
+    found_pools = []
+    for count, pool in enumerate(pools):
+        token0_success, pool["token0"] = token_results[2 * count]
+        token1_success, pool["token1"] = token_results[2 * count + 1]
+        if token0_success and token1_success:
+            found_pools.append(pool)
+
+    return found_pools
+
+
+# read the pools of one shard of factory indices in a worker process
+# the web3 client and contracts are built in the worker the first time they are used
+def get_pools_for_shard(
+    blockchain,
+    factory_address,
+    factory_abi,
+    pool_abi,
+    chunk_size,
+    shard,
+    shard_no,
+    progress,
+):
+    w3 = get_web3(blockchain)
+    factory_contract = getContract(blockchain, factory_address, factory_abi)
+    pools = []
+    for i in range(0, len(shard), chunk_size):
+        chunk = shard[i : i + chunk_size]
+        pools += get_pools_by_index(w3, blockchain, factory_contract, pool_abi, chunk)
+        report_progress(progress, shard_no, len(chunk))
+    return pools
+
+
+# stream the pools of a factory from the on disk pair registry in index order
+# pairs never change once created so only indices past the stored length are read from the chain
+# with a token e.g. the base token only the pools that hold it are passed on, they are looked up in the token
+# index of the registry so the other pools are never loaded
+def iter_registered_pools(
+    w3,
+    blockchain,
+    factory_contract,
+    pool_abi,
+    selected_ids=None,
+    chunk_size=5000,
+    token=None,
+):
+    # load config data
+    config = load_config()
+    conn = open_registry(config[blockchain]["pair_registry"])
+    try:
+        yield from read_registered_pools(
+            conn,
+            w3,
+            blockchain,
+            factory_contract,
+            pool_abi,
+            selected_ids,
+            chunk_size,
+            token,
+        )
+    finally:
+        conn.close()
+
+
+# list version of iter_registered_pools
+def get_registered_pools(
+    w3,
+    blockchain,
+    factory_contract,
+    pool_abi,
+    selected_ids=None,
+    chunk_size=5000,
+    token=None,
+):
+    return list(
+        iter_registered_pools(
+            w3, blockchain, factory_contract, pool_abi, selected_ids, chunk_size, token
+        )
+    )
+
+
+# work out which pairs of a factory a registry read has to fetch by index
+# with discovery on the pairs created since the last read come from the PairCreated events of the factory,
+# the first read and a read that is far behind still walk allPairs, up to the pairs of the confirmed block
+# returns the walk for finish_registry_walk, new_range holds the indices to fetch
+def start_registry_walk(conn, w3, blockchain, factory_contract):
+    discovery = load_config()[blockchain]["discovery"]
+    factory_address = factory_contract.address
+    walk = {
+        "discovery": discovery,
+        "head": None,
+        "confirmed": "latest",
+        "followed": {},
+        "record_length": None,
+        "new_range": [],
+    }
+    if discovery["enabled"]:
+        walk["head"] = w3.eth.block_number
+        walk["confirmed"] = max(walk["head"] - discovery["confirmations"], 0)
+        walk["followed"] = discover_pairs(
+            conn, w3, blockchain, [factory_address], discovery, walk["head"]
+        )
+
+    if factory_address not in walk["followed"]:
+        walk["record_length"] = factory_contract.functions.allPairsLength().call(
+            block_identifier=walk["confirmed"]
+        )
+        walk["new_range"] = list(
+            range(
+                get_stored_length(conn, blockchain, factory_address),
+                walk["record_length"],
+            )
+        )
+    return walk
+
+
+# finish a registry walk once the pairs it fetched are stored
+# when every pair up to the confirmed block is stored the events of the factory are followed from there
+# only confirmed pairs are stored, returns the newer ones with the token, which come after the stored ones
+def finish_registry_walk(conn, w3, blockchain, factory_address, walk, token=None):
+    stored_length = get_stored_length(conn, blockchain, factory_address)
+    if (
+        walk["discovery"]["enabled"]
+        and factory_address not in walk["followed"]
+        and stored_length == walk["record_length"]
+    ):
+        save_discovered_block(conn, blockchain, factory_address, walk["confirmed"])
+        walk["followed"] = discover_pairs(
+            conn, w3, blockchain, [factory_address], walk["discovery"], walk["head"]
+        )
+        stored_length = get_stored_length(conn, blockchain, factory_address)
+    return [
+        p
+        for p in walk["followed"].get(factory_address, [])
+        if p["id"] >= stored_length and has_token(p, token)
+    ]
+
+
+# store the pairs of a factory that aren't in the registry yet and then stream its pools from the registry
+def read_registered_pools(
+    conn, w3, blockchain, factory_contract, pool_abi, selected_ids, chunk_size, token
+):
+    config = load_config()
+    factory_address = factory_contract.address
+    stored_length = get_stored_length(conn, blockchain, factory_address)
+
+    if selected_ids == None:
+        walk = start_registry_walk(conn, w3, blockchain, factory_contract)
+        unstored_pools = []
+        if len(walk["new_range"]) > 0:
+            # fetch new pairs in chunks and store each chunk so an interrupted run keeps its progress
+            new_range = walk["new_range"]
+            sharding = config[blockchain]["sharding"]
+            if sharding["processes"] > 1 and len(new_range) > sharding["shard_size"]:
+                # big factories are split into shards that are read by a pool of processes
+                # shards come back in index order so the registry still gets an unbroken run
+                results = run_sharded(
+                    get_pools_for_shard,
+                    (
+                        blockchain,
+                        factory_address,
+                        factory_contract.abi,
+                        pool_abi,
+                        chunk_size,
+                    ),
+                    split_shards(new_range, sharding["shard_size"]),
+                    sharding["processes"],
+                    "Registering",
+                    initializer=reset_web3_clients,
+                )
+            else:
+                results = (
+                    get_pools_by_index(
+                        w3,
+                        blockchain,
+                        factory_contract,
+                        pool_abi,
+                        new_range[i : i + chunk_size],
+                    )
+                    for i in tqdm(
+                        range(0, len(new_range), chunk_size),
+                        "Registering: ",
+                        leave=False,
+                    )
+                )
+
+            for new_pools in results:
+                stored_length = store_pairs(
+                    conn, blockchain, factory_address, new_pools
+                )
+                # pools after a failed read can't be stored yet but are still scanned this time
+                unstored_pools += [
+                    p
+                    for p in new_pools
+                    if p["id"] >= stored_length and has_token(p, token)
+                ]
+
+        unstored_pools += finish_registry_walk(
+            conn, w3, blockchain, factory_address, walk, token
+        )
+        yield from iter_pairs(conn, blockchain, factory_address, token)
+        yield from unstored_pools
+
+    else:
+        # selected pairs that aren't stored yet are read directly
+        pools = load_pairs(conn, blockchain, factory_address, selected_ids, token)
+        missing_ids = [i for i in selected_ids if i >= stored_length]
+        if len(missing_ids) > 0:
+            new_pools = get_pools_by_index(
+                w3, blockchain, factory_contract, pool_abi, missing_ids
+            )
+            store_pairs(conn, blockchain, factory_address, new_pools)
+            new_pools = [p for p in new_pools if has_token(p, token)]
+            # keep the order of the selected ids
+            by_id = {pool["id"]: pool for pool in pools + new_pools}
+            pools = [by_id[i] for i in selected_ids if i in by_id]
+        yield from pools
+
+
+# get the named pairs of the pool_pairs of both dexes as matched pools, tokens are read with batched calls
+# the id of a pool is the position of its name in pair_names
+def get_named_pools(w3, blockchain, primary_dex, secondary_dex, pair_names):
+    config = load_config()
+    pool_class = w3.eth.contract(abi=load_abi(str(primary_dex) + "_factory_pool"))
+    pools = []
+    for count, pair_name in enumerate(pair_names):
+        pools.append(
+            {
+                "id": count,
+                "pool_address": w3.toChecksumAddress(
+                    config[blockchain][primary_dex]["pool_pairs"][pair_name]
+                ),
+                "s_pool_address": w3.toChecksumAddress(
+                    config[blockchain][secondary_dex]["pool_pairs"][pair_name]
+                ),
+            }
+        )
+
+    token_calls = []
+    for pool in pools:
+        pool_contract = pool_class(address=pool["pool_address"])
+        token_calls.append(pool_contract.functions.token0())
+        token_calls.append(pool_contract.functions.token1())
+    token_results = batch_call(w3, blockchain, token_calls)
+
+    # drop pools where either token could not be read
+    found_pools = []
+    for count, pool in enumerate(pools):
+        token0_success, pool["token0"] = token_results[2 * count]
+        token1_success, pool["token1"] = token_results[2 * count + 1]
+        if token0_success and token1_success:
+            found_pools.append(pool)
+
+    return found_pools
+
+
+# get the pools of every given dex from its pair registry as a dictionary of dex name -> pools
+# with a token only the pools that hold it are returned
+def get_dex_pools(w3, blockchain, dex_names, token=None):
+    config = load_config()
+    pools_by_dex = {}
+    for dex_name in dex_names:
+        factory_contract = getContract(
+            blockchain,
+            w3.toChecksumAddress(config[blockchain][dex_name][dex_name + "_factory"]),
+            load_abi(dex_name + "_factory"),
+        )
+        pools_by_dex[dex_name] = get_registered_pools(
+            w3,
+            blockchain,
+            factory_contract,
+            load_abi(dex_name + "_factory_pool"),
+            token=token,
+        )
+    return pools_by_dex
+
+
+# build the cross dex pair index from the pair registry of every given dex
+# with a token only the pairs that hold it are in the index, enough to match the pools of a base token scan
+def get_pair_index(w3, blockchain, dex_names, token=None):
+    return build_pair_index(get_dex_pools(w3, blockchain, dex_names, token))
+
+
+# get the reserves of the primary and secondary pool for every matched pool using batched calls
+def get_pool_reserves(
+    w3, blockchain, pool_abi, sdex_pool_abi, pools, block_identifier="latest"
+):
+    if len(pools) == 0:
+        return []
+    primary_calls = repeat_call(
+        w3.eth.contract(
+            abi=pool_abi, address=pools[0]["pool_address"]
+        ).functions.getReserves(),
+        [p["pool_address"] for p in pools],
+    )
+    secondary_calls = repeat_call(
+        w3.eth.contract(
+            abi=sdex_pool_abi, address=pools[0]["s_pool_address"]
+        ).functions.getReserves(),
+        [p["s_pool_address"] for p in pools],
+    )
+
+    reserve_calls = []
+    for call, s_call in zip(primary_calls, secondary_calls):
+        reserve_calls.append(call)
+        reserve_calls.append(s_call)
+    reserve_results = batch_call(w3, blockchain, reserve_calls, block_identifier)
+
+    # drop pools where either set of reserves could not be read
+    priced_pools = []
+    for count, pool in enumerate(pools):
+        success, pool["reserves"] = reserve_results[2 * count]
+        s_success, pool["s_reserves"] = reserve_results[2 * count + 1]
+        if success and s_success:
+            priced_pools.append(pool)
+
+    return priced_pools
+
+
+# read the reserves of a batch of matched pools at the latest block, the fetch of the scan pipeline
+# the block is pinned per batch as nodes without archive state can't serve old blocks for a whole sweep
+def fetch_pool_reserves(w3, blockchain, pool_abi, sdex_pool_abi, pools):
+    block = pin_block(w3)
+    return get_pool_reserves(w3, blockchain, pool_abi, sdex_pool_abi, pools, block)
 
 
 # prepare export dictionaries for function that scans blockchain for pair data
 def prep_export_dict(pair_names, xch_names):
     # initialise dictionaries
     over_dict = {}
-    skip_pair = {}
 
     # loop through the pair names
     for i in pair_names:
@@ -151,13 +708,13 @@ def prep_export_dict(pair_names, xch_names):
         # note that for this to work in the rest of this application the trade path should start and end with base_token
         scanned_dict["trade_path"] = []
         over_dict[i] = scanned_dict
-        skip_pair[i] = 0
 
-    return over_dict, skip_pair
+    return over_dict
 
 
 # function to estimate potential arbitrage percentage opportunity
-def arb_value(over_dict, xch_names, pair, small_cap):
+# deductable is the percentage lost to swap fees over the round trip, see round_trip_fee_perc
+def arb_value(over_dict, xch_names, pair, small_cap, deductable):
     cap_key0 = str(xch_names[0]) + str("_buy_with_base")
     cap_key1 = str(xch_names[1]) + str("_buy_with_base")
     gross_perc_profit = (
@@ -165,8 +722,6 @@ def arb_value(over_dict, xch_names, pair, small_cap):
         / over_dict[pair][cap_key0][-1]
     ) * 100
 
-    deductable = 0.8
-
     if gross_perc_profit < 0:
         gross_perc_profit = gross_perc_profit + deductable
         if gross_perc_profit > 0:
@@ -192,6 +747,24 @@ def arb_value(over_dict, xch_names, pair, small_cap):
     return over_dict
 
 
+# edge and liquidity of the last step of a pair for the scheduler, see scheduler.get_edge
+# liquidity is the base token reserve of the thinner pool in whole tokens
+def get_pair_edge(over_dict, xch_names, pair, base_token, deductable):
+    split_pair_name = pair.split("_")
+    if split_pair_name[0] == base_token:
+        base_name, other_name = split_pair_name
+    else:
+        other_name, base_name = split_pair_name
+    prices = []
+    base_reserves = []
+    for j in xch_names[0:2]:
+        base_reserve = over_dict[pair][j + "_" + base_name][-1]
+        other_reserve = over_dict[pair][j + "_" + other_name][-1]
+        prices.append(other_reserve / base_reserve if base_reserve > 0 else 0)
+        base_reserves.append(base_reserve)
+    return get_edge(prices[0], prices[1], 1 - deductable / 100), min(base_reserves)
+
+
 # get data on the price ratio and pool size of a specified pair from a specified exchange
 def get_specific_pair(
     xch_name,
@@ -199,55 +772,93 @@ def get_specific_pair(
     address,
     pair_name,
     base_token,
+    block_identifier="latest",
 ):
     # load pool sample abi json
-    with open("./ABIs/" + str(xch_name) + "factory_pool.json", "r") as file:
-        pool_abi = json.loads(file.read())
-
-    with open("./ABIs/" + str(xch_name) + "_router.json", "r") as file:
-        router_abi = json.loads(file.read())
+    pool_abi = load_abi(str(xch_name) + "_factory_pool")
 
     # load config file and get contract for a given pair on a given exchange
     config = load_config()
     pair_contract = getContract(blockchain, address, pool_abi)
 
-    # get router contract
-    router_contract = getContract(
+    # get on chain data in one batched call at the given block
+    (
+        (reserve_success, reserve),
+        (token0_success, token0_address),
+        (token1_success, token1_address),
+    ) = batch_call(
+        get_web3(blockchain),
         blockchain,
-        config[blockchain][xch_name][str(xch_name) + str("_router")],
-        router_abi,
+        [
+            pair_contract.functions.getReserves(),
+            pair_contract.functions.token0(),
+            pair_contract.functions.token1(),
+        ],
+        block_identifier,
+    )
+    if reserve_success == False or token0_success == False or token1_success == False:
+        raise ValueError(f"Could not read {pair_name} on {xch_name}")
+
+    tokens = get_token_metadata(
+        get_web3(blockchain), blockchain, [token0_address, token1_address]
+    )
+
+    return price_specific_pair(
+        config=config,
+        blockchain=blockchain,
+        xch_name=xch_name,
+        pair_name=pair_name,
+        base_token=base_token,
+        reserve=reserve,
+        token0_address=token0_address,
+        token1_address=token1_address,
+        decimals=(
+            tokens[token0_address]["decimals"],
+            tokens[token1_address]["decimals"],
+        ),
     )
 
+
+# work out reserves and the swap ratio of a specified pair from its on chain data
+# decimals are the (token0, token1) decimals from the token cache
+def price_specific_pair(
+    config,
+    blockchain,
+    xch_name,
+    pair_name,
+    base_token,
+    reserve,
+    token0_address,
+    token1_address,
+    decimals,
+):
+    # get the swap fee of the exchange
+    fee = get_fee(config, blockchain, xch_name)
+
     amount_in = Web3.toWei(1, "ether")
 
-    # get on chain data
-    reserve = pair_contract.functions.getReserves().call()
     split_pair_name = pair_name.split("_")
-    t0_reserve = reserve[0] / (10 ** config[blockchain][split_pair_name[0]])
-    t1_reserve = reserve[1] / (10 ** config[blockchain][split_pair_name[1]])
+    t0_reserve = reserve[0] / (10 ** decimals[0])
+    t1_reserve = reserve[1] / (10 ** decimals[1])
 
     # ensure that swap ratio is always given relative to base token
     if split_pair_name[0] == base_token:
-        base_token_address = pair_contract.functions.token0().call()
-        other_token_address = pair_contract.functions.token1().call()
+        base_token_address = token0_address
+        other_token_address = token1_address
         base_reserve = split_pair_name[0]
 
-        address_path = [base_token_address, other_token_address]
-        get_amount_out = router_contract.functions.getAmountsOut(
-            amount_in, address_path
-        ).call()
-        swap_ratio = get_amount_out[1] / (10 ** config[blockchain][split_pair_name[0]])
+        # quote the swap from the reserves with the same maths as the router
+        amount_out = get_amount_out(amount_in, reserve[0], reserve[1], fee)
+        swap_ratio = amount_out / (10 ** decimals[0])
 
     elif split_pair_name[1] == base_token:
-        base_token_address = pair_contract.functions.token1().call()
-        other_token_address = pair_contract.functions.token0().call()
+        base_token_address = token1_address
+        other_token_address = token0_address
         base_reserve = split_pair_name[1]
 
-        address_path = [base_token_address, other_token_address]
-        get_amount_out = router_contract.functions.getAmountsOut(
-            amount_in, address_path
-        ).call()
-        swap_ratio = get_amount_out[1] / (10 ** config[blockchain][split_pair_name[1]])
+        # quote the swap from the reserves with the same maths as the router
+        amount_out = get_amount_out(amount_in, reserve[1], reserve[0], fee)
+        swap_ratio = amount_out / (10 ** decimals[1])
 
     return (
         t0_reserve,
@@ -260,233 +871,524 @@ def get_specific_pair(
     )
 
 
-# get info on the tokens in the pair
-def get_t0t1_decimals(token0_address, token1_address, w3, port_addy):
-    token0_abi = get_abi(contract_address=token0_address, port_addy=port_addy)
-    token0_contract = w3.eth.contract(abi=token0_abi, address=token0_address)
-    try:
-        token0_decimals = token0_contract.functions.decimals().call()
-    except:
-        token0_decimals = 18
-    try:
-        token0_symbol = token0_contract.functions.symbol().call()
-    except:
-        token0_symbol = None
+# read the decimals and symbol of tokens that aren't in the token cache with batched calls
+def fetch_tokens(w3, blockchain, addresses):
+    token_class = w3.eth.contract(abi=ERC20_ABI)
+    calls = []
+    for address in addresses:
+        token_contract = token_class(address=address)
+        calls.append(token_contract.functions.decimals())
+        calls.append(token_contract.functions.symbol())
+    results = batch_call(w3, blockchain, calls)
+
+    # ask again for the symbols that didn't decode as a string
+    bytes32_class = w3.eth.contract(abi=ERC20_BYTES32_ABI)
+    retry = [
+        address
+        for count, address in enumerate(addresses)
+        if results[2 * count][0] == True and results[2 * count + 1][0] == False
+    ]
+    bytes32_results = dict(
+        zip(
+            retry,
+            batch_call(
+                w3,
+                blockchain,
+                [bytes32_class(address=a).functions.symbol() for a in retry],
+            ),
+        )
+    )
 
-    # check token1
-    token1_abi = get_abi(contract_address=token1_address, port_addy=port_addy)
-    token1_contract = w3.eth.contract(abi=token1_abi, address=token1_address)
-    try:
-        token1_decimals = token1_contract.functions.decimals().call()
-    except:
-        token1_decimals = 18
-    try:
-        token1_symbol = token1_contract.functions.symbol().call()
-    except:
-        token1_symbol = None
+    tokens = {}
+    for count, address in enumerate(addresses):
+        token = read_token(
+            results[2 * count], results[2 * count + 1], bytes32_results.get(address)
+        )
+        if token != None:
+            tokens[address] = token
+    return tokens
+
+
+# get the decimals and symbol of tokens as a dictionary of address -> {"decimals": ..., "symbol": ...}
+# tokens are looked up in memory, then in the on disk token cache and only then read from the chain
+def get_token_metadata(w3, blockchain, addresses):
+    tokens = {}
+    missing = []
+    for address in dict.fromkeys(addresses):
+        if (blockchain, address) in TOKEN_CACHE:
+            tokens[address] = TOKEN_CACHE[(blockchain, address)]
+        else:
+            missing.append(address)
+
+    if len(missing) > 0:
+        conn = open_token_cache(load_config()[blockchain]["token_cache"])
+        found = load_tokens(conn, blockchain, missing)
+        unknown = [address for address in missing if address not in found]
+        if len(unknown) > 0:
+            fetched = fetch_tokens(w3, blockchain, unknown)
+            store_tokens(conn, blockchain, fetched)
+            found.update(fetched)
+        conn.close()
+        for address, token in found.items():
+            TOKEN_CACHE[(blockchain, address)] = token
+            tokens[address] = token
+
+    # tokens that can't be read are not cached so they are tried again next time
+    for address in addresses:
+        if address not in tokens:
+            tokens[address] = {"decimals": DEFAULT_DECIMALS, "symbol": None}
+    return tokens
+
+
+# get the decimals and symbol of every token in the pair registries of the given dexes in bulk
+def get_all_token_metadata(blockchain, dex_names):
+    w3 = get_web3(blockchain)
+    addresses = []
+    for dex_pools in get_dex_pools(w3, blockchain, dex_names).values():
+        for pool in dex_pools:
+            addresses += [pool["token0"], pool["token1"]]
+    tokens = get_token_metadata(w3, blockchain, list(dict.fromkeys(addresses)))
+    print(f"{len(tokens)} tokens in the token cache")
+    return tokens
 
-    return (token0_decimals, token1_decimals, token0_symbol, token1_symbol)
 
+# get info on the tokens in the pair
+def get_t0t1_decimals(token0_address, token1_address, blockchain):
+    tokens = get_token_metadata(
+        get_web3(blockchain), blockchain, [token0_address, token1_address]
+    )
+    return (
+        tokens[token0_address]["decimals"],
+        tokens[token1_address]["decimals"],
+        tokens[token0_address]["symbol"],
+        tokens[token1_address]["symbol"],
+    )
 
-# function to scan the factory contract and get all pairs - useful for prospecting viable arb pairs
-# note that it is only useful for pairs with base token e.g. wbnb, otherwise changes to code will be required
-def get_pairs_from_factory(
-    file_name, blockchain, secondary_dex, selected_ids, save_name, base_token
+
+# column names of the export file of get_pairs_from_factory and scan_by_ID
+ARB_COL_LIST = [
+    "DEX_pool_no",
+    "t0_address",
+    "t1_address",
+    "DEX_name",
+    "pool_address",
+    "t0_reserves",
+    "t1_reserves",
+    "amountOut",
+    "s_DEX_name",
+    "s_pool_address",
+    "s_t0_reserves",
+    "s_t1_reserves",
+    "s_amountOut",
+    "balance",
+    "arb",
+    "optimal_amountIn",
+    "optimal_profit",
+]
+
+# column names of the export file of blind_scan
+BLIND_COL_LIST = [
+    "DEX_pool_no",
+    "t0_address",
+    "t1_address",
+    "DEX_name",
+    "pool_address",
+    "pool_size",
+    "amountOut",
+    "s_DEX_name",
+    "s_pool_address",
+    "s_pool_size",
+    "s_amountOut",
+    "balance",
+    "arb",
+    "optimal_amountIn",
+    "optimal_profit",
+]
+
+# column names of the export file of triangular_scan
+TRIANGULAR_COL_LIST = [
+    "path",
+    "DEX_names",
+    "pool_addresses",
+    "hops",
+    "marginal_rate",
+    "amountIn",
+    "amountOut",
+    "arb",
+]
+
+
+# play the buzzer a number of times to flag a trade
+def play_alert(times):
+    previous = set_phase("alert")
+    for i in range(times):
+        play_obj = simpleaudio.WaveObject.from_wave_file(
+            "mixkit-basketball-buzzer-1647.wav"
+        ).play()
+        play_obj.wait_done()
+        time.sleep(1)
+    set_phase(previous)
+
+
+# build the export row of a quoted pool if the round trip is profitable after the gas allowance
+# quote is the (amountOut, s_amountOut, end_trade) of the pool
+def get_arb_row(
+    pool, dex_name, s_dex_name, quote, base_token_in, gas_allowance, optimal
 ):
-    print("")
-    col_list = [
-        "DEX_pool_no",
-        "t0_address",
-        "t1_address",
-        "DEX_name",
-        "pool_address",
-        "t0_reserves",
-        "t1_reserves",
-        "amountOut",
-        "s_DEX_name",
-        "s_pool_address",
-        "s_t0_reserves",
-        "s_t1_reserves",
-        "s_amountOut",
-        "balance",
-        "arb",
+    amountOut, s_amountOut, end_trade = quote
+    optimal_in, optimal_profit, buy_on_primary = optimal
+    reserves = pool["reserves"]
+    s_reserves = pool["s_reserves"]
+
+    # judge the pool at its profit maximising size rather than the probe size
+    if optimal_in == 0:
+        return None
+    arb = (optimal_profit - Web3.toWei(gas_allowance, "ether")) / optimal_in
+
+    # if other_token == "0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167":
+    #     arb = arb - 0.02
+    # else:
+    #     arb = arb - 0.00166
+
+    if arb <= 0:
+        return None
+
+    return [
+        pool["id"],
+        pool["token0"],
+        pool["token1"],
+        dex_name,
+        pool["pool_address"],
+        reserves[0],
+        reserves[1],
+        amountOut,
+        s_dex_name,
+        pool["s_pool_address"],
+        s_reserves[0],
+        s_reserves[1],
+        s_amountOut,
+        end_trade,
+        arb,
+        optimal_in,
+        optimal_profit,
     ]
-    return_list = []
 
-    wb = Workbook()
-    ws = wb.active
-    ws.append(col_list)
-    wb.save(save_name)
 
-    # load factory abi json
-    with open("./ABIs/" + str(file_name) + ".json", "r") as file:
-        factory_abi = json.loads(file.read())
+# check a quoted pool from blind_scan and return the trade details if it is big enough and profitable
+# quote is the (amountOut, s_amountOut, end_trade) of the pool and optimal is its (amount_in, profit, buy_on_primary) from solve_pools
+# pool sizes are in whole base tokens using base_decimals from the token cache
+def get_blind_trade(
+    pool,
+    base_token,
+    small_cap_threshold,
+    primary_dex,
+    secondary_dex,
+    quote,
+    base_token_in,
+    optimal,
+    base_decimals=DEFAULT_DECIMALS,
+):
+    amountOut, s_amountOut, end_trade = quote
+    optimal_in, optimal_profit, buy_on_primary = optimal
+    reserves = pool["reserves"]
+    s_reserves = pool["s_reserves"]
+
+    # which is base and which is other
+    token_count = 0
+    for addy in [pool["token0"], pool["token1"]]:
+        if addy != base_token:
+            other_token = addy
+        else:
+            pool_value = reserves[token_count] / (10**base_decimals)
+            s_pool_value = s_reserves[token_count] / (10**base_decimals)
+        token_count += 1
+
+    # skip known bad other tokens
+    # bad_other_tokens = ["0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167"]
+    bad_other_tokens = []
+    if other_token in bad_other_tokens:
+        return None
+
+    # check that both pools are above the threshold
+    cond1 = small_cap_threshold == None
+    cond2 = (
+        cond1 == False
+        and pool_value > small_cap_threshold
+        and s_pool_value > small_cap_threshold
+    )
+    if (cond1 or cond2) == False:
+        return None
+
+    # only record those with a profit at the profit maximising size
+    if optimal_profit <= 0:
+        return None
+    pl_perc = (optimal_profit / optimal_in) * 100
+
+    arb = ((amountOut - s_amountOut) / amountOut) * 100
+
+    return {
+        "pl_perc": pl_perc,
+        "amount_in": optimal_in,
+        "profit": optimal_profit,
+        "buy_on_primary": buy_on_primary,
+        "base_decimals": base_decimals,
+        "arb": arb,
+        "other_token": other_token,
+        "pool_value": pool_value,
+        "s_pool_value": s_pool_value,
+        "amountOut": amountOut,
+        "s_amountOut": s_amountOut,
+        "return_list": [
+            pool["id"],
+            pool["token0"],
+            pool["token1"],
+            primary_dex,
+            pool["pool_address"],
+            pool_value,
+            amountOut,
+            secondary_dex,
+            pool["s_pool_address"],
+            s_pool_value,
+            s_amountOut,
+            end_trade,
+            arb,
+            optimal_in,
+            optimal_profit,
+        ],
+    }
 
-    # load pool sample abi json
-    with open("./ABIs/" + str(file_name) + "_pool.json", "r") as file:
-        pool_abi = json.loads(file.read())
 
-    with open("./ABIs/" + str(file_name.split("_")[0]) + "_router.json", "r") as file:
-        router_abi = json.loads(file.read())
+# print a trade found by blind_scan
+def print_blind_trade(trade, base_token, small_cap_threshold, exchange):
+    if trade["buy_on_primary"]:
+        exchange_path = [exchange[0], exchange[1]]
+    else:
+        exchange_path = [exchange[1], exchange[0]]
 
-    # load factory abi json
-    with open("./ABIs/" + str(secondary_dex) + ".json", "r") as file:
-        sdex_factory_abi = json.loads(file.read())
+    print("")
+    print(Fore.GREEN + "##############################")
+    print(
+        Fore.GREEN
+        + f"Trade found at a PROFIT of {round(trade['pl_perc'], 2)}% with an Arbitrage value of {round(trade['arb'], 2)}%"
+    )
+    print(Fore.GREEN + f"Trading {base_token} for {trade['other_token']}")
+    print(
+        Fore.GREEN
+        + f"Minimum pool size is {small_cap_threshold} --- Primary DEX pool size is {round(trade['pool_value'], 0)} and Secondary DEX pool size is {round(trade['s_pool_value'], 0)}"
+    )
+    print(
+        Fore.GREEN
+        + f"Get {trade['amountOut']} from Primary and {trade['s_amountOut']} from Secondary DEX pools"
+    )
+    print(
+        Fore.GREEN
+        + f"Best size is {trade['amount_in'] / 10**trade['base_decimals']} for a profit of {trade['profit'] / 10**trade['base_decimals']}"
+    )
+    print(Fore.GREEN + f"Buy from {exchange_path[0]} and sell to {exchange_path[1]}")
+    print(Fore.GREEN + "##############################")
+    print("")
 
-    # load pool sample abi json
-    with open("./ABIs/" + str(secondary_dex) + "_pool.json", "r") as file:
-        sdex_pool_abi = json.loads(file.read())
 
-    with open(
-        "./ABIs/" + str(secondary_dex.split("_")[0]) + "_router.json", "r"
-    ) as file:
-        sdex_router_abi = json.loads(file.read())
+# give a recommendation of trade path for the latest step of a pair in scan_by_name and keep track of the best one
+def recommend_trade(
+    over_dict,
+    pair,
+    xch_names,
+    best_set,
+    base_token_address,
+    other_token_address,
+    config,
+    blockchain,
+):
+    if over_dict[pair]["potential_trade"][-1] == True:
+        # buy at xch0 and sell at xch1
+        if over_dict[pair]["gross_perc_profit"][-1] > 0:
+            trade_path = str(xch_names[0]) + "-->" + str(xch_names[1])
+        # buy at xch1 and sell at xch0
+        else:
+            trade_path = str(xch_names[1]) + "-->" + str(xch_names[0])
+
+        if abs(over_dict[pair]["gross_perc_profit"][-1]) > abs(best_set["trade_value"]):
+            # check market depth
+            best_set["trade_value"] = over_dict[pair]["gross_perc_profit"][-1]
+            best_set["pair_name"] = pair
+            best_set["trade_path"] = trade_path
+            best_set["base_token"] = base_token_address
+            best_set["other_token"] = other_token_address
+            best_set["xch0"] = config[blockchain][xch_names[0]]["pool_pairs"][pair]
+            best_set["xch1"] = config[blockchain][xch_names[1]]["pool_pairs"][pair]
 
-    config = load_config()
-    w3 = Web3(Web3.HTTPProvider(config[blockchain]["network"]["mainnet"]))
-    factory_address = w3.toChecksumAddress(
-        config[blockchain][file_name.split("_")[0]][file_name]
-    )
-    factory_contract = w3.eth.contract(abi=factory_abi, address=factory_address)
+    else:
+        # do not trade
+        trade_path = ""
 
-    dex_router_contract = w3.eth.contract(
-        abi=router_abi,
-        address=config[blockchain][file_name.split("_")[0]][
-            str(file_name.split("_")[0]) + "_router"
-        ],
-    )
+    over_dict[pair]["trade_path"].append(trade_path)
+    return over_dict, best_set
 
-    if selected_ids == None:
-        record_length = factory_contract.functions.allPairsLength().call()
-        sample_range = list(range(record_length))
-    else:
-        sample_range = selected_ids
 
-    sdex_address = w3.toChecksumAddress(
-        config[blockchain][secondary_dex.split("_")[0]][secondary_dex]
-    )
-    sdex_contract = w3.eth.contract(abi=sdex_factory_abi, address=sdex_address)
+# print the banner shown at the end of a scan
+def print_complete():
+    print("")
+    print("##########################################")
+    print("")
+    print("   Download Complete!")
+    print("")
+    print("##########################################")
+    print("")
 
-    s_dex_router_contract = w3.eth.contract(
-        abi=sdex_router_abi,
-        address=config[blockchain][secondary_dex.split("_")[0]][
-            str(secondary_dex.split("_")[0]) + "_router"
-        ],
-    )
 
-    for i in tqdm(sample_range, "Downloading: ", leave=False):
-        pool_address = factory_contract.functions.allPairs(i).call()
-        pool_address = w3.toChecksumAddress(pool_address)
-        pool_contract = w3.eth.contract(abi=pool_abi, address=pool_address)
-
-        # get pool data
-        reserves = pool_contract.functions.getReserves().call()
-        token0_address = pool_contract.functions.token0().call()
-        token1_address = pool_contract.functions.token1().call()
-
-        reserves[0] = reserves[0]
-        reserves[1] = reserves[1]
-
-        # see if the same pool exists in pancake swap - secondary_dex
-        try:
-            sdex_pool_address = sdex_contract.functions.getPair(
-                token0_address, token1_address
-            ).call()
-            sdex_pool_address = w3.toChecksumAddress(sdex_pool_address)
-            sdex_pool_contract = w3.eth.contract(
-                abi=sdex_pool_abi, address=sdex_pool_address
-            )
+# function to scan the factory contract and get all pairs - useful for prospecting viable arb pairs
+# note that it is only useful for pairs with base token e.g. wbnb, otherwise changes to code will be required
+# with resume set the sweep carries on after the last checkpoint and adds to the results it already has
+def get_pairs_from_factory(
+    file_name,
+    blockchain,
+    secondary_dex,
+    selected_ids,
+    save_name,
+    base_token,
+    resume=False,
+):
+    print("")
+    start_cycle("get_pairs_from_factory")
+    scan_start = time.time()
+    sink = open_sink(
+        save_name, ARB_COL_LIST, load_config()[blockchain]["sink"], append=resume
+    )
 
-            # get secondary pool data
-            s_reserves = sdex_pool_contract.functions.getReserves().call()
-            s_reserves[0] = s_reserves[0]
-            s_reserves[1] = s_reserves[1]
-
-            # determine how many other tokens the base token will get
-            base_token_in = 1
-            base_token_in = Web3.toWei(base_token_in, "ether")
-            for addy in [token0_address, token1_address]:
-                if addy != base_token:
-                    other_token = addy
-                    break
-            trade_path = [base_token, other_token]
-            amountOut = dex_router_contract.functions.getAmountsOut(
-                base_token_in, trade_path
-            ).call()[1]
-            s_amountOut = s_dex_router_contract.functions.getAmountsOut(
-                base_token_in, trade_path
-            ).call()[1]
-
-            # find the better value
-            if amountOut > s_amountOut:
-                end_trade = s_dex_router_contract.functions.getAmountsOut(
-                    amountOut, [other_token, base_token]
-                ).call()[1]
-            elif amountOut < s_amountOut:
-                end_trade = dex_router_contract.functions.getAmountsOut(
-                    s_amountOut, [other_token, base_token]
-                ).call()[1]
-            else:
-                end_trade = s_dex_router_contract.functions.getAmountsOut(
-                    amountOut, [other_token, base_token]
-                ).call()[1]
-
-            arb = (end_trade - base_token_in) / base_token_in
-            arb = arb - 0.00166
-
-            # if other_token == "0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167":
-            #     arb = arb - 0.02
-            # else:
-            #     arb = arb - 0.00166
-
-            if arb > 0:
-                return_list = [
-                    i,
-                    token0_address,
-                    token1_address,
-                    file_name.split("_")[0],
-                    pool_address,
-                    reserves[0],
-                    reserves[1],
-                    amountOut,
-                    secondary_dex.split("_")[0],
-                    sdex_pool_address,
-                    s_reserves[0],
-                    s_reserves[1],
-                    s_amountOut,
-                    end_trade,
-                    arb,
-                ]
+    # load factory abi json
+    factory_abi = load_abi(str(file_name))
 
-                book = load_workbook(save_name)
-                sheet = book.active
-                sheet.append(return_list)
-                book.save(save_name)
+    # load pool sample abi json
+    pool_abi = load_abi(str(file_name) + "_pool")
 
-                for i in range(5):
-                    play_obj = simpleaudio.WaveObject.from_wave_file(
-                        "mixkit-basketball-buzzer-1647.wav"
-                    ).play()
-                    play_obj.wait_done()
-                    time.sleep(1)
+    # load pool sample abi json
+    sdex_pool_abi = load_abi(str(secondary_dex) + "_pool")
 
-        except:
-            pass
+    config = load_config()
+    w3 = get_web3(blockchain)
+    dex_name = file_name.split("_")[0]
+    s_dex_name = secondary_dex.split("_")[0]
+    factory_address = w3.toChecksumAddress(config[blockchain][dex_name][file_name])
+    factory_contract = getContract(blockchain, factory_address, factory_abi)
+
+    # get the swap fee of both dexes and the gas allowance of the chain
+    fee = get_fee(config, blockchain, dex_name)
+    s_fee = get_fee(config, blockchain, s_dex_name)
+    gas_allowance = config[blockchain]["gas_allowance"]
+
+    # the pools of the secondary dex are looked up in the cross dex pair index of the base token
+    set_phase("enumerate")
+    pair_index = get_pair_index(w3, blockchain, [s_dex_name], base_token)
+
+    # skip the pools that were done before the last checkpoint
+    checkpoints = open_checkpoints(config[blockchain]["checkpoints"]["file"])
+    scan_key = "get_pairs_from_factory:" + s_dex_name
+    last_index = -1
+    if resume:
+        last_index = get_resume_index(checkpoints, scan_key, dex_name, 0)
+
+    base_token_in = 1
+    base_token_in = Web3.toWei(base_token_in, "ether")
+
+    # the export row of a pool that is profitable after the gas allowance
+    def get_hit(pool, quote, optimal):
+        return get_arb_row(
+            pool=pool,
+            dex_name=dex_name,
+            s_dex_name=s_dex_name,
+            quote=quote,
+            base_token_in=base_token_in,
+            optimal=optimal,
+            gas_allowance=gas_allowance,
+        )
 
+    # only the pools that hold the base token stream from the token index of the pair registry in index order,
+    # those that exist on the secondary dex and come after the checkpoint are read, quoted and recorded a
+    # chunk at a time
+    if selected_ids != None:
+        selected_ids = sorted(selected_ids)
+    pools = iter_registered_pools(
+        w3, blockchain, factory_contract, pool_abi, selected_ids, token=base_token
+    )
+    pools = iter_matched_pools(pair_index, pools, s_dex_name)
+    pools = filter_pools(pools, lambda p: p["id"] > last_index)
+    stats = run_scan(
+        pools,
+        {
+            "batch_size": config[blockchain]["checkpoints"]["chunk_size"],
+            "fetch": lambda chunk: fetch_pool_reserves(
+                w3, blockchain, pool_abi, sdex_pool_abi, chunk
+            ),
+            "prefetch": config[blockchain]["pipeline"]["prefetch"],
+            "base_token": base_token,
+            "base_token_in": base_token_in,
+            "fee": fee,
+            "s_fee": s_fee,
+            "get_hit": get_hit,
+            "sink": sink,
+            "on_hit": lambda row: play_alert(5),
+            "checkpoint": {
+                "conn": checkpoints,
+                "scan": scan_key,
+                "factory": dex_name,
+                "cycle": 0,
+            },
+        },
+    )
 
+    set_phase("report")
+    clear_checkpoint(checkpoints, scan_key, dex_name)
+    checkpoints.close()
+    close_sink(sink)
+    record_cycle(
+        "get_pairs_from_factory",
+        stats["pools"],
+        stats["candidates"],
+        stats["hits"],
+        time.time() - scan_start,
+    )
+    end_cycle()
+
+
+# function to find the pairs that are listed on more than one of the given dexes in a single pass
+# every factory is enumerated once through the pair registry, so pairs without any overlap cost nothing to skip
+def get_cross_dex_pairs(blockchain, dex_names, save_name, base_token=None, min_dexes=2):
+    w3 = get_web3(blockchain)
+    pair_index = get_pair_index(w3, blockchain, dex_names)
+    overlap = get_overlap(pair_index, dex_names, min_dexes)
+
+    rows = []
+    for (token0, token1), dex_pools in overlap.items():
+        if base_token != None and base_token not in [token0, token1]:
+            continue
+        row = {"token0": token0, "token1": token1, "dex_count": len(dex_pools)}
+        for dex_name in dex_names:
+            row[dex_name] = dex_pools.get(dex_name, "")
+        rows.append(row)
+
+    df = pd.DataFrame(rows, columns=["token0", "token1", "dex_count"] + dex_names)
+    df = df.sort_values("dex_count", ascending=False)
+    df.to_excel(save_name, index=False)
+    print(f"{len(df)} pairs are listed on at least {min_dexes} dexes")
+    return df
+
+
+# hour is the number of steps, each pair is read once per step and nap is the seconds between steps
+# with a scheduler every step is a round at a new block and only the pairs that are due in it are read
 def scan_by_name(
     pair_names,
     xch_names,
     blockchain,
     base_token,
+    hour=5,
+    scheduler=None,
+    nap=300,
 ):
 
     print("")
+    start_cycle("scan_by_name")
 
-    # define time intervals to prevent spamming
-    nap = 300
-    hour = 5
-    trade_path = ""
     small_cap = False
 
     best_set = {
@@ -500,322 +1402,328 @@ def scan_by_name(
     }
 
     # get dictionaries
-    over_dict, skip_pair = prep_export_dict(pair_names, xch_names)
+    over_dict = prep_export_dict(pair_names, xch_names)
+
+    # percentage lost to swap fees when buying on one exchange and selling on the other
+    deductable = round_trip_fee_perc(load_config(), blockchain, xch_names)
+
+    # every step is appended to the history store instead of being kept in memory
+    history = open_history(load_config()[blockchain]["history"])
 
     for step in range(hour):
         # for step in tqdm(range(hour), "Downloading: ", leave=True):
-        if step > 0:
+        active_pairs = pair_names
+        if scheduler != None:
+            start_round(scheduler, get_web3(blockchain))
+            due = select_due(scheduler, pair_names)
+            active_pairs = [i for i in pair_names if i in due]
+        elif step > 0:
             time.sleep(nap)
+        if step > 0:
+            start_cycle("scan_by_name")
 
-        # for each pair search all exchanges provided
-        for i in tqdm(pair_names, "Scanning: ", leave=False):
-            if skip_pair[i] == 0:
-                for j in xch_names:
-                    config = load_config()
-                    pair_address = config[blockchain][j]["pool_pairs"][i]
-                    (
-                        t0_reserve,
-                        t1_reserve,
-                        swap_ratio,
-                        split_pair_name,
-                        base_token_address,
-                        other_token_address,
-                        base_reserve,
-                    ) = get_specific_pair(
-                        xch_name=j,
-                        blockchain=blockchain,
-                        address=pair_address,
-                        pair_name=i,
-                        base_token=base_token,
-                    )
+        # every pair of a step is read at the same block so the exchanges can be compared
+        set_phase("fetch")
+        step_start = time.time()
+        block = pin_block(get_web3(blockchain))
+        scanned = 0
+        hits = 0
 
-                    # save onchain data to dictionary for export to excel
-                    over_dict[i][j + str("_") + str(split_pair_name[0])].append(
-                        t0_reserve
-                    )
-                    over_dict[i][j + str("_") + str(split_pair_name[1])].append(
-                        t1_reserve
-                    )
-                    over_dict[i][j + str("_buy_with_base")].append(swap_ratio)
-
-                # get arbitrage value
-                over_dict = arb_value(
-                    over_dict=over_dict,
-                    xch_names=xch_names,
-                    pair=i,
-                    small_cap=small_cap,
+        # for each pair search all exchanges provided
+        for i in tqdm(active_pairs, "Scanning: ", leave=False):
+            set_phase("fetch")
+            for j in xch_names:
+                config = load_config()
+                pair_address = config[blockchain][j]["pool_pairs"][i]
+                (
+                    t0_reserve,
+                    t1_reserve,
+                    swap_ratio,
+                    split_pair_name,
+                    base_token_address,
+                    other_token_address,
+                    base_reserve,
+                ) = get_specific_pair(
+                    xch_name=j,
+                    blockchain=blockchain,
+                    address=pair_address,
+                    pair_name=i,
+                    base_token=base_token,
+                    block_identifier=block,
                 )
 
-                # give a recommendation of trade path
-                if over_dict[i]["potential_trade"][-1] == True:
-                    # buy at xch0 and sell at xch1
-                    if over_dict[i]["gross_perc_profit"][-1] > 0:
-                        trade_path = str(xch_names[0]) + "-->" + str(xch_names[1])
-                    # buy at xch1 and sell at xch0
-                    else:
-                        trade_path = str(xch_names[1]) + "-->" + str(xch_names[0])
-
-                    if abs(over_dict[i]["gross_perc_profit"][-1]) > abs(
-                        best_set["trade_value"]
-                    ):
-                        # check market depth
-                        best_set["trade_value"] = over_dict[i]["gross_perc_profit"][-1]
-                        best_set["pair_name"] = i
-                        best_set["trade_path"] = trade_path
-                        best_set["base_token"] = base_token_address
-                        best_set["other_token"] = other_token_address
-                        best_set["xch0"] = config[blockchain][xch_names[0]][
-                            "pool_pairs"
-                        ][i]
-                        best_set["xch1"] = config[blockchain][xch_names[1]][
-                            "pool_pairs"
-                        ][i]
-
-                else:
-                    # do not trade
-                    trade_path = ""
-
-                over_dict[i]["trade_path"].append(trade_path)
-
-            else:
-                if skip_pair[i] <= hour:
-                    skip_pair[i] += 1
-                else:
-                    skip_pair[i] = 0
-
-    # if the export file already exists then update it - otherwise create an export file
-    file_path = "./Outputs/scanned_pairs_results.xlsx"
-
-    if os.path.exists(file_path) == False:
-        writer = pd.ExcelWriter(file_path)
-        for i in over_dict:
-            df = pd.DataFrame(over_dict[i])
-            df.to_excel(writer, sheet_name=i)
-            writer.save()
-        writer.close()
-        book = load_workbook(file_path)
-        book.save(file_path)
-
-    else:
-        book = load_workbook(file_path)
-        writer = pd.ExcelWriter(
-            file_path, engine="openpyxl", mode="a", if_sheet_exists="replace"
-        )
-        for i in over_dict:
-            df = pd.DataFrame(over_dict[i])
-            df.to_excel(writer, sheet_name=i)
-            book.save(file_path)
-
-    print("")
-    print("##########################################")
-    print("")
-    print("   Download Complete!")
-    print("")
-    print("##########################################")
-    print("")
-
+                # save onchain data to dictionary for export to excel
+                over_dict[i][j + str("_") + str(split_pair_name[0])].append(t0_reserve)
+                over_dict[i][j + str("_") + str(split_pair_name[1])].append(t1_reserve)
+                over_dict[i][j + str("_buy_with_base")].append(swap_ratio)
+
+            # get arbitrage value
+            set_phase("evaluate")
+            over_dict = arb_value(
+                over_dict=over_dict,
+                xch_names=xch_names,
+                pair=i,
+                small_cap=small_cap,
+                deductable=deductable,
+            )
 
+            # give a recommendation of trade path
+            over_dict, best_set = recommend_trade(
+                over_dict=over_dict,
+                pair=i,
+                xch_names=xch_names,
+                best_set=best_set,
+                base_token_address=base_token_address,
+                other_token_address=other_token_address,
+                config=config,
+                blockchain=blockchain,
+            )
+            set_phase("report")
+            record_step(history, over_dict, i, xch_names, step)
+            scanned += 1
+            if over_dict[i]["potential_trade"][-1] == True:
+                hits += 1
+            if scheduler != None:
+                edge, liquidity = get_pair_edge(
+                    over_dict, xch_names, i, base_token, deductable
+                )
+                record_read(scheduler, i, edge, liquidity)
+
+        set_phase("report")
+        flush_history(history)
+        # every pair that is read gets a quote so all of them are candidates
+        record_cycle("scan_by_name", scanned, scanned, hits, time.time() - step_start)
+        if scheduler != None:
+            record_tiers("scan_by_name", count_tiers(scheduler))
+        end_cycle()
+
+    close_history(history)
+    # the steps of this scan are also written to an xlsx report unless excel_report is set to null
+    report_path = load_config()[blockchain]["history"].get("excel_report")
+    if report_path != None:
+        export_history_excel(history["folder"], report_path, history["opened"])
+    print_complete()
+
+
+# the scan runs until a trade is found or for max_cycles cycles when it is set
+# the pools are the selected ids of the primary factory or, with pair_names set, the named pairs of the
+# pool_pairs of both dexes
+# returns the time each cycle took, not counting the wait for a new block
 def scan_by_ID(
-    primary_dex, secondary_dex, blockchain, selected_ids, save_name, base_token
+    primary_dex,
+    secondary_dex,
+    blockchain,
+    selected_ids,
+    save_name,
+    base_token,
+    max_cycles=None,
+    pair_names=None,
 ):
     print("")
-    col_list = [
-        "DEX_pool_no",
-        "t0_address",
-        "t1_address",
-        "DEX_name",
-        "pool_address",
-        "t0_reserves",
-        "t1_reserves",
-        "amountOut",
-        "s_DEX_name",
-        "s_pool_address",
-        "s_t0_reserves",
-        "s_t1_reserves",
-        "s_amountOut",
-        "balance",
-        "arb",
-    ]
-    return_list = []
-
-    wb = Workbook()
-    ws = wb.active
-    ws.append(col_list)
-    wb.save(save_name)
-
-    # load factory abi json
-    with open("./ABIs/" + str(primary_dex) + "_factory.json", "r") as file:
-        factory_abi = json.loads(file.read())
-
-    # load pool sample abi json
-    with open("./ABIs/" + str(primary_dex) + "_factory_pool.json", "r") as file:
-        pool_abi = json.loads(file.read())
-
-    with open("./ABIs/" + str(primary_dex) + "_router.json", "r") as file:
-        router_abi = json.loads(file.read())
+    start_cycle("scan_by_ID")
+    sink = open_sink(save_name, ARB_COL_LIST, load_config()[blockchain]["sink"])
 
     # load factory abi json
-    with open("./ABIs/" + str(secondary_dex) + "_factory.json", "r") as file:
-        sdex_factory_abi = json.loads(file.read())
+    factory_abi = load_abi(str(primary_dex) + "_factory")
 
     # load pool sample abi json
-    with open("./ABIs/" + str(secondary_dex) + "_factory_pool.json", "r") as file:
-        sdex_pool_abi = json.loads(file.read())
-
-    with open(
-        "./ABIs/" + str(secondary_dex.split("_")[0]) + "_router.json", "r"
-    ) as file:
-        sdex_router_abi = json.loads(file.read())
+    pool_abi = load_abi(str(primary_dex) + "_factory_pool")
 
     config = load_config()
-    w3 = Web3(Web3.HTTPProvider(config[blockchain]["network"]["mainnet"]))
+    w3 = get_web3(blockchain)
     factory_address = w3.toChecksumAddress(
         config[blockchain][primary_dex][str(primary_dex) + "_factory"]
     )
-    factory_contract = w3.eth.contract(abi=factory_abi, address=factory_address)
-
-    dex_router_contract = w3.eth.contract(
-        abi=router_abi,
-        address=config[blockchain][primary_dex][str(primary_dex) + "_router"],
-    )
-
-    if selected_ids == None:
-        record_length = factory_contract.functions.allPairsLength().call()
-        sample_range = list(range(record_length))
+    factory_contract = getContract(blockchain, factory_address, factory_abi)
+
+    # get the swap fee of both dexes and the gas allowance of the chain
+    fee = get_fee(config, blockchain, primary_dex)
+    s_fee = get_fee(config, blockchain, secondary_dex)
+    gas_allowance = config[blockchain]["gas_allowance"]
+
+    # pool addresses and tokens never change so get them once
+    set_phase("enumerate")
+    if pair_names == None:
+        # the pools of the secondary dex are looked up in the cross dex pair index of the base token
+        pair_index = get_pair_index(w3, blockchain, [secondary_dex], base_token)
+        pools = get_registered_pools(
+            w3, blockchain, factory_contract, pool_abi, selected_ids, token=base_token
+        )
+        pools = list(iter_matched_pools(pair_index, pools, secondary_dex))
     else:
-        sample_range = selected_ids
-
-    sdex_address = w3.toChecksumAddress(
-        config[blockchain][secondary_dex][str(secondary_dex) + "_factory"]
-    )
-    sdex_contract = w3.eth.contract(abi=sdex_factory_abi, address=sdex_address)
-
-    s_dex_router_contract = w3.eth.contract(
-        abi=sdex_router_abi,
-        address=config[blockchain][secondary_dex][str(secondary_dex) + "_router"],
+        pools = get_named_pools(w3, blockchain, primary_dex, secondary_dex, pair_names)
+        pools = [p for p in pools if base_token in [p["token0"], p["token1"]]]
+
+    # read the reserves once and then keep them up to date from Sync events
+    set_phase("fetch")
+    tracker = start_tracker(
+        w3,
+        config,
+        blockchain,
+        [p["pool_address"] for p in pools] + [p["s_pool_address"] for p in pools],
+        pool_abi,
     )
+    poll_interval = config[blockchain]["reserve_tracker"]["poll_interval"]
+
+    base_token_in = 1
+    base_token_in = Web3.toWei(base_token_in, "ether")
+
+    # the export row of a pool that is profitable after the gas allowance
+    def get_hit(pool, quote, optimal):
+        return get_arb_row(
+            pool=pool,
+            dex_name=primary_dex,
+            s_dex_name=secondary_dex,
+            quote=quote,
+            base_token_in=base_token_in,
+            optimal=optimal,
+            gas_allowance=gas_allowance,
+        )
 
     count = 0
+    cycle_times = []
     SEARCHING = True
-    while SEARCHING == True:
-        nap = 300
+    while SEARCHING == True and (max_cycles == None or count < max_cycles):
         if count > 0:
-            time.sleep(nap)
-
-        for i in tqdm(sample_range, "Downloading: ", leave=False):
-            pool_address = factory_contract.functions.allPairs(i).call()
-            pool_address = w3.toChecksumAddress(pool_address)
-            pool_contract = w3.eth.contract(abi=pool_abi, address=pool_address)
-
-            # get pool data
-            reserves = pool_contract.functions.getReserves().call()
-            token0_address = pool_contract.functions.token0().call()
-            token1_address = pool_contract.functions.token1().call()
-
-            reserves[0] = reserves[0]
-            reserves[1] = reserves[1]
-
-            # see if the same pool exists in pancake swap - secondary_dex
-            try:
-                sdex_pool_address = sdex_contract.functions.getPair(
-                    token0_address, token1_address
-                ).call()
-                sdex_pool_address = w3.toChecksumAddress(sdex_pool_address)
-                sdex_pool_contract = w3.eth.contract(
-                    abi=sdex_pool_abi, address=sdex_pool_address
-                )
+            wait_for_block(tracker, poll_interval)
+            start_cycle("scan_by_ID", "fetch")
+        cycle_start = time.time()
+
+        # only pools with a Sync event since the last cycle can have a new spread
+        changed = update_tracker(tracker)
+        if count == 0:
+            changed_pools = pools
+        else:
+            changed_pools = filter_pools(
+                pools,
+                lambda p: p["pool_address"] in changed
+                or p["s_pool_address"] in changed,
+            )
 
-                # get secondary pool data
-                s_reserves = sdex_pool_contract.functions.getReserves().call()
-                s_reserves[0] = s_reserves[0]
-                s_reserves[1] = s_reserves[1]
-
-                # determine how many other tokens the base token will get
-                base_token_in = 1
-                base_token_in = Web3.toWei(base_token_in, "ether")
-                for addy in [token0_address, token1_address]:
-                    if addy != base_token:
-                        other_token = addy
-                        break
-                trade_path = [base_token, other_token]
-                amountOut = dex_router_contract.functions.getAmountsOut(
-                    base_token_in, trade_path
-                ).call()[1]
-                s_amountOut = s_dex_router_contract.functions.getAmountsOut(
-                    base_token_in, trade_path
-                ).call()[1]
-
-                # find the better value
-                if amountOut > s_amountOut:
-                    end_trade = s_dex_router_contract.functions.getAmountsOut(
-                        amountOut, [other_token, base_token]
-                    ).call()[1]
-                elif amountOut < s_amountOut:
-                    end_trade = dex_router_contract.functions.getAmountsOut(
-                        s_amountOut, [other_token, base_token]
-                    ).call()[1]
-                else:
-                    end_trade = s_dex_router_contract.functions.getAmountsOut(
-                        amountOut, [other_token, base_token]
-                    ).call()[1]
-
-                arb = (end_trade - base_token_in) / base_token_in
-                arb = arb - 0.00166
-
-                # if other_token == "0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167":
-                #     arb = arb - 0.02
-                # else:
-                #     arb = arb - 0.00166
-
-                if arb > 0:
-                    return_list = [
-                        i,
-                        token0_address,
-                        token1_address,
-                        primary_dex,
-                        pool_address,
-                        reserves[0],
-                        reserves[1],
-                        amountOut,
-                        secondary_dex,
-                        sdex_pool_address,
-                        s_reserves[0],
-                        s_reserves[1],
-                        s_amountOut,
-                        end_trade,
-                        arb,
-                    ]
-
-                    book = load_workbook(save_name)
-                    sheet = book.active
-                    sheet.append(return_list)
-                    book.save(save_name)
-
-                    for i in range(20):
-                        play_obj = simpleaudio.WaveObject.from_wave_file(
-                            "mixkit-basketball-buzzer-1647.wav"
-                        ).play()
-                        play_obj.wait_done()
-                        time.sleep(1)
-
-                    SEARCHING = False
-
-            except:
-                pass
+        # the reserves are already in the tracker so there is nothing to read ahead
+        stats = run_scan(
+            changed_pools,
+            {
+                "batch_size": config[blockchain]["checkpoints"]["chunk_size"],
+                "fetch": lambda chunk: get_tracked_reserves(tracker, chunk),
+                "prefetch": 0,
+                "base_token": base_token,
+                "base_token_in": base_token_in,
+                "fee": fee,
+                "s_fee": s_fee,
+                "get_hit": get_hit,
+                "sink": sink,
+                "on_hit": lambda row: play_alert(20),
+            },
+        )
+        if stats["hits"] > 0:
+            SEARCHING = False
 
         count += 1
+        cycle_times.append(time.time() - cycle_start)
+        set_phase("report")
+        record_cycle(
+            "scan_by_ID",
+            stats["pools"],
+            stats["candidates"],
+            stats["hits"],
+            cycle_times[-1],
+        )
+        end_cycle()
 
         print(f"Cycle {count} complete")
 
-    print("")
-    print("##########################################")
-    print("")
-    print("   Download Complete!")
-    print("")
-    print("##########################################")
-    print("")
+    close_sink(sink)
+    print_complete()
+    return cycle_times
+
 
+# get what a blind scan of two dexes needs before it reads any pools: the contracts, abis, fees and the base
+# token amount that is quoted
+def get_blind_setup(primary_dex, secondary_dex, blockchain, base_token):
+    config = load_config()
+    w3 = get_web3(blockchain)
+    factory_address = w3.toChecksumAddress(
+        config[blockchain][primary_dex][str(primary_dex) + "_factory"]
+    )
+
+    # quote one whole base token using its decimals from the token cache
+    base_decimals = get_token_metadata(w3, blockchain, [base_token])[base_token][
+        "decimals"
+    ]
+    return {
+        "config": config,
+        "w3": w3,
+        "factory_contract": getContract(
+            blockchain, factory_address, load_abi(str(primary_dex) + "_factory")
+        ),
+        "factories": [
+            factory_address,
+            w3.toChecksumAddress(
+                config[blockchain][secondary_dex][str(secondary_dex) + "_factory"]
+            ),
+        ],
+        "pool_abi": load_abi(str(primary_dex) + "_factory_pool"),
+        "sdex_pool_abi": load_abi(str(secondary_dex) + "_factory_pool"),
+        "fee": get_fee(config, blockchain, primary_dex),
+        "s_fee": get_fee(config, blockchain, secondary_dex),
+        "base_decimals": base_decimals,
+        "base_token_in": 10**base_decimals,
+        "registry": None,
+        "pools": None,
+        "seen": set(),
+    }
 
+
+# stream the matched pools of a blind scan from the pair registry
+# only the pools that hold the base token stream from the token index of the pair registry in index order,
+# the other pools are never loaded and pools that aren't on the secondary dex are skipped before any calls
+def iter_blind_pools(setup, blockchain, secondary_dex, base_token):
+    w3 = setup["w3"]
+    # the pools of the secondary dex are looked up in the cross dex pair index of the base token
+    pair_index = get_pair_index(w3, blockchain, [secondary_dex], base_token)
+    pools = iter_registered_pools(
+        w3, blockchain, setup["factory_contract"], setup["pool_abi"], token=base_token
+    )
+    return iter_matched_pools(pair_index, pools, secondary_dex)
+
+
+# get the matched pools of a scheduled blind scan, they are kept in the setup between rounds
+# the pools are read from the registry in the first round and again only when discovery finds pairs of either
+# dex that weren't seen before, without discovery they are kept for the whole run
+def get_scheduled_pools(setup, blockchain, secondary_dex, base_token, block):
+    discovery = setup["config"][blockchain]["discovery"]
+    if discovery["enabled"]:
+        if setup["registry"] == None:
+            setup["registry"] = open_registry(
+                setup["config"][blockchain]["pair_registry"]
+            )
+        created = discover_pairs(
+            setup["registry"],
+            setup["w3"],
+            blockchain,
+            setup["factories"],
+            discovery,
+            block,
+        )
+        new_addresses = (
+            set(p["pool_address"] for pools in created.values() for p in pools)
+            - setup["seen"]
+        )
+        setup["seen"] |= new_addresses
+        if len(new_addresses) > 0:
+            setup["pools"] = None
+
+    if setup["pools"] == None:
+        setup["pools"] = list(
+            iter_blind_pools(setup, blockchain, secondary_dex, base_token)
+        )
+    return setup["pools"]
+
+
+# with a scheduler blind_scan is called for every round of the scheduler, the setup and the matched pools are
+# kept in the scheduler between rounds and only the pools that are due in the round are read, the round is
+# started by the caller and isn't checkpointed as it only reads a few pools
 def blind_scan(
     primary_dex,
     secondary_dex,
@@ -824,246 +1732,270 @@ def blind_scan(
     base_token,
     small_cap_threshold,
     exchange,
+    sink=None,
+    resume=False,
+    cycle=0,
+    scheduler=None,
 ):
-    print("")
-    col_list = [
-        "DEX_pool_no",
-        "t0_address",
-        "t1_address",
-        "DEX_name",
-        "pool_address",
-        "pool_size",
-        "amountOut",
-        "s_DEX_name",
-        "s_pool_address",
-        "s_pool_size",
-        "s_amountOut",
-        "balance",
-        "arb",
-    ]
-    return_list = []
+    if scheduler == None:
+        print("")
+    start_cycle("blind_scan")
+    scan_start = time.time()
+    # a sink can be passed in to keep the hits of many scans in one file
+    own_sink = sink == None
+    if own_sink:
+        sink = open_sink(
+            save_name, BLIND_COL_LIST, load_config()[blockchain]["sink"], append=resume
+        )
 
-    wb = Workbook()
-    ws = wb.active
-    ws.append(col_list)
-    wb.save(save_name)
+    set_phase("fetch")
+    if scheduler == None:
+        setup = get_blind_setup(primary_dex, secondary_dex, blockchain, base_token)
+    else:
+        if scheduler["scan"] == None:
+            scheduler["scan"] = get_blind_setup(
+                primary_dex, secondary_dex, blockchain, base_token
+            )
+        setup = scheduler["scan"]
+    config = setup["config"]
+    w3 = setup["w3"]
+    base_decimals = setup["base_decimals"]
+    base_token_in = setup["base_token_in"]
+
+    # the trade of a pool that is big enough and profitable
+    def get_hit(pool, quote, optimal):
+        return get_blind_trade(
+            pool=pool,
+            base_token=base_token,
+            small_cap_threshold=small_cap_threshold,
+            primary_dex=primary_dex,
+            secondary_dex=secondary_dex,
+            quote=quote,
+            base_token_in=base_token_in,
+            optimal=optimal,
+            base_decimals=base_decimals,
+        )
 
-    # load factory abi json
-    with open("./ABIs/" + str(primary_dex) + "_factory.json", "r") as file:
-        factory_abi = json.loads(file.read())
+    # print a trade and keep its row so the trades can be ranked at the end
+    trades = []
+
+    def report_trade(trade):
+        print_blind_trade(trade, base_token, small_cap_threshold, exchange)
+        trades.append(trade["return_list"])
+
+    set_phase("enumerate")
+    checkpoint = None
+    if scheduler == None:
+        # skip the pools of this cycle that were done before the last checkpoint
+        checkpoints = open_checkpoints(config[blockchain]["checkpoints"]["file"])
+        scan_key = "blind_scan:" + secondary_dex
+        last_index = -1
+        if resume:
+            last_index = get_resume_index(checkpoints, scan_key, primary_dex, cycle)
+        checkpoint = {
+            "conn": checkpoints,
+            "scan": scan_key,
+            "factory": primary_dex,
+            "cycle": cycle,
+        }
+
+        # pools that were done before the checkpoint are skipped before any calls are made, the rest are read,
+        # quoted and recorded a chunk at a time so a restart only repeats the chunk it was on
+        pools = iter_blind_pools(setup, blockchain, secondary_dex, base_token)
+        pools = filter_pools(pools, lambda p: p["id"] > last_index)
+    else:
+        pools = get_scheduled_pools(
+            setup, blockchain, secondary_dex, base_token, scheduler["block"]
+        )
+        due = select_due(scheduler, [p["id"] for p in pools])
+        pools = filter_pools(pools, lambda p: p["id"] in due)
+
+    stats = run_scan(
+        pools,
+        {
+            "batch_size": config[blockchain]["checkpoints"]["chunk_size"],
+            "fetch": lambda chunk: fetch_pool_reserves(
+                w3, blockchain, setup["pool_abi"], setup["sdex_pool_abi"], chunk
+            ),
+            "prefetch": config[blockchain]["pipeline"]["prefetch"],
+            "base_token": base_token,
+            "base_token_in": base_token_in,
+            "fee": setup["fee"],
+            "s_fee": setup["s_fee"],
+            "get_hit": get_hit,
+            "sink": sink,
+            "get_row": lambda trade: trade["return_list"],
+            "on_hit": report_trade,
+            "checkpoint": checkpoint,
+            "scheduler": scheduler,
+        },
+    )
 
-    # load pool sample abi json
-    with open("./ABIs/" + str(primary_dex) + "_factory_pool.json", "r") as file:
-        pool_abi = json.loads(file.read())
+    set_phase("report")
+    if checkpoint != None:
+        # the cycle is done so a resume starts the next one from the beginning
+        save_checkpoint(checkpoints, scan_key, primary_dex, cycle + 1, -1)
+        checkpoints.close()
+
+    if own_sink:
+        close_sink(sink)
+
+    record_cycle(
+        "blind_scan",
+        stats["pools"],
+        stats["candidates"],
+        stats["hits"],
+        time.time() - scan_start,
+    )
+    if scheduler != None:
+        tiers = count_tiers(scheduler)
+        record_tiers("blind_scan", tiers)
+        print(
+            f"Read {stats['pools']} pools at block {scheduler['block']}, "
+            + ", ".join(f"{count} {tier}" for tier, count in tiers.items())
+        )
 
-    with open("./ABIs/" + str(primary_dex) + "_router.json", "r") as file:
-        router_abi = json.loads(file.read())
+    # rank the trades by the profit at their best size, the last column of the return list
+    trades = sorted(trades, key=lambda row: row[-1], reverse=True)
 
-    # load factory abi json
-    with open("./ABIs/" + str(secondary_dex) + "_factory.json", "r") as file:
-        sdex_factory_abi = json.loads(file.read())
+    if scheduler == None:
+        print_complete()
+    end_cycle()
+    return trades
 
-    # load pool sample abi json
-    with open("./ABIs/" + str(secondary_dex) + "_factory_pool.json", "r") as file:
-        sdex_pool_abi = json.loads(file.read())
 
-    with open(
-        "./ABIs/" + str(secondary_dex.split("_")[0]) + "_router.json", "r"
-    ) as file:
-        sdex_router_abi = json.loads(file.read())
+# function to search every pool of the given dexes for cycles that start and end with the base token
+# e.g. wbnb -> cake -> busd -> wbnb, the pools can be on any mix of dexes
+# reserves are followed from Sync events and the search is run again on every new block
+def triangular_scan(blockchain, dex_names, save_name, base_token):
+    print("")
+    start_cycle("triangular_scan")
+    sink = open_sink(save_name, TRIANGULAR_COL_LIST, load_config()[blockchain]["sink"])
 
     config = load_config()
-    w3 = Web3(Web3.HTTPProvider(config[blockchain]["network"]["mainnet"]))
-    factory_address = w3.toChecksumAddress(
-        config[blockchain][primary_dex][str(primary_dex) + "_factory"]
-    )
-    factory_contract = w3.eth.contract(abi=factory_abi, address=factory_address)
+    w3 = get_web3(blockchain)
+    max_hops = config[blockchain]["triangular"]["max_hops"]
+    paths_per_token = config[blockchain]["triangular"]["paths_per_token"]
+    poll_interval = config[blockchain]["reserve_tracker"]["poll_interval"]
+    fees = {dex_name: get_fee(config, blockchain, dex_name) for dex_name in dex_names}
+
+    # pools with a token that is in no other pool can't be in a cycle so drop them before any reserves are read
+    # every pool is kept as a new pool can join the tokens of dropped pools into a cycle
+    set_phase("enumerate")
+    all_pools = []
+    for dex_name, dex_pools in get_dex_pools(w3, blockchain, dex_names).items():
+        all_pools += [dict(p, dex=dex_name) for p in dex_pools]
+    pools = prune_leaf_pools(all_pools)
+
+    # new pools are found from the PairCreated events of the factories on every block when discovery is on
+    discovery = config[blockchain]["discovery"]
+    registry = open_registry(config[blockchain]["pair_registry"])
+    factories = {
+        w3.toChecksumAddress(
+            config[blockchain][dex_name][dex_name + "_factory"]
+        ): dex_name
+        for dex_name in dex_names
+    }
 
-    dex_router_contract = w3.eth.contract(
-        abi=router_abi,
-        address=config[blockchain][primary_dex][str(primary_dex) + "_router"],
+    # every uniswap v2 style pool has the same getReserves so the abi of the first dex is used for all of them
+    set_phase("fetch")
+    tracker = start_tracker(
+        w3,
+        config,
+        blockchain,
+        [p["pool_address"] for p in pools],
+        load_abi(str(dex_names[0]) + "_factory_pool"),
     )
+    for pool in pools:
+        pool["reserves"] = tracker["reserves"][pool["pool_address"]]
+    set_phase("evaluate")
+    graph = build_pool_graph(pools, fees)
 
-    record_length = factory_contract.functions.allPairsLength().call()
-    sample_range = list(range(record_length))
-
-    sdex_address = w3.toChecksumAddress(
-        config[blockchain][secondary_dex][str(secondary_dex) + "_factory"]
-    )
-    sdex_contract = w3.eth.contract(abi=sdex_factory_abi, address=sdex_address)
+    base_token_in = 1
+    base_token_in = Web3.toWei(base_token_in, "ether")
 
-    s_dex_router_contract = w3.eth.contract(
-        abi=sdex_router_abi,
-        address=config[blockchain][secondary_dex][str(secondary_dex) + "_router"],
-    )
+    count = 0
+    SEARCHING = True
+    while SEARCHING == True:
+        if count > 0:
+            wait_for_block(tracker, poll_interval)
+            start_cycle("triangular_scan", "fetch")
+        cycle_start = time.time()
+        candidates = 0
+        hits = 0
+
+        # only the edges of pools with a Sync event since the last cycle are recomputed
+        set_phase("fetch")
+        changed = update_tracker(tracker)
+        update_graph_reserves(graph, changed, tracker["reserves"])
+
+        # pools created since the last cycle are tracked and added to the graph straight away
+        if discovery["enabled"]:
+            set_phase("enumerate")
+            created = discover_pairs(
+                registry, w3, blockchain, list(factories), discovery, tracker["block"]
+            )
+            # pools that aren't confirmed yet are found again on every block until they are stored
+            known = set(p["pool_address"] for p in all_pools)
+            new_pools = [
+                dict(p, dex=factories[factory])
+                for factory, factory_pools in created.items()
+                for p in factory_pools
+                if p["pool_address"] not in known
+            ]
+            if len(new_pools) > 0:
+                all_pools += new_pools
+                pools = prune_leaf_pools(all_pools)
+                set_phase("fetch")
+                add_tracked_pools(tracker, [p["pool_address"] for p in pools])
+                for pool in pools:
+                    pool["reserves"] = tracker["reserves"][pool["pool_address"]]
+                set_phase("evaluate")
+                graph = build_pool_graph(pools, fees)
+                print(f"{len(new_pools)} new pools found")
+
+        set_phase("evaluate")
+        for cycle in find_cycles(graph, base_token, max_hops, 1.0, paths_per_token):
+            # the marginal rate ignores price impact so check the cycle with the full trade
+            amounts = quote_cycle(graph, cycle, base_token_in)
+            candidates += 1
+            if amounts[-1] <= base_token_in:
+                continue
+
+            arb = (amounts[-1] - base_token_in) / base_token_in * 100
+            set_phase("report")
+            print(
+                Fore.GREEN
+                + f"{' -> '.join(cycle['path'])} on {', '.join(cycle['dexes'])} returns {arb}%"
+            )
+            write_row(
+                sink,
+                [
+                    " -> ".join(cycle["path"]),
+                    ", ".join(cycle["dexes"]),
+                    ", ".join(cycle["pools"]),
+                    len(cycle["pools"]),
+                    cycle["rate"],
+                    base_token_in,
+                    amounts[-1],
+                    arb,
+                ],
+            )
+            hits += 1
+            play_alert(5)
+            set_phase("evaluate")
+            SEARCHING = False
 
-    for i in tqdm(sample_range, "Downloading: ", leave=False):
-        # for i in sample_range:
-        # init(autoreset=True)
-        # step_no = i + 1
-        # # step_perc = step_no / len(sample_range)
-        # # step_perc = step_perc * 100
-        # # step_perc = round(step_perc, 2)
-        # print(Fore.YELLOW + f"--> {step_no} of {len(sample_range)} completed <--")
-
-        # for i in sample_range:
-        pool_address = factory_contract.functions.allPairs(i).call()
-        pool_address = w3.toChecksumAddress(pool_address)
-        pool_contract = w3.eth.contract(abi=pool_abi, address=pool_address)
-
-        # get pool data
-        token0_address = pool_contract.functions.token0().call()
-        token1_address = pool_contract.functions.token1().call()
-
-        # check if either of the tokens is a base token
-        # if it isn't then skip to the next pool
-        if base_token in [token0_address, token1_address]:
-            # print("Match!")
-            # see if the same pool exists in both DEXes
-            try:
-                sdex_pool_address = sdex_contract.functions.getPair(
-                    token0_address, token1_address
-                ).call()
-                sdex_pool_address = w3.toChecksumAddress(sdex_pool_address)
-                sdex_pool_contract = w3.eth.contract(
-                    abi=sdex_pool_abi, address=sdex_pool_address
-                )
+        count += 1
+        # every tracked pool is priced on every block, the candidates are the cycles that were quoted
+        set_phase("report")
+        record_cycle(
+            "triangular_scan", len(pools), candidates, hits, time.time() - cycle_start
+        )
+        end_cycle()
 
-                # get primary pool data
-                reserves = pool_contract.functions.getReserves().call()
-
-                # get secondary pool data
-                s_reserves = sdex_pool_contract.functions.getReserves().call()
-
-                # which is base and which is other
-                base_token_in = 1
-                base_token_in = Web3.toWei(base_token_in, "ether")
-                token_count = 0
-                for addy in [token0_address, token1_address]:
-                    if addy != base_token:
-                        other_token = addy
-                    else:
-                        pool_value = reserves[token_count] / (10**18)
-                        s_pool_value = s_reserves[token_count] / (10**18)
-                    token_count += 1
-
-                # skip known bad other tokens
-                # bad_other_tokens = ["0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167"]
-                bad_other_tokens = []
-                if other_token not in bad_other_tokens:
-                    # check that both pools are above the threshold
-                    cond1 = small_cap_threshold == None
-                    cond2 = (
-                        pool_value > small_cap_threshold
-                        and s_pool_value > small_cap_threshold
-                    )
+        print(f"Block {tracker['block']} searched")
 
-                    if cond1 or cond2:
-                        # determine how many other tokens the base token will get
-                        trade_path = [base_token, other_token]
-                        amountOut = dex_router_contract.functions.getAmountsOut(
-                            base_token_in, trade_path
-                        ).call()[1]
-                        s_amountOut = s_dex_router_contract.functions.getAmountsOut(
-                            base_token_in, trade_path
-                        ).call()[1]
-
-                        # find the better value
-                        if amountOut > s_amountOut:
-                            end_trade = s_dex_router_contract.functions.getAmountsOut(
-                                amountOut, [other_token, base_token]
-                            ).call()[1]
-                        elif amountOut < s_amountOut:
-                            end_trade = dex_router_contract.functions.getAmountsOut(
-                                s_amountOut, [other_token, base_token]
-                            ).call()[1]
-                        else:
-                            end_trade = s_dex_router_contract.functions.getAmountsOut(
-                                amountOut, [other_token, base_token]
-                            ).call()[1]
-
-                        profit_loss = end_trade - base_token_in
-                        pl_perc = (profit_loss / base_token_in) * 100
-                        # if profit_loss < 0:
-                        #     init(autoreset=True)
-                        #     print(
-                        #         Fore.RED
-                        #         + f"Do Not Trade -- LOSS at {round(pl_perc, 2)}%"
-                        #     )
-                        # else:
-                        #     pass
-                        # print(f"Starting = {base_token_in} and Ending = {end_trade}")
-
-                        arb = ((amountOut - s_amountOut) / amountOut) * 100
-                        abs_arb = abs(arb)
-
-                        # if other_token == "0xacFC95585D80Ab62f67A14C566C1b7a49Fe91167":
-                        #     arb = arb - 0.02
-                        # else:
-                        #     arb = arb - 0.00166
-
-                        # only record those with arbitrage value
-                        if abs_arb != 0 and pl_perc > 0:
-
-                            if arb >= 0:
-                                exchange_path = [exchange[0], exchange[1]]
-                            else:
-                                exchange_path = [exchange[1], exchange[0]]
-
-                            print("")
-                            init(autoreset=True)
-                            print(Fore.GREEN + "##############################")
-                            print(
-                                Fore.GREEN
-                                + f"Trade found at a PROFIT of {round(pl_perc, 2)}% with an Arbitrage value of {round(arb, 2)}%"
-                            )
-                            print(
-                                Fore.GREEN + f"Trading {base_token} for {other_token}"
-                            )
-                            print(
-                                Fore.GREEN
-                                + f"Minimum pool size is {small_cap_threshold} --- Primary DEX pool size is {round(pool_value, 0)} and Secondary DEX pool size is {round(s_pool_value, 0)}"
-                            )
-                            print(
-                                Fore.GREEN
-                                + f"Get {amountOut} from Primary and {s_amountOut} from Secondary DEX pools"
-                            )
-                            print(
-                                Fore.GREEN
-                                + f"Buy from {exchange_path[0]} and sell to {exchange_path[1]}"
-                            )
-                            print(Fore.GREEN + "##############################")
-                            print("")
-
-                            return_list = [
-                                i,
-                                token0_address,
-                                token1_address,
-                                primary_dex,
-                                pool_address,
-                                pool_value,
-                                amountOut,
-                                secondary_dex,
-                                sdex_pool_address,
-                                s_pool_value,
-                                s_amountOut,
-                                end_trade,
-                                arb,
-                            ]
-
-                            # book = load_workbook(save_name)
-                            # sheet = book.active
-                            # sheet.append(return_list)
-                            # book.save(save_name)
-
-            except:
-                pass
-
-    init(autoreset=True)
-    print("")
-    print("##########################################")
-    print("")
-    print("   Download Complete!")
-    print("")
-    print("##########################################")
-    print("")
+    registry.close()
+    close_sink(sink)
+    print_complete()
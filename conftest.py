@@ -0,0 +1,121 @@
+# import modules to interact with the os and write json
+import os, json
+
+# import pytest to share the simulated chain between the tests
+import pytest
+
+# import the scanners to drop the clients and endpoint pools of the chain a previous test served
+import components
+
+# import the simulated chain the scanners are run against
+from simchain import make_sim_chain, serve_sim_chain, set_sim_reserves, mine_sim_block
+
+# folder of the repo, the tests run the scanners from a folder of their own
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# the view functions of a uniswap v2 factory and pool that the scanners read
+FACTORY_ABI = [
+    {
+        "inputs": [],
+        "name": "allPairsLength",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "allPairs",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [
+            {"name": "", "type": "address"},
+            {"name": "", "type": "address"},
+        ],
+        "name": "getPair",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+POOL_ABI = [
+    {
+        "inputs": [],
+        "name": "token0",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "token1",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "getReserves",
+        "outputs": [
+            {"name": "_reserve0", "type": "uint112"},
+            {"name": "_reserve1", "type": "uint112"},
+            {"name": "_blockTimestampLast", "type": "uint32"},
+        ],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# the dexes of the simulated chain, biswap is the primary dex of the scans
+SIM_DEXES = ["biswap", "pancakeswap"]
+
+
+# a simulated chain of two dexes served on localhost and a folder to run the scanners from
+# the config data of the repo is pointed at the simulated chain and the abis of both dexes are in place
+# a few pools on the secondary dex get a spread that is big enough to trade
+@pytest.fixture
+def sim_scan(tmp_path, monkeypatch):
+    config = json.load(open(os.path.join(REPO, "config.json")))
+    chain = make_sim_chain(
+        {dex: config["binance"][dex]["fee"] for dex in SIM_DEXES},
+        60,
+        0.6,
+        multicall_address=config["binance"]["multicall"]["address"],
+    )
+    server, url = serve_sim_chain(chain)
+
+    config["binance"]["network"]["mainnet"] = url
+    config["binance"]["network"]["endpoints"] = [url]
+    components.reset_web3_clients()
+    for address, factory in chain["factories"].items():
+        config["binance"][factory["name"]][factory["name"] + "_factory"] = address
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("Outputs")
+    os.makedirs("ABIs")
+    for dex in SIM_DEXES:
+        with open(f"ABIs/{dex}_factory.json", "w") as file:
+            json.dump(FACTORY_ABI, file)
+        with open(f"ABIs/{dex}_factory_pool.json", "w") as file:
+            json.dump(POOL_ABI, file)
+    with open("config.json", "w") as file:
+        json.dump(config, file)
+
+    # pools that are on both dexes with the other token 50% cheaper on the secondary dex
+    primary, secondary = list(chain["factories"].values())
+    matched = []
+    for pair in primary["pairs"]:
+        key = (chain["pairs"][pair]["token0"], chain["pairs"][pair]["token1"])
+        if chain["base_token"] in key and key in secondary["index"]:
+            matched.append(secondary["index"][key])
+    for pair in matched[:3]:
+        reserves = list(chain["pairs"][pair]["reserves"])
+        base = 0 if chain["pairs"][pair]["token0"] == chain["base_token"] else 1
+        reserves[1 - base] = reserves[1 - base] * 3 // 2
+        set_sim_reserves(chain, pair, reserves)
+    mine_sim_block(chain)
+
+    yield {"chain": chain, "url": url, "config": config}
+    server.shutdown()
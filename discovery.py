@@ -0,0 +1,101 @@
+# import web3 to read the events of the factories
+from hexbytes import HexBytes
+from web3 import Web3
+
+# import the pair registry that new pairs are stored in
+from registry import (
+    get_stored_length,
+    store_pairs,
+    get_discovered_block,
+    save_discovered_block,
+)
+
+# every uniswap v2 style factory emits PairCreated(token0, token1, pair, allPairsLength) when a pool is made
+PAIR_CREATED_TOPIC = Web3.keccak(
+    text="PairCreated(address,address,address,uint256)"
+).hex()
+
+
+# read the pool of a PairCreated event in the format returned by get_pools_by_index
+# token0 and token1 are indexed and the data holds the pair address and the number of pairs after it
+def decode_pair_created(log):
+    data = HexBytes(log["data"])
+    return {
+        "id": int.from_bytes(data[32:64], "big") - 1,
+        "pool_address": Web3.toChecksumAddress(data[12:32]),
+        "token0": Web3.toChecksumAddress(HexBytes(log["topics"][1])[12:]),
+        "token1": Web3.toChecksumAddress(HexBytes(log["topics"][2])[12:]),
+    }
+
+
+# get the PairCreated events of many factories between two blocks with one eth_getLogs per block chunk
+# returns the new pools of every factory in index order as (block number, pool)
+def get_created_pairs(w3, factory_addresses, from_block, to_block, max_block_range):
+    pools = {factory: [] for factory in factory_addresses}
+    for chunk_start in range(from_block, to_block + 1, max_block_range):
+        chunk_end = min(chunk_start + max_block_range - 1, to_block)
+        logs = w3.eth.get_logs(
+            {
+                "fromBlock": chunk_start,
+                "toBlock": chunk_end,
+                "address": factory_addresses,
+                "topics": [PAIR_CREATED_TOPIC],
+            }
+        )
+        for log in logs:
+            if log.get("removed", False):
+                continue
+            factory = Web3.toChecksumAddress(log["address"])
+            if factory in pools:
+                pools[factory].append((log["blockNumber"], decode_pair_created(log)))
+
+    for factory in pools:
+        pools[factory] = sorted(pools[factory], key=lambda created: created[1]["id"])
+    return pools
+
+
+# get the pairs the factories created since the block each of them was followed to, up to head
+# settings come from the discovery entry of the config data
+# only pairs that are confirmations blocks deep are stored, pair indices in the registry never change so a
+# reorg that drops or reorders a newer creation would leave a wrong pair there for good
+# returns the pools that are new to the registry for every factory that was followed, stored or not, the pools
+# that aren't stored yet are found again on every call until they are confirmed
+# a factory that has never been followed, is more than max_catch_up blocks behind or has pairs missing before
+# its events is left out so the caller reads its pairs by index instead
+def discover_pairs(conn, w3, blockchain, factory_addresses, settings, head):
+    confirmed = max(head - settings["confirmations"], 0)
+    followed = {}
+    for factory in factory_addresses:
+        block = get_discovered_block(conn, blockchain, factory)
+        if block != None and head - block <= settings["max_catch_up"]:
+            followed[factory] = block
+    if len(followed) == 0:
+        return {}
+
+    # factories behind the others read a few blocks twice, pairs that are already stored are skipped
+    from_block = min(followed.values()) + 1
+    created = {}
+    if from_block <= head:
+        created = get_created_pairs(
+            w3, list(followed), from_block, head, settings["max_block_range"]
+        )
+
+    new_pools = {}
+    for factory in followed:
+        pools = [pool for block, pool in created.get(factory, [])]
+        confirmed_pools = [
+            pool for block, pool in created.get(factory, []) if block <= confirmed
+        ]
+        stored_length = get_stored_length(conn, blockchain, factory)
+        # pairs are stored without gaps so an event that is missing leaves the rest to be read by index
+        if (
+            len(confirmed_pools) > 0
+            and store_pairs(conn, blockchain, factory, confirmed_pools)
+            <= confirmed_pools[-1]["id"]
+        ):
+            continue
+        save_discovered_block(
+            conn, blockchain, factory, max(confirmed, followed[factory])
+        )
+        new_pools[factory] = [p for p in pools if p["id"] >= stored_length]
+    return new_pools
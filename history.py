@@ -0,0 +1,222 @@
+# import modules to interact with the os, work with time and delete folders
+import os, time, shutil
+from datetime import datetime, timedelta, timezone
+
+# import pyarrow to keep the scan history as parquet files partitioned by pair and day
+# the history is optional so the scans work without pyarrow as long as it isn't opened
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+# import openpyxl in write only mode for the optional excel report
+from openpyxl import Workbook
+
+
+# columns of every scan step, the pair and day are kept in the folder names
+# the exchanges are numbered in the order they were scanned so every pair has the same columns
+def get_history_schema():
+    return pa.schema(
+        [
+            ("timestamp", pa.timestamp("ms", tz="UTC")),
+            ("step", pa.int64()),
+            ("token0", pa.string()),
+            ("token1", pa.string()),
+            ("xch0", pa.string()),
+            ("xch0_t0_reserve", pa.float64()),
+            ("xch0_t1_reserve", pa.float64()),
+            ("xch0_buy_with_base", pa.float64()),
+            ("xch1", pa.string()),
+            ("xch1_t0_reserve", pa.float64()),
+            ("xch1_t1_reserve", pa.float64()),
+            ("xch1_buy_with_base", pa.float64()),
+            ("gross_perc_profit", pa.float64()),
+            ("potential_trade", pa.bool_()),
+            ("trade_path", pa.string()),
+        ]
+    )
+
+
+# day of a timestamp as used in the partition folder names
+def get_day(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+
+
+# folder of the partition of a pair and day
+def get_partition(folder, pair, day):
+    return os.path.join(folder, f"pair={pair}", f"day={day}")
+
+
+# open the history store, settings come from the history entry of the config data
+def open_history(settings):
+    if pa == None:
+        raise ImportError("pyarrow is needed to keep the scan history")
+    if os.path.exists(settings["folder"]) == False:
+        os.makedirs(settings["folder"])
+    return {
+        "folder": settings["folder"],
+        "retention_days": settings["retention_days"],
+        "buffer": [],
+        "day": get_day(time.time()),
+        "opened": time.time(),
+    }
+
+
+# add the latest step of a pair from over_dict to the history
+# only the latest value of every list in over_dict is needed by arb_value and recommend_trade
+# so the lists are cut back to that value and memory stays flat however long the scan runs
+def record_step(history, over_dict, pair, xch_names, step):
+    token0, token1 = pair.split("_")
+    pair_dict = over_dict[pair]
+    row = {
+        "pair": pair,
+        "timestamp": time.time(),
+        "step": step,
+        "token0": token0,
+        "token1": token1,
+        "gross_perc_profit": pair_dict["gross_perc_profit"][-1],
+        "potential_trade": pair_dict["potential_trade"][-1],
+        "trade_path": pair_dict["trade_path"][-1],
+    }
+    for k, xch_name in enumerate(xch_names[0:2]):
+        row[f"xch{k}"] = xch_name
+        row[f"xch{k}_t0_reserve"] = pair_dict[xch_name + "_" + token0][-1]
+        row[f"xch{k}_t1_reserve"] = pair_dict[xch_name + "_" + token1][-1]
+        row[f"xch{k}_buy_with_base"] = pair_dict[xch_name + "_buy_with_base"][-1]
+    history["buffer"].append(row)
+
+    for key in pair_dict:
+        pair_dict[key] = pair_dict[key][-1:]
+
+
+# write the buffered steps as one new file per pair and day, files are never changed once written
+# when the day has moved on the files of the days before are compacted and old days are removed
+def flush_history(history):
+    partitions = {}
+    for row in history["buffer"]:
+        key = (row["pair"], get_day(row["timestamp"]))
+        partitions.setdefault(key, []).append(row)
+
+    for (pair, day), rows in partitions.items():
+        partition = get_partition(history["folder"], pair, day)
+        if os.path.exists(partition) == False:
+            os.makedirs(partition)
+        columns = {
+            field.name: [row[field.name] for row in rows]
+            for field in get_history_schema()
+        }
+        columns["timestamp"] = [int(t * 1000) for t in columns["timestamp"]]
+        pq.write_table(
+            pa.Table.from_pydict(columns, schema=get_history_schema()),
+            os.path.join(partition, f"part-{time.time_ns()}.parquet"),
+        )
+    history["buffer"] = []
+
+    today = get_day(time.time())
+    if today != history["day"]:
+        compact_history(history, before_day=today)
+        apply_retention(history)
+        history["day"] = today
+
+
+# merge the files of a partition into a single file
+# the merged file is written under a temporary name first so a crash never loses rows
+def compact_partition(partition):
+    parts = sorted(f for f in os.listdir(partition) if f.endswith(".parquet"))
+    if len(parts) < 2:
+        return
+    table = pa.concat_tables(
+        [
+            pq.read_table(os.path.join(partition, f), schema=get_history_schema())
+            for f in parts
+        ]
+    )
+    # files starting with an underscore are skipped when the store is read
+    file_name = f"part-{time.time_ns()}.parquet"
+    pq.write_table(table, os.path.join(partition, "_" + file_name))
+    os.replace(
+        os.path.join(partition, "_" + file_name), os.path.join(partition, file_name)
+    )
+    for f in parts:
+        os.remove(os.path.join(partition, f))
+
+
+# list the (pair, day, folder) of every partition in the store
+def list_partitions(folder):
+    partitions = []
+    for pair_folder in sorted(os.listdir(folder)):
+        if pair_folder.startswith("pair=") == False:
+            continue
+        for day_folder in sorted(os.listdir(os.path.join(folder, pair_folder))):
+            if day_folder.startswith("day=") == False:
+                continue
+            partitions.append(
+                (
+                    pair_folder[len("pair=") :],
+                    day_folder[len("day=") :],
+                    os.path.join(folder, pair_folder, day_folder),
+                )
+            )
+    return partitions
+
+
+# compact every partition, or only the partitions of days before a given day
+def compact_history(history, before_day=None):
+    for pair, day, partition in list_partitions(history["folder"]):
+        if before_day == None or day < before_day:
+            compact_partition(partition)
+
+
+# remove the partitions of days older than the retention period
+def apply_retention(history):
+    cutoff = get_day(
+        time.time() - timedelta(days=history["retention_days"]).total_seconds()
+    )
+    for pair, day, partition in list_partitions(history["folder"]):
+        if day < cutoff:
+            shutil.rmtree(partition)
+
+
+# write what is left, then compact and apply the retention period at the end of a scan
+def close_history(history):
+    flush_history(history)
+    compact_history(history)
+    apply_retention(history)
+
+
+# read the history of one or all pairs back into a dataframe in time order
+def read_history(folder, pair=None):
+    if pa == None:
+        raise ImportError("pyarrow is needed to read the scan history")
+    filters = None
+    if pair != None:
+        filters = [("pair", "=", pair)]
+    table = pq.read_table(
+        folder,
+        partitioning=ds.partitioning(
+            pa.schema([("pair", pa.string()), ("day", pa.string())]), flavor="hive"
+        ),
+        filters=filters,
+    )
+    return table.to_pandas().sort_values(["pair", "timestamp"])
+
+
+# export the history to an xlsx report with one sheet per pair using a write only workbook
+# with since set only the steps from that time on are exported e.g. the steps of one scan
+def export_history_excel(folder, file_path, since=None):
+    df = read_history(folder)
+    if since != None:
+        df = df[df["timestamp"] >= datetime.fromtimestamp(since, timezone.utc)]
+    df["timestamp"] = df["timestamp"].dt.tz_localize(None)
+    wb = Workbook(write_only=True)
+    for pair, pair_df in df.groupby("pair"):
+        ws = wb.create_sheet(title=pair[0:31])
+        pair_df = pair_df.drop(columns=["pair"])
+        ws.append(list(pair_df.columns))
+        for row in pair_df.itertuples(index=False):
+            ws.append(list(row))
+    wb.save(file_path)
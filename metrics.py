@@ -0,0 +1,267 @@
+# import modules to interact with the os, work with threads and serve the metrics over http
+import os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# import web3 to work out the function selectors of the contracts the scanners call
+from web3 import Web3
+
+# import the abis of the contracts so every call can be put down to a contract role and function
+from abis import UNISWAP_V2_FACTORY_ABI, UNISWAP_V2_PAIR_ABI, UNISWAP_V2_ROUTER_ABI
+from tokens import ERC20_ABI
+
+# buckets of the latency histograms in seconds
+RPC_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+CYCLE_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+# type and help text of every metric in the prometheus text format
+METRIC_INFO = {
+    "rpc_requests_total": ("counter", "JSON-RPC requests sent to the rpc endpoints"),
+    "rpc_errors_total": ("counter", "JSON-RPC requests that failed, by error class"),
+    "rpc_request_seconds": ("histogram", "Time taken by JSON-RPC requests"),
+    "contract_calls_total": (
+        "counter",
+        "Contract view calls including the calls inside multicall batches",
+    ),
+    "contract_call_cache_hits_total": (
+        "counter",
+        "Contract view calls answered from the call cache",
+    ),
+    "contract_calls_dropped_total": (
+        "counter",
+        "Contract view calls given up on after the rpc retries ran out",
+    ),
+    "scan_cycles_total": ("counter", "Scan cycles completed"),
+    "scan_pools_total": ("counter", "Pools read by scan cycles"),
+    "scan_candidates_total": (
+        "counter",
+        "Pools, or token cycles for triangular_scan, with a valid quote in scan cycles",
+    ),
+    "scan_hits_total": ("counter", "Trades found by scan cycles"),
+    "scan_cycle_seconds": ("histogram", "Time taken by scan cycles"),
+    "scan_last_cycle_pools": ("gauge", "Pools read by the last scan cycle"),
+    "scan_last_cycle_candidates": (
+        "gauge",
+        "Pools, or token cycles for triangular_scan, with a valid quote in the last scan cycle",
+    ),
+    "scan_last_cycle_hits": ("gauge", "Trades found by the last scan cycle"),
+    "scan_tier_pools": ("gauge", "Pools in each tier of the scan scheduler"),
+}
+
+# the metrics of this process, values are kept by metric name and labels
+METRICS = {
+    "values": {},
+    "histograms": {},
+    "settings": None,
+    "server": None,
+    "lock": threading.Lock(),
+}
+
+
+# 4 byte selector of a function abi entry as it is at the start of the call data
+def get_selector(entry):
+    types = ",".join(i["type"] for i in entry["inputs"])
+    return Web3.keccak(text=f"{entry['name']}({types})")[:4].hex()
+
+
+# contract role and function name of every selector the scanners use
+# later abis take the place of earlier ones so e.g. decimals and symbol are put down to tokens, not pools
+def get_call_roles():
+    roles = {}
+    for role, abi in [
+        ("pool", UNISWAP_V2_PAIR_ABI),
+        ("router", UNISWAP_V2_ROUTER_ABI),
+        ("factory", UNISWAP_V2_FACTORY_ABI),
+        ("token", ERC20_ABI),
+    ]:
+        for entry in abi:
+            if entry["type"] == "function":
+                roles[get_selector(entry)] = (role, entry["name"])
+    roles[Web3.keccak(text="tryAggregate(bool,(address,bytes)[])")[:4].hex()] = (
+        "multicall",
+        "tryAggregate",
+    )
+    return roles
+
+
+CALL_ROLES = get_call_roles()
+
+
+# contract role and function of call data, calls of other contracts are put down as other
+def get_call_role(data):
+    data = data if isinstance(data, str) else Web3.toHex(data)
+    return CALL_ROLES.get(data[:10], ("other", "other"))
+
+
+# labels of a json-rpc request, eth_call requests also get the role and function of the contract call
+def get_rpc_labels(method, params):
+    role, function = "", ""
+    if method == "eth_call" and len(params) > 0 and "data" in params[0]:
+        role, function = get_call_role(params[0]["data"])
+    return {"method": method, "role": role, "function": function}
+
+
+# key of a metric in the metrics store
+def get_key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+# add to a counter
+def inc(name, labels, value=1):
+    key = get_key(name, labels)
+    with METRICS["lock"]:
+        METRICS["values"][key] = METRICS["values"].get(key, 0) + value
+
+
+# set a gauge
+def set_gauge(name, labels, value):
+    with METRICS["lock"]:
+        METRICS["values"][get_key(name, labels)] = value
+
+
+# add a value to a histogram
+def observe(name, labels, value, buckets):
+    key = get_key(name, labels)
+    with METRICS["lock"]:
+        if key not in METRICS["histograms"]:
+            METRICS["histograms"][key] = {
+                "buckets": buckets,
+                "counts": [0] * len(buckets),
+                "sum": 0.0,
+                "count": 0,
+            }
+        histogram = METRICS["histograms"][key]
+        for i, bucket in enumerate(buckets):
+            if value <= bucket:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+# record one json-rpc request, error_class is None for a good request, see rpc.classify_error
+def record_rpc(method, params, seconds, error_class):
+    labels = get_rpc_labels(method, params)
+    inc("rpc_requests_total", labels)
+    observe("rpc_request_seconds", labels, seconds, RPC_BUCKETS)
+    if error_class != None:
+        inc("rpc_errors_total", dict(labels, error=error_class))
+
+
+# record the contract view calls of a multicall, call_data is the call data of every call
+def record_contract_calls(call_data, cached=False):
+    name = "contract_call_cache_hits_total" if cached else "contract_calls_total"
+    for data in call_data:
+        role, function = get_call_role(data)
+        inc(name, {"role": role, "function": function})
+
+
+# record the contract view calls that failed because the rpc retries ran out, they are scanned as failed calls
+def record_dropped_calls(call_data):
+    for data in call_data:
+        role, function = get_call_role(data)
+        inc("contract_calls_dropped_total", {"role": role, "function": function})
+
+
+# record a finished cycle of a scan and export the metrics
+# pools are the pools read, candidates the pools (or token cycles) with a valid quote and hits the trades found
+def record_cycle(scan, pools, candidates, hits, seconds):
+    labels = {"scan": scan}
+    inc("scan_cycles_total", labels)
+    inc("scan_pools_total", labels, pools)
+    inc("scan_candidates_total", labels, candidates)
+    inc("scan_hits_total", labels, hits)
+    set_gauge("scan_last_cycle_pools", labels, pools)
+    set_gauge("scan_last_cycle_candidates", labels, candidates)
+    set_gauge("scan_last_cycle_hits", labels, hits)
+    observe("scan_cycle_seconds", labels, seconds, CYCLE_BUCKETS)
+    export_metrics()
+
+
+# record the number of pools in each tier of the scheduler of a scan
+def record_tiers(scan, counts):
+    for tier, count in counts.items():
+        set_gauge("scan_tier_pools", {"scan": scan, "tier": tier}, count)
+
+
+# labels in the prometheus text format e.g. {method="eth_call",role="pool"}
+def format_labels(labels):
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+# all metrics in the prometheus text format
+def render_metrics():
+    with METRICS["lock"]:
+        values = dict(METRICS["values"])
+        histograms = {
+            key: dict(histogram, counts=list(histogram["counts"]))
+            for key, histogram in METRICS["histograms"].items()
+        }
+
+    lines = []
+    for name, (metric_type, help_text) in METRIC_INFO.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        if metric_type != "histogram":
+            for (key_name, labels), value in sorted(values.items()):
+                if key_name == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            continue
+
+        for (key_name, labels), histogram in sorted(histograms.items()):
+            if key_name != name:
+                continue
+            for bucket, count in zip(histogram["buckets"], histogram["counts"]):
+                bucket_labels = labels + (("le", str(bucket)),)
+                lines.append(f"{name}_bucket{format_labels(bucket_labels)} {count}")
+            inf_labels = labels + (("le", "+Inf"),)
+            lines.append(
+                f"{name}_bucket{format_labels(inf_labels)} {histogram['count']}"
+            )
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# answers scrapes of /metrics with the metrics of this process
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ["/", "/metrics"]:
+            self.send_response(404)
+            self.end_headers()
+            return
+        raw = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+# start exporting the metrics, settings come from the metrics entry of the config data
+# with a port the metrics are served on localhost for prometheus to scrape and with a file they are written
+# to it after every scan cycle e.g. for the textfile collector of the node exporter
+def start_metrics(settings):
+    METRICS["settings"] = settings
+    if settings["port"] != None and METRICS["server"] == None:
+        server = ThreadingHTTPServer(("127.0.0.1", settings["port"]), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        METRICS["server"] = server
+
+
+# write the metrics to the metrics file if one is set
+# the file is replaced in one go so a scrape never reads half a file
+def export_metrics():
+    settings = METRICS["settings"]
+    if settings == None or settings["file"] == None:
+        return
+    folder = os.path.dirname(settings["file"])
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+    with open(settings["file"] + ".tmp", "w") as file:
+        file.write(render_metrics())
+    os.replace(settings["file"] + ".tmp", settings["file"])
@@ -0,0 +1,185 @@
+# import copy to make the same view call on many contracts and threading to share call caches between threads
+import copy, threading
+
+# import hexbytes to turn encoded call data into raw bytes
+from hexbytes import HexBytes
+
+# import the error raised when the rpc endpoints have kept failing a call
+from rpc import RetriesExhausted
+
+# import the metrics that every contract call is recorded in
+from metrics import record_contract_calls, record_dropped_calls
+
+# import helper to turn tuple outputs into a type string the decoder understands
+from eth_utils.abi import collapse_if_tuple
+
+# import the normalizers web3 applies to call results so batched results look the same e.g. checksummed addresses
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+
+# minimal Multicall3 abi - only tryAggregate is needed to batch view calls
+# Multicall3 is deployed at the same address on most EVM chains including binance
+MULTICALL_ABI = [
+    {
+        "inputs": [
+            {"internalType": "bool", "name": "requireSuccess", "type": "bool"},
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call[]",
+                "name": "calls",
+                "type": "tuple[]",
+            },
+        ],
+        "name": "tryAggregate",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+
+# split a list into consecutive chunks of a given size
+def chunk_list(items, chunk_size):
+    for i in range(0, len(items), chunk_size):
+        yield items[i : i + chunk_size]
+
+
+# make the same view call e.g. getReserves() on every given address, the call is built once and only its address
+# is swapped as building a contract object per address takes longer than the call itself
+def repeat_call(call, addresses):
+    calls = []
+    for address in addresses:
+        address_call = copy.copy(call)
+        address_call.address = address
+        calls.append(address_call)
+    return calls
+
+
+# decode the raw return data of a single call using the output types of the function abi
+def decode_call_result(w3, call, success, return_data):
+    # a reverted call or a call to an address without code returns no data
+    if success == False or len(return_data) == 0:
+        return (False, None)
+    output_types = [collapse_if_tuple(output) for output in call.abi["outputs"]]
+    try:
+        values = w3.codec.decode_abi(output_types, return_data)
+    except Exception:
+        return (False, None)
+    values = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, values)
+    # single values are returned as is, multiple values (e.g. getReserves) as a list
+    if len(values) == 1:
+        return (True, values[0])
+    return (True, list(values))
+
+
+# send one aggregate eth_call for a batch of calls
+# if the whole batch reverts (e.g. it ran out of gas) then split it and try each half so only bad calls are lost
+# a batch the provider kept refusing is not split as smaller batches would only add to its load, its calls
+# fail and are recorded as dropped so one bad batch doesn't stop the scan cycle
+def run_batch(w3, multicall_contract, batch, block_identifier):
+    payload = [
+        (call.address, HexBytes(call._encode_transaction_data())) for call in batch
+    ]
+    try:
+        returned = multicall_contract.functions.tryAggregate(False, payload).call(
+            block_identifier=block_identifier
+        )
+    except RetriesExhausted:
+        record_dropped_calls(data for address, data in payload)
+        return [(False, None)] * len(batch)
+    except Exception:
+        if len(batch) == 1:
+            return [(False, None)]
+        half = len(batch) // 2
+        return run_batch(
+            w3, multicall_contract, batch[:half], block_identifier
+        ) + run_batch(w3, multicall_contract, batch[half:], block_identifier)
+
+    return [
+        decode_call_result(w3, call, success, return_data)
+        for call, (success, return_data) in zip(batch, returned)
+    ]
+
+
+# a call cache is shared by the thread of a scan and the thread that reads the next batch ahead of it, one of
+# them can prune the cache for a new block while the other looks up its calls so every access holds this lock
+CALL_CACHE_LOCK = threading.Lock()
+
+
+# key of a call in a call cache, calls are the same when they read the same contract with the same calldata
+# at the same block
+def get_call_key(block_identifier, call):
+    return (block_identifier, call.address, call._encode_transaction_data())
+
+
+# only calls pinned to a block number can be cached, the state at "latest" moves on with every block
+def is_cacheable(call_cache, block_identifier):
+    return call_cache != None and isinstance(block_identifier, int)
+
+
+# drop the cached calls of blocks before a given block so the cache only holds the block being scanned
+def prune_call_cache(call_cache, block):
+    with CALL_CACHE_LOCK:
+        for key in [key for key in call_cache if key[0] < block]:
+            del call_cache[key]
+
+
+# function to run a list of contract view calls e.g. contract.functions.token0() through a multicall contract
+# calls are grouped into aggregate eth_calls of batch_size and every call gets its own (success, value) result
+# with a call cache and a pinned block number, calls made before in the same block are answered from memory
+# and identical calls in the list are only sent once
+def multicall(
+    w3,
+    multicall_address,
+    calls,
+    batch_size=500,
+    block_identifier="latest",
+    call_cache=None,
+):
+    multicall_contract = w3.eth.contract(
+        abi=MULTICALL_ABI, address=w3.toChecksumAddress(multicall_address)
+    )
+    if is_cacheable(call_cache, block_identifier) == False:
+        record_contract_calls(call._encode_transaction_data() for call in calls)
+        results = []
+        for batch in chunk_list(calls, batch_size):
+            results.extend(run_batch(w3, multicall_contract, batch, block_identifier))
+        return results
+
+    keys = [get_call_key(block_identifier, call) for call in calls]
+    # the cached results are copied out so a prune by another thread can't drop them before they are used
+    with CALL_CACHE_LOCK:
+        fetched = {key: call_cache[key] for key in keys if key in call_cache}
+    missing = {}
+    for key, call in zip(keys, calls):
+        if key not in fetched and key not in missing:
+            missing[key] = call
+
+    record_contract_calls(key[2] for key in missing)
+    record_contract_calls((key[2] for key in keys if key not in missing), cached=True)
+
+    for batch in chunk_list(list(missing.items()), batch_size):
+        results = run_batch(
+            w3, multicall_contract, [call for key, call in batch], block_identifier
+        )
+        with CALL_CACHE_LOCK:
+            for (key, call), result in zip(batch, results):
+                fetched[key] = result
+                # failed calls are left out of the cache so they are tried again
+                if result[0] == True:
+                    call_cache[key] = result
+
+    return [fetched[key] for key in keys]
@@ -0,0 +1,44 @@
+# the same token pair can have a pool on every dex, so pools are joined on the unordered pair of tokens
+# uniswap v2 style factories sort the tokens by address, the same order is used for the key
+
+
+# key of the unordered token pair of a pool
+def pair_key(token_a, token_b):
+    return tuple(sorted([token_a, token_b], key=lambda token: token.lower()))
+
+
+# build an index of token pair -> {dex name: pool address} from the enumerated pools of each dex
+# pools_by_dex is a dictionary of dex name -> pools in the format returned by get_registered_pools
+def build_pair_index(pools_by_dex):
+    index = {}
+    for dex_name, pools in pools_by_dex.items():
+        for pool in pools:
+            key = pair_key(pool["token0"], pool["token1"])
+            index.setdefault(key, {})[dex_name] = pool["pool_address"]
+    return index
+
+
+# keep only token pairs that have a pool on at least min_dexes of the given dexes
+def get_overlap(index, dex_names=None, min_dexes=2):
+    overlap = {}
+    for key, dex_pools in index.items():
+        if dex_names != None:
+            dex_pools = {d: p for d, p in dex_pools.items() if d in dex_names}
+        if len(dex_pools) >= min_dexes:
+            overlap[key] = dex_pools
+    return overlap
+
+
+# set the address of the matching pool on the secondary dex and pass on only pools that exist on both
+# this replaces a getPair call per pool, pools without a match are skipped without any calls
+def iter_matched_pools(index, pools, secondary_dex):
+    for pool in pools:
+        dex_pools = index.get(pair_key(pool["token0"], pool["token1"]), {})
+        if secondary_dex in dex_pools:
+            pool["s_pool_address"] = dex_pools[secondary_dex]
+            yield pool
+
+
+# list version of iter_matched_pools
+def match_secondary_pools(index, pools, secondary_dex):
+    return list(iter_matched_pools(index, pools, secondary_dex))
@@ -0,0 +1,214 @@
+# the scanners run pools through a chain of generator stages, each stage takes batches from the one before it
+# and hands its own batches on so only the batches in flight are held in memory:
+# pool source -> filters -> batches -> fetch -> schedule -> quote -> threshold -> sink
+# a batch is a dictionary with the pools of the batch, the id of its last pool for checkpoints and what the
+# stages have added to it e.g. quotes and hits
+
+# import modules to read batches ahead in a thread of its own
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# import tqdm for a progress bar
+from tqdm import tqdm
+
+# import the off chain quote engine to price swaps from pool reserves
+from quotes import quote_pools, solve_pools
+
+# import the append only sinks that scan hits are written to
+from sinks import write_row, flush_sink
+
+# import the checkpoint store so long sweeps can carry on after a restart
+from checkpoint import save_checkpoint
+
+# import the profiler so the time of every stage is put down to its phase
+from profiler import set_phase
+
+# import the scheduler so the pools that are read move between its tiers
+from scheduler import record_pools
+
+
+# counts of a scan cycle for the metrics, pools are the pools sent to be read, candidates the pools with a
+# valid quote and hits the rows written to the sink
+def new_scan_stats():
+    return {"pools": 0, "candidates": 0, "hits": 0}
+
+
+# pass on the pools that keep returns True for
+def filter_pools(pools, keep):
+    for pool in pools:
+        if keep(pool):
+            yield pool
+
+
+# group a stream of pools into batches of batch_size pools
+# the time spent waiting for the pool source e.g. the pair registry is put down to enumeration
+def make_batches(pools, batch_size):
+    batch = []
+    previous = set_phase("enumerate")
+    for pool in pools:
+        batch.append(pool)
+        if len(batch) == batch_size:
+            set_phase(previous)
+            yield {"pools": batch, "last_id": batch[-1]["id"]}
+            previous = set_phase("enumerate")
+            batch = []
+    set_phase(previous)
+    if len(batch) > 0:
+        yield {"pools": batch, "last_id": batch[-1]["id"]}
+
+
+# read the reserves of every batch with fetch, a function that takes the pools of a batch and returns the
+# pools it could read with their reserves set
+# with prefetch set that many batches are read ahead in a thread of its own while the batches before them
+# are quoted and written out, the batches still come out in order
+def fetch_stage(batches, fetch, stats, prefetch=0):
+    if prefetch == 0:
+        for batch in batches:
+            stats["pools"] += len(batch["pools"])
+            previous = set_phase("fetch")
+            priced_pools = fetch(batch["pools"])
+            set_phase(previous)
+            yield dict(batch, pools=priced_pools)
+        return
+
+    # one thread so the reads of a cycle go out one batch after the other as they would without prefetch
+    executor = ThreadPoolExecutor(1)
+    pending = deque()
+    try:
+        for batch in batches:
+            stats["pools"] += len(batch["pools"])
+            pending.append((batch, executor.submit(fetch, batch["pools"])))
+            if len(pending) > prefetch:
+                yield wait_for_fetch(*pending.popleft())
+        while len(pending) > 0:
+            yield wait_for_fetch(*pending.popleft())
+    finally:
+        # a scan that stops early e.g. on an error doesn't wait for the reads it no longer needs
+        for batch, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+# wait for the reserves of a batch that is read ahead, the wait is put down to fetching
+def wait_for_fetch(batch, future):
+    previous = set_phase("fetch")
+    priced_pools = future.result()
+    set_phase(previous)
+    return dict(batch, pools=priced_pools)
+
+
+# record the reads of every batch in a scheduler so the pools move to the tier their new reserves call for
+def schedule_stage(batches, scheduler, base_token, base_token_in, fee, s_fee):
+    for batch in batches:
+        previous = set_phase("evaluate")
+        record_pools(scheduler, batch["pools"], base_token, base_token_in, fee, s_fee)
+        set_phase(previous)
+        yield batch
+
+
+# quote the round trip of every pool in a batch and solve its profit maximising size
+# only pools the router would accept are passed on as quotes, each quote is a tuple of
+# (pool, (amountOut, s_amountOut, end_trade), (optimal_in, optimal_profit, buy_on_primary))
+def quote_stage(batches, base_token, base_token_in, fee, s_fee, stats):
+    for batch in batches:
+        previous = set_phase("evaluate")
+        pools = batch["pools"]
+        quotes = []
+        if len(pools) > 0:
+            amount_outs, s_amount_outs, end_trades, valid = quote_pools(
+                pools, base_token, base_token_in, fee, s_fee
+            )
+            optimal_ins, profits, buy_on_primary = solve_pools(
+                pools, base_token, fee, s_fee
+            )
+            for count, pool in enumerate(pools):
+                if valid[count] == False:
+                    continue
+                quotes.append(
+                    (
+                        pool,
+                        (amount_outs[count], s_amount_outs[count], end_trades[count]),
+                        (optimal_ins[count], profits[count], buy_on_primary[count]),
+                    )
+                )
+        stats["candidates"] += len(quotes)
+        set_phase(previous)
+        yield dict(batch, quotes=quotes)
+
+
+# keep the quotes that get_hit turns into a hit, get_hit takes (pool, quote, optimal) and returns None for a
+# pool that isn't worth a trade
+def threshold_stage(batches, get_hit):
+    for batch in batches:
+        previous = set_phase("evaluate")
+        hits = []
+        for pool, quote, optimal in batch["quotes"]:
+            hit = get_hit(pool, quote, optimal)
+            if hit != None:
+                hits.append(hit)
+        set_phase(previous)
+        yield dict(batch, hits=hits)
+
+
+# write the hits of every batch to the sink, get_row turns a hit into the row that is written when the hit
+# isn't the row itself and on_hit is called with every hit e.g. to print it or play the alert
+# with a checkpoint of {"conn", "scan", "factory", "cycle"} the hits of a batch are on disk before the
+# checkpoint moves past the batch
+def sink_stage(batches, sink, stats, get_row=None, on_hit=None, checkpoint=None):
+    for batch in batches:
+        previous = set_phase("report")
+        for hit in batch["hits"]:
+            write_row(sink, hit if get_row == None else get_row(hit))
+            stats["hits"] += 1
+            if on_hit != None:
+                on_hit(hit)
+        if checkpoint != None:
+            flush_sink(sink)
+            save_checkpoint(
+                checkpoint["conn"],
+                checkpoint["scan"],
+                checkpoint["factory"],
+                checkpoint["cycle"],
+                batch["last_id"],
+            )
+        set_phase(previous)
+        yield batch
+
+
+# run a stream of matched pools through every stage and return the counts of the cycle
+# scan is the configuration of a scanner: batch_size, fetch, prefetch, base_token, base_token_in, fee, s_fee,
+# get_hit, sink and optionally get_row, on_hit, checkpoint and scheduler, see the stages for what each of them
+# does
+def run_scan(pools, scan):
+    stats = new_scan_stats()
+    batches = make_batches(pools, scan["batch_size"])
+    batches = fetch_stage(batches, scan["fetch"], stats, scan["prefetch"])
+    if scan.get("scheduler") != None:
+        batches = schedule_stage(
+            batches,
+            scan["scheduler"],
+            scan["base_token"],
+            scan["base_token_in"],
+            scan["fee"],
+            scan["s_fee"],
+        )
+    batches = quote_stage(
+        batches,
+        scan["base_token"],
+        scan["base_token_in"],
+        scan["fee"],
+        scan["s_fee"],
+        stats,
+    )
+    batches = threshold_stage(batches, scan["get_hit"])
+    batches = sink_stage(
+        batches,
+        scan["sink"],
+        stats,
+        scan.get("get_row"),
+        scan.get("on_hit"),
+        scan.get("checkpoint"),
+    )
+    for batch in tqdm(batches, "Evaluating: ", leave=False):
+        pass
+    return stats
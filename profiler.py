@@ -0,0 +1,186 @@
+# import modules to interact with the os, read the stacks of threads, write json, work with time and threads
+import os, sys, json, time, threading
+
+# import cProfile for deterministic profiles of a chosen cycle
+import cProfile
+
+# phases of a scan cycle in the order they are printed
+PHASES = ["setup", "enumerate", "fetch", "evaluate", "report", "alert"]
+
+# the profiling state of this process, cycle is the open cycle of a scan or None
+PROFILER = {
+    "settings": None,
+    "cycle": None,
+    "counts": {},
+    "totals": {},
+}
+
+
+# turn on profiling, settings come from the profiling entry of the config data
+# with enabled set to false nothing is recorded and every call below returns straight away
+def start_profiling(settings):
+    if settings["enabled"] == False:
+        return
+    PROFILER["settings"] = settings
+    if os.path.exists(settings["folder"]) == False:
+        os.makedirs(settings["folder"])
+
+
+# check if the profile of this cycle should be taken, profile_scan None means any scan
+def is_profiled_cycle(settings, scan, number):
+    return settings["profile_cycle"] == number and settings["profile_scan"] in [
+        None,
+        scan,
+    ]
+
+
+# start a cycle of a scan in the given phase, a cycle that is still open is ended first
+def start_cycle(scan, phase="setup"):
+    settings = PROFILER["settings"]
+    if settings == None:
+        return
+    if PROFILER["cycle"] != None:
+        end_cycle()
+
+    PROFILER["counts"][scan] = PROFILER["counts"].get(scan, 0) + 1
+    number = PROFILER["counts"][scan]
+    profile = None
+    if is_profiled_cycle(settings, scan, number):
+        if settings["profiler"] == "sampling":
+            profile = start_sampling(settings["sample_interval"])
+        else:
+            profile = cProfile.Profile()
+            profile.enable()
+
+    now = time.perf_counter()
+    PROFILER["cycle"] = {
+        "scan": scan,
+        "number": number,
+        "thread": threading.get_ident(),
+        "time": time.time(),
+        "start": now,
+        "mark": now,
+        "phase": phase,
+        "phases": {},
+        "profile": profile,
+    }
+
+
+# move the open cycle to another phase and return the phase it was in, the time since the last change is
+# put down to that phase, outside a cycle nothing happens and None is returned
+# calls from other threads e.g. a stage that reads ahead are ignored as the cycle follows the scanning thread
+def set_phase(phase):
+    cycle = PROFILER["cycle"]
+    if cycle == None or phase == None or cycle["thread"] != threading.get_ident():
+        return None
+    now = time.perf_counter()
+    previous = cycle["phase"]
+    cycle["phases"][previous] = cycle["phases"].get(previous, 0.0) + now - cycle["mark"]
+    cycle["mark"] = now
+    cycle["phase"] = phase
+    return previous
+
+
+# end the open cycle, write its phase timings to the spans file and its profile if one was taken
+def end_cycle():
+    cycle = PROFILER["cycle"]
+    if cycle == None:
+        return
+    set_phase(cycle["phase"])
+    PROFILER["cycle"] = None
+    seconds = time.perf_counter() - cycle["start"]
+    settings = PROFILER["settings"]
+    name = f"{cycle['scan']}_{cycle['number']}"
+
+    profile = cycle["profile"]
+    if isinstance(profile, cProfile.Profile):
+        profile.disable()
+        profile.dump_stats(os.path.join(settings["folder"], name + ".pstats"))
+    elif profile != None:
+        write_folded(
+            stop_sampling(profile), os.path.join(settings["folder"], name + ".folded")
+        )
+
+    phases = {p: round(cycle["phases"][p], 4) for p in PHASES if p in cycle["phases"]}
+    with open(os.path.join(settings["folder"], "spans.jsonl"), "a") as file:
+        file.write(
+            json.dumps(
+                {
+                    "scan": cycle["scan"],
+                    "cycle": cycle["number"],
+                    "time": time.strftime(
+                        "%Y-%m-%d %H:%M:%S", time.localtime(cycle["time"])
+                    ),
+                    "seconds": round(seconds, 4),
+                    "phases": phases,
+                }
+            )
+            + "\n"
+        )
+
+    totals = PROFILER["totals"].setdefault(cycle["scan"], {"cycles": 0, "phases": {}})
+    totals["cycles"] += 1
+    for phase, phase_seconds in phases.items():
+        totals["phases"][phase] = totals["phases"].get(phase, 0.0) + phase_seconds
+
+    print(
+        f"{name} took {seconds:.3f}s: "
+        + ", ".join(f"{p} {s:.3f}s" for p, s in phases.items())
+    )
+
+
+# sample the stack of the calling thread every interval seconds in a thread of its own
+# the stacks are counted in the collapsed format that flamegraph.pl, speedscope and inferno read
+def start_sampling(interval):
+    sampler = {
+        "thread_id": threading.get_ident(),
+        "interval": interval,
+        "stacks": {},
+        "stop": threading.Event(),
+    }
+    sampler["thread"] = threading.Thread(
+        target=run_sampler, args=(sampler,), daemon=True
+    )
+    sampler["thread"].start()
+    return sampler
+
+
+# take samples until the sampler is stopped
+def run_sampler(sampler):
+    while sampler["stop"].wait(sampler["interval"]) == False:
+        frame = sys._current_frames().get(sampler["thread_id"])
+        names = []
+        while frame != None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        stack = ";".join(reversed(names))
+        sampler["stacks"][stack] = sampler["stacks"].get(stack, 0) + 1
+
+
+# stop a sampler and return the number of samples of every stack
+def stop_sampling(sampler):
+    sampler["stop"].set()
+    sampler["thread"].join()
+    return sampler["stacks"]
+
+
+# write collapsed stacks, one "frame;frame;frame count" line per stack
+def write_folded(stacks, file_path):
+    with open(file_path, "w") as file:
+        for stack, count in sorted(stacks.items()):
+            file.write(f"{stack} {count}\n")
+
+
+# print the average time of every phase per cycle of each scan that was profiled
+def print_profile_summary():
+    if PROFILER["settings"] == None:
+        return
+    end_cycle()
+    for scan, totals in PROFILER["totals"].items():
+        print(f"{scan} phases per cycle over {totals['cycles']} cycles:")
+        for phase in PHASES:
+            if phase in totals["phases"]:
+                print(f"  {phase}: {totals['phases'][phase] / totals['cycles']:.3f}s")
@@ -0,0 +1,322 @@
+# import modules to work with time, asyncio and threads
+import time, asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+
+# import requests to share one pool of http connections between the endpoints
+import requests
+
+# import web3 providers to send requests to each endpoint and the base classes of the pool providers
+from web3 import Web3
+from web3.providers.base import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+# import the rpc limiter that paces the calls to each endpoint
+from rpc import (
+    TRANSIENT_ERRORS,
+    RetriesExhausted,
+    make_limiter,
+    acquire,
+    async_acquire,
+    release,
+    classify_error,
+    classify_response,
+    get_backoff,
+    get_rpc_stats,
+)
+
+# import the metrics that every request is recorded in
+from metrics import record_rpc
+
+# read only methods that can be sent to a second endpoint when the first one is slow
+# anything that changes state e.g. eth_sendRawTransaction is only ever sent once
+HEDGE_METHODS = [
+    "eth_call",
+    "eth_getLogs",
+    "eth_blockNumber",
+    "eth_getBlockByNumber",
+    "eth_chainId",
+    "eth_gasPrice",
+    "eth_maxPriorityFeePerGas",
+    "net_version",
+]
+
+# methods whose answer never changes for a chain, web3 asks for the chain id before every eth_call so these
+# are answered from memory after the first time
+CONSTANT_METHODS = ["eth_chainId", "net_version"]
+
+# weight of the newest call in the running average latency of an endpoint
+LATENCY_WEIGHT = 0.2
+
+
+# open a pool of the endpoints of a blockchain
+# settings come from the network entry of the config data and rpc_settings from the rpc entry
+# every endpoint has its own limiter, running average latency and health
+def make_endpoint_pool(urls, settings, rpc_settings):
+    pool_size = settings.get("pool_size", 20)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=len(urls), pool_maxsize=pool_size
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    endpoints = []
+    for url in urls:
+        provider = Web3.HTTPProvider(
+            url, session=session, request_kwargs={"timeout": rpc_settings["timeout"]}
+        )
+        # retries are left to the pool so they can go to another endpoint
+        provider.middlewares = ()
+        endpoints.append(
+            {
+                "url": url,
+                "provider": provider,
+                "limiter": make_limiter(rpc_settings),
+                "latency": 0.0,
+                "failures": 0,
+                "ejected_until": 0.0,
+            }
+        )
+
+    return {
+        "endpoints": endpoints,
+        "settings": settings,
+        "rpc": rpc_settings,
+        "executor": None,
+        "hedges": 0,
+        "constants": {},
+    }
+
+
+# order the endpoints from the best to the worst for the next call
+# endpoints taken out of rotation are only used when every endpoint is out, the one due back first goes first
+# the rest are ranked by their running average latency, stretched by how busy they are
+def pick_endpoints(pool):
+    now = time.monotonic()
+    healthy = [e for e in pool["endpoints"] if e["ejected_until"] <= now]
+    if len(healthy) == 0:
+        return sorted(pool["endpoints"], key=lambda e: e["ejected_until"])
+
+    def score(endpoint):
+        limiter = endpoint["limiter"]
+        return endpoint["latency"] * (1 + limiter["in_flight"] / limiter["limit"])
+
+    return sorted(healthy, key=score)
+
+
+# give back the slot of a call, record it in the metrics and update the latency and health of its endpoint
+# an endpoint that fails eject_after times in a row is taken out of rotation for eject_for seconds
+def finish_call(pool, endpoint, method, params, error_class, start):
+    release(endpoint["limiter"], error_class)
+    elapsed = time.monotonic() - start
+    record_rpc(method, params, elapsed, error_class)
+    settings = pool["settings"]
+    if error_class == None or error_class not in TRANSIENT_ERRORS:
+        # the endpoint answered, even if the answer was an error e.g. a reverted call
+        if endpoint["latency"] == 0:
+            endpoint["latency"] = elapsed
+        else:
+            endpoint["latency"] += LATENCY_WEIGHT * (elapsed - endpoint["latency"])
+        endpoint["failures"] = 0
+        return
+
+    endpoint["failures"] += 1
+    if endpoint["failures"] >= settings["eject_after"]:
+        endpoint["ejected_until"] = time.monotonic() + settings["eject_for"]
+        endpoint["failures"] = 0
+
+
+# send one request to one endpoint, returns (endpoint, response, exception, error class)
+def send(pool, endpoint, method, params):
+    acquire(endpoint["limiter"])
+    start = time.monotonic()
+    try:
+        response = endpoint["provider"].make_request(method, params)
+    except Exception as e:
+        error_class = classify_error(e)
+        finish_call(pool, endpoint, method, params, error_class, start)
+        return (endpoint, None, e, error_class)
+    except BaseException:
+        release(endpoint["limiter"], "cancelled")
+        raise
+    error_class = classify_response(response)
+    finish_call(pool, endpoint, method, params, error_class, start)
+    return (endpoint, response, None, error_class)
+
+
+# check if a request can be sent to a second endpoint when the first is slow
+def can_hedge(pool, method, endpoints):
+    return (
+        pool["settings"]["hedge_after"] != None
+        and method in HEDGE_METHODS
+        and len(endpoints) > 1
+    )
+
+
+# send a request to the best endpoint and, if it hasn't answered after hedge_after seconds, also to the
+# second best, the first answer that isn't a transient failure is used
+def send_hedged(pool, endpoints, method, params):
+    if pool["executor"] == None:
+        pool["executor"] = ThreadPoolExecutor(
+            pool["rpc"]["max_concurrency"] * len(pool["endpoints"])
+        )
+    first = pool["executor"].submit(send, pool, endpoints[0], method, params)
+    done, pending = wait([first], timeout=pool["settings"]["hedge_after"])
+    if first in done:
+        return first.result()
+
+    pool["hedges"] += 1
+    second = pool["executor"].submit(send, pool, endpoints[1], method, params)
+    for future in as_completed([first, second]):
+        outcome = future.result()
+        if outcome[3] not in TRANSIENT_ERRORS:
+            # the slower call is left to finish in the background so its endpoint stats stay right
+            return outcome
+    return outcome
+
+
+# send a request through the pool
+# transient failures are tried again on the best endpoint at that point, which is another endpoint when the
+# failing one has been taken out of rotation or has become slower than the others
+def pool_request(pool, method, params):
+    if method in pool["constants"]:
+        return pool["constants"][method]
+    settings = pool["rpc"]
+    for attempt in range(settings["max_retries"] + 1):
+        endpoints = pick_endpoints(pool)
+        if can_hedge(pool, method, endpoints):
+            outcome = send_hedged(pool, endpoints, method, params)
+        else:
+            outcome = send(pool, endpoints[0], method, params)
+        endpoint, response, error, error_class = outcome
+        if error_class not in TRANSIENT_ERRORS:
+            if error != None:
+                raise error
+            if method in CONSTANT_METHODS and error_class == None:
+                pool["constants"][method] = response
+            return response
+
+        if attempt < settings["max_retries"]:
+            with endpoint["limiter"]["lock"]:
+                endpoint["limiter"]["retries"] += 1
+            # only wait when the next try would go to the same endpoint
+            if pick_endpoints(pool)[0] is endpoint:
+                time.sleep(get_backoff(settings, attempt))
+
+    raise RetriesExhausted(
+        f"{method} failed after {attempt + 1} tries: {error if error != None else response['error']}"
+    )
+
+
+# async version of send, providers are the async providers of the endpoints by url
+async def async_send(pool, providers, endpoint, method, params):
+    await async_acquire(endpoint["limiter"])
+    start = time.monotonic()
+    try:
+        response = await providers[endpoint["url"]].make_request(method, params)
+    except Exception as e:
+        error_class = classify_error(e)
+        finish_call(pool, endpoint, method, params, error_class, start)
+        return (endpoint, None, e, error_class)
+    except BaseException:
+        # e.g. the slower of two hedged calls, the slot is given back so it isn't lost
+        release(endpoint["limiter"], "cancelled")
+        raise
+    error_class = classify_response(response)
+    finish_call(pool, endpoint, method, params, error_class, start)
+    return (endpoint, response, None, error_class)
+
+
+# async version of send_hedged, the slower call is cancelled once the other one has answered
+async def async_send_hedged(pool, providers, endpoints, method, params):
+    first = asyncio.ensure_future(
+        async_send(pool, providers, endpoints[0], method, params)
+    )
+    done, pending = await asyncio.wait([first], timeout=pool["settings"]["hedge_after"])
+    if first in done:
+        return first.result()
+
+    pool["hedges"] += 1
+    second = asyncio.ensure_future(
+        async_send(pool, providers, endpoints[1], method, params)
+    )
+    for next_done in asyncio.as_completed([first, second]):
+        outcome = await next_done
+        if outcome[3] not in TRANSIENT_ERRORS:
+            break
+    for task in [first, second]:
+        if task.done() == False:
+            task.cancel()
+    return outcome
+
+
+# async version of pool_request
+async def async_pool_request(pool, providers, method, params):
+    if method in pool["constants"]:
+        return pool["constants"][method]
+    settings = pool["rpc"]
+    for attempt in range(settings["max_retries"] + 1):
+        endpoints = pick_endpoints(pool)
+        if can_hedge(pool, method, endpoints):
+            outcome = await async_send_hedged(
+                pool, providers, endpoints, method, params
+            )
+        else:
+            outcome = await async_send(pool, providers, endpoints[0], method, params)
+        endpoint, response, error, error_class = outcome
+        if error_class not in TRANSIENT_ERRORS:
+            if error != None:
+                raise error
+            if method in CONSTANT_METHODS and error_class == None:
+                pool["constants"][method] = response
+            return response
+
+        if attempt < settings["max_retries"]:
+            with endpoint["limiter"]["lock"]:
+                endpoint["limiter"]["retries"] += 1
+            # only wait when the next try would go to the same endpoint
+            if pick_endpoints(pool)[0] is endpoint:
+                await asyncio.sleep(get_backoff(settings, attempt))
+
+    raise RetriesExhausted(
+        f"{method} failed after {attempt + 1} tries: {error if error != None else response['error']}"
+    )
+
+
+# web3 provider that sends every request through an endpoint pool
+class PoolProvider(JSONBaseProvider):
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    def make_request(self, method, params):
+        return pool_request(self.pool, method, params)
+
+
+# async web3 provider that sends every request through an endpoint pool
+# the async providers of the endpoints are made by the caller as they are bound to its event loop
+class AsyncPoolProvider(AsyncJSONBaseProvider):
+    def __init__(self, pool, providers):
+        super().__init__()
+        self.pool = pool
+        self.providers = providers
+
+    async def make_request(self, method, params):
+        return await async_pool_request(self.pool, self.providers, method, params)
+
+
+# summary of the calls made through a pool and each of its endpoints
+def get_pool_stats(pool):
+    now = time.monotonic()
+    return {
+        "retries": sum(e["limiter"]["retries"] for e in pool["endpoints"]),
+        "hedges": pool["hedges"],
+        "endpoints": {
+            e["url"]: dict(
+                get_rpc_stats(e["limiter"]),
+                latency=round(e["latency"], 3),
+                ejected=e["ejected_until"] > now,
+            )
+            for e in pool["endpoints"]
+        },
+    }
@@ -0,0 +1,186 @@
+# import numpy to run the quote maths over many pools at once
+import numpy as np
+
+
+# get the swap fee of a dex from the config data as a (numerator, denominator) tuple
+# e.g. pancakeswap keeps 9975 of every 10000 tokens that go in
+def get_fee(config, blockchain, xch_name):
+    fee = config[blockchain][xch_name]["fee"]
+    return (int(fee[0]), int(fee[1]))
+
+
+# percentage lost to swap fees when buying on one dex and selling on another
+def round_trip_fee_perc(config, blockchain, xch_names):
+    fee0 = get_fee(config, blockchain, xch_names[0])
+    fee1 = get_fee(config, blockchain, xch_names[1])
+    return (1 - (fee0[0] / fee0[1]) * (fee1[0] / fee1[1])) * 100
+
+
+# uniswap v2 getAmountOut using the same integer maths as the router
+def get_amount_out(amount_in, reserve_in, reserve_out, fee):
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    amount_in_with_fee = amount_in * fee[0]
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * fee[1] + amount_in_with_fee
+    return numerator // denominator
+
+
+# uniswap v2 getAmountsOut along a path of pools, where reserves is a list of (reserve_in, reserve_out) for each hop
+def get_amounts_out(amount_in, reserves, fee):
+    amounts = [amount_in]
+    for reserve_in, reserve_out in reserves:
+        amounts.append(get_amount_out(amounts[-1], reserve_in, reserve_out, fee))
+    return amounts
+
+
+# turn a list of integers into a numpy array that keeps python integers
+# reserves are uint112 so they don't fit into int64 and floats would lose the last digits
+def to_int_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = [int(value) for value in values]
+    return array
+
+
+# vectorised getAmountOut over arrays of amounts and reserves
+# pools the router would reject (empty reserves or nothing going in) get an amount of 0
+def get_amount_out_array(amount_in, reserve_in, reserve_out, fee):
+    # keep a single amount as a python integer so it doesn't get squeezed into int64
+    amount_in = np.broadcast_to(np.asarray(amount_in, dtype=object), reserve_in.shape)
+    valid = (amount_in > 0) & (reserve_in > 0) & (reserve_out > 0)
+    amount_in_with_fee = amount_in * fee[0]
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * fee[1] + amount_in_with_fee
+    # avoid dividing by zero for invalid pools, the result is masked out below anyway
+    denominator = np.where(valid, denominator, 1)
+    amount_out = np.where(valid, numerator // denominator, 0)
+    return amount_out.astype(object)
+
+
+# split the reserves of each pool into base token and other token reserves
+def split_base_reserves(reserves, base_is_token0):
+    reserve0 = to_int_array([r[0] for r in reserves])
+    reserve1 = to_int_array([r[1] for r in reserves])
+    base_is_token0 = np.asarray(base_is_token0, dtype=bool)
+    base_reserve = np.where(base_is_token0, reserve0, reserve1)
+    other_reserve = np.where(base_is_token0, reserve1, reserve0)
+    return base_reserve.astype(object), other_reserve.astype(object)
+
+
+# quote the full round trip for many pool pairs at once
+# buy the other token with base_token_in on both dexes, then sell the bigger amount on the dex that gave the smaller one
+# this matches what the scanners used to get from three router getAmountsOut calls per pool
+def quote_round_trips(
+    base_token_in,
+    base_reserve,
+    other_reserve,
+    s_base_reserve,
+    s_other_reserve,
+    fee,
+    s_fee,
+):
+    amount_out = get_amount_out_array(base_token_in, base_reserve, other_reserve, fee)
+    s_amount_out = get_amount_out_array(
+        base_token_in, s_base_reserve, s_other_reserve, s_fee
+    )
+
+    # sell on the secondary dex when the primary gave more (or the same), otherwise sell on the primary
+    sell_on_secondary = amount_out >= s_amount_out
+    end_trade = np.where(
+        sell_on_secondary,
+        get_amount_out_array(amount_out, s_other_reserve, s_base_reserve, s_fee),
+        get_amount_out_array(s_amount_out, other_reserve, base_reserve, fee),
+    ).astype(object)
+
+    # the router reverts when any leg would give nothing, so flag those pools
+    valid = (amount_out > 0) & (s_amount_out > 0) & (end_trade > 0)
+    return amount_out, s_amount_out, end_trade, valid
+
+
+# quote the round trip for a list of matched pools from the scanners
+def quote_pools(pools, base_token, base_token_in, fee, s_fee):
+    base_is_token0 = [pool["token0"] == base_token for pool in pools]
+    base_reserve, other_reserve = split_base_reserves(
+        [pool["reserves"] for pool in pools], base_is_token0
+    )
+    s_base_reserve, s_other_reserve = split_base_reserves(
+        [pool["s_reserves"] for pool in pools], base_is_token0
+    )
+    return quote_round_trips(
+        base_token_in,
+        base_reserve,
+        other_reserve,
+        s_base_reserve,
+        s_other_reserve,
+        fee,
+        s_fee,
+    )
+
+
+# closed form profit maximising input for buying on pool a and selling on pool b
+# a_in/a_out are the base and other token reserves of pool a, b_in/b_out the other and base token reserves of pool b
+# both swaps together give out(x) = N * x / (D0 + k * x) with
+# N = fa * fb * a_out * b_out, D0 = a_in * b_in and k = fa * (b_in + fb * a_out)
+# so the profit out(x) - x is highest at x* = (sqrt(N * D0) - D0) / k, which is only positive when N > D0
+def get_optimal_amount_in(a_in, a_out, b_in, b_out, fee_a, fee_b):
+    # floats are fine to find the size, the profit is worked out with the integer maths afterwards
+    a_in, a_out, b_in, b_out = [
+        np.asarray(r, dtype=float) for r in (a_in, a_out, b_in, b_out)
+    ]
+    fa = fee_a[0] / fee_a[1]
+    fb = fee_b[0] / fee_b[1]
+    n = fa * fb * a_out * b_out
+    d0 = a_in * b_in
+    k = fa * (b_in + fb * a_out)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (np.sqrt(n * d0) - d0) / k
+    x = np.where((n > d0) & np.isfinite(x), x, 0)
+    return to_int_array(np.floor(x))
+
+
+# profit maximising input and profit of every pool in both directions, the better direction is kept
+# returns (amount_in, profit, buy_on_primary) with the amounts in the smallest unit of the base token
+def solve_round_trips(
+    base_reserve, other_reserve, s_base_reserve, s_other_reserve, fee, s_fee
+):
+    # buy the other token on the primary dex and sell it on the secondary dex
+    amount_in = get_optimal_amount_in(
+        base_reserve, other_reserve, s_other_reserve, s_base_reserve, fee, s_fee
+    )
+    bought = get_amount_out_array(amount_in, base_reserve, other_reserve, fee)
+    profit = (
+        get_amount_out_array(bought, s_other_reserve, s_base_reserve, s_fee) - amount_in
+    )
+
+    # buy the other token on the secondary dex and sell it on the primary dex
+    s_amount_in = get_optimal_amount_in(
+        s_base_reserve, s_other_reserve, other_reserve, base_reserve, s_fee, fee
+    )
+    s_bought = get_amount_out_array(s_amount_in, s_base_reserve, s_other_reserve, s_fee)
+    s_profit = (
+        get_amount_out_array(s_bought, other_reserve, base_reserve, fee) - s_amount_in
+    )
+
+    # rounding can leave a tiny loss, pools without a profit in either direction get a size and profit of 0
+    buy_on_primary = profit >= s_profit
+    best_in = np.where(buy_on_primary, amount_in, s_amount_in)
+    best_profit = np.where(buy_on_primary, profit, s_profit)
+    return (
+        np.where(best_profit > 0, best_in, 0).astype(object),
+        np.where(best_profit > 0, best_profit, 0).astype(object),
+        buy_on_primary,
+    )
+
+
+# solve the trade size for a list of matched pools from the scanners
+def solve_pools(pools, base_token, fee, s_fee):
+    base_is_token0 = [pool["token0"] == base_token for pool in pools]
+    base_reserve, other_reserve = split_base_reserves(
+        [pool["reserves"] for pool in pools], base_is_token0
+    )
+    s_base_reserve, s_other_reserve = split_base_reserves(
+        [pool["s_reserves"] for pool in pools], base_is_token0
+    )
+    return solve_round_trips(
+        base_reserve, other_reserve, s_base_reserve, s_other_reserve, fee, s_fee
+    )
@@ -0,0 +1,140 @@
+# import modules to interact with the os and work with sqlite
+import os, sqlite3
+
+
+# function to open the pair registry and create the table the first time
+def open_registry(file_path):
+    # make sure the folder for the database exists
+    folder = os.path.dirname(file_path)
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(file_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pairs (
+            chain TEXT NOT NULL,
+            factory TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            pool TEXT NOT NULL,
+            token0 TEXT NOT NULL,
+            token1 TEXT NOT NULL,
+            PRIMARY KEY (chain, factory, idx)
+        )
+        """)
+    # token to pools indices so a scan for a base token only reads the pools that hold it
+    # the index is in pair index order within a token so both can be merged without a sort
+    # sqlite keeps the indices up to date as pairs are stored, an older registry gets them the first time it opens
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS pairs_token0 ON pairs (chain, factory, token0, idx)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS pairs_token1 ON pairs (chain, factory, token1, idx)"
+    )
+    # last block whose PairCreated events have been stored for each factory, see discovery.py
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS discovery (
+            chain TEXT NOT NULL,
+            factory TEXT NOT NULL,
+            block INTEGER NOT NULL,
+            PRIMARY KEY (chain, factory)
+        )
+        """)
+    conn.commit()
+    return conn
+
+
+# number of pairs stored for a factory - pairs are stored without gaps so this is also the next index to fetch
+def get_stored_length(conn, chain, factory):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM pairs WHERE chain = ? AND factory = ?",
+        (chain, factory),
+    ).fetchone()
+    return row[0]
+
+
+# last block whose new pairs are all stored for a factory, None when its events have never been followed
+def get_discovered_block(conn, chain, factory):
+    row = conn.execute(
+        "SELECT block FROM discovery WHERE chain = ? AND factory = ?",
+        (chain, factory),
+    ).fetchone()
+    if row == None:
+        return None
+    return row[0]
+
+
+# record that every pair a factory created up to a block is stored
+def save_discovered_block(conn, chain, factory, block):
+    conn.execute(
+        "INSERT OR REPLACE INTO discovery (chain, factory, block) VALUES (?, ?, ?)",
+        (chain, factory, block),
+    )
+    conn.commit()
+
+
+# store pools in the format returned by get_pools_by_index
+# only the unbroken run of indices from the stored length is kept so a failed read gets fetched again next time
+def store_pairs(conn, chain, factory, pools):
+    next_index = get_stored_length(conn, chain, factory)
+    rows = []
+    for pool in sorted(pools, key=lambda p: p["id"]):
+        if pool["id"] < next_index:
+            continue
+        if pool["id"] != next_index:
+            break
+        rows.append(
+            (
+                chain,
+                factory,
+                pool["id"],
+                pool["pool_address"],
+                pool["token0"],
+                pool["token1"],
+            )
+        )
+        next_index += 1
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO pairs (chain, factory, idx, pool, token0, token1) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    return next_index
+
+
+# stream the stored pools of a factory in index order, one pool at a time
+# with a token only the pools that hold it are read, the pools with it as token0 and as token1 come from the
+# token indices and are merged in index order
+def iter_pairs(conn, chain, factory, token=None):
+    if token == None:
+        rows = conn.execute(
+            "SELECT idx, pool, token0, token1 FROM pairs WHERE chain = ? AND factory = ? ORDER BY idx",
+            (chain, factory),
+        )
+    else:
+        rows = conn.execute(
+            "SELECT idx, pool, token0, token1 FROM pairs WHERE chain = ? AND factory = ? AND token0 = ? "
+            "UNION ALL "
+            "SELECT idx, pool, token0, token1 FROM pairs WHERE chain = ? AND factory = ? AND token1 = ? "
+            "ORDER BY idx",
+            (chain, factory, token, chain, factory, token),
+        )
+    for row in rows:
+        yield {"id": row[0], "pool_address": row[1], "token0": row[2], "token1": row[3]}
+
+
+# check if a pool holds a token, every pool does when the token is None
+def has_token(pool, token):
+    return token == None or token in [pool["token0"], pool["token1"]]
+
+
+# load stored pools for a factory in index order, optionally only for selected indices or pools that hold a token
+def load_pairs(conn, chain, factory, selected_ids=None, token=None):
+    pools = list(iter_pairs(conn, chain, factory, token))
+
+    if selected_ids != None:
+        # keep the order of the selected ids
+        by_id = {pool["id"]: pool for pool in pools}
+        pools = [by_id[i] for i in selected_ids if i in by_id]
+
+    return pools
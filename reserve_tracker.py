@@ -0,0 +1,201 @@
+# import modules to interact with the os and the blockchain
+import time
+from hexbytes import HexBytes
+from web3 import Web3
+
+# import the batched view calls used for the first read of the reserves
+from multicall import multicall, repeat_call
+
+# every uniswap v2 style pool emits Sync(reserve0, reserve1) whenever its reserves change
+SYNC_TOPIC = Web3.keccak(text="Sync(uint112,uint112)").hex()
+
+
+# read the reserves of the Sync event from the raw log data
+def decode_sync(log):
+    data = HexBytes(log["data"])
+    return [int.from_bytes(data[0:32], "big"), int.from_bytes(data[32:64], "big")]
+
+
+# read the reserves of pools at a given block using batched calls
+# pools that can't be read are left as None until a Sync event fills them in
+def read_reserves(tracker, addresses, block_number):
+    if len(addresses) == 0:
+        return
+    reserve_results = multicall(
+        w3=tracker["w3"],
+        multicall_address=tracker["multicall"]["address"],
+        calls=repeat_call(
+            tracker["pool_class"](address=addresses[0]).functions.getReserves(),
+            addresses,
+        ),
+        batch_size=tracker["multicall"]["batch_size"],
+        block_identifier=block_number,
+    )
+    for address, (success, reserves) in zip(addresses, reserve_results):
+        tracker["reserves"][address] = reserves[0:2] if success else None
+
+
+# read the reserves of every tracked pool at a given block
+def read_all_reserves(tracker, block_number):
+    tracker["reserves"] = {}
+    read_reserves(tracker, tracker["addresses"], block_number)
+
+    # nothing past this block has been applied so there is nothing to undo
+    tracker["block"] = block_number
+    tracker["confirmed_block"] = block_number
+    tracker["block_hashes"] = {}
+    tracker["journal"] = []
+
+
+# start tracking the reserves of a list of pools
+# the first read is done at a confirmed block so a reorg can never go past it
+def start_tracker(w3, config, blockchain, pool_addresses, pool_abi):
+    settings = config[blockchain]["reserve_tracker"]
+    tracker = {
+        "w3": w3,
+        "multicall": config[blockchain]["multicall"],
+        "confirmations": settings["confirmations"],
+        "max_block_range": settings["max_block_range"],
+        "address_chunk": settings["address_chunk"],
+        "pool_class": w3.eth.contract(abi=pool_abi),
+        "addresses": list(
+            dict.fromkeys(w3.toChecksumAddress(a) for a in pool_addresses)
+        ),
+    }
+    head = w3.eth.block_number
+    read_all_reserves(tracker, max(head - tracker["confirmations"], 0))
+    return tracker
+
+
+# start tracking more pools e.g. pools that were just created, their reserves are read at the block the
+# tracker is at so the Sync events of the next update carry on from there
+def add_tracked_pools(tracker, pool_addresses):
+    addresses = [
+        a
+        for a in dict.fromkeys(Web3.toChecksumAddress(a) for a in pool_addresses)
+        if a not in tracker["reserves"]
+    ]
+    read_reserves(tracker, addresses, tracker["block"])
+    tracker["addresses"] += addresses
+
+
+# get the Sync events of the tracked pools between two blocks in block chunks
+# a few tracked pools are asked for by address, when there are more than address_chunk of them the Sync events
+# of every pool are read with one eth_getLogs per block chunk and the ones of untracked pools are dropped here
+def get_sync_logs(tracker, from_block, to_block):
+    address_filter = {"address": tracker["addresses"]}
+    if len(tracker["addresses"]) > tracker["address_chunk"]:
+        address_filter = {}
+
+    tracked = set(tracker["addresses"])
+    logs = []
+    for chunk_start in range(from_block, to_block + 1, tracker["max_block_range"]):
+        chunk_end = min(chunk_start + tracker["max_block_range"] - 1, to_block)
+        logs += [
+            log
+            for log in tracker["w3"].eth.get_logs(
+                {
+                    "fromBlock": chunk_start,
+                    "toBlock": chunk_end,
+                    "topics": [SYNC_TOPIC],
+                    **address_filter,
+                }
+            )
+            if Web3.toChecksumAddress(log["address"]) in tracked
+        ]
+
+    # apply the events in the order they happened on chain
+    return sorted(logs, key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+
+# apply Sync events to the tracked reserves and keep what they replaced so they can be undone
+def apply_sync_logs(tracker, logs):
+    changed = set()
+    for log in logs:
+        if log.get("removed", False):
+            continue
+        address = Web3.toChecksumAddress(log["address"])
+        if address not in tracker["reserves"]:
+            continue
+        tracker["journal"].append(
+            (log["blockNumber"], address, tracker["reserves"][address])
+        )
+        tracker["reserves"][address] = decode_sync(log)
+        changed.add(address)
+    return changed
+
+
+# undo every Sync event applied after a block
+def rollback(tracker, block_number):
+    changed = set()
+    while len(tracker["journal"]) > 0 and tracker["journal"][-1][0] > block_number:
+        _, address, reserves = tracker["journal"].pop()
+        tracker["reserves"][address] = reserves
+        changed.add(address)
+
+    tracker["block"] = block_number
+    tracker["block_hashes"] = {
+        k: v for k, v in tracker["block_hashes"].items() if k <= block_number
+    }
+    return changed
+
+
+# find the newest block the tracker has seen that is still on the canonical chain
+# if none of them are left then fall back to the confirmed block
+def find_common_block(tracker):
+    for block_number in sorted(tracker["block_hashes"], reverse=True):
+        block = tracker["w3"].eth.get_block(block_number)
+        if block["hash"] == tracker["block_hashes"][block_number]:
+            return block_number
+    return tracker["confirmed_block"]
+
+
+# drop undo information for blocks that are now too deep to be reorged
+def prune_confirmed(tracker):
+    confirmed_block = tracker["block"] - tracker["confirmations"]
+    if confirmed_block <= tracker["confirmed_block"]:
+        return
+    tracker["confirmed_block"] = confirmed_block
+    tracker["journal"] = [j for j in tracker["journal"] if j[0] > confirmed_block]
+    tracker["block_hashes"] = {
+        k: v for k, v in tracker["block_hashes"].items() if k > confirmed_block
+    }
+
+
+# bring the tracked reserves up to the latest block
+# returns the addresses of the pools whose reserves changed since the last update
+def update_tracker(tracker):
+    w3 = tracker["w3"]
+    changed = set()
+
+    # if the last block seen has been replaced then undo back to a block both chains share
+    last_hash = tracker["block_hashes"].get(tracker["block"])
+    if last_hash != None and w3.eth.get_block(tracker["block"])["hash"] != last_hash:
+        changed |= rollback(tracker, find_common_block(tracker))
+
+    head = w3.eth.get_block("latest")
+    if head["number"] > tracker["block"]:
+        logs = get_sync_logs(tracker, tracker["block"] + 1, head["number"])
+        changed |= apply_sync_logs(tracker, logs)
+        tracker["block"] = head["number"]
+        tracker["block_hashes"][head["number"]] = head["hash"]
+        prune_confirmed(tracker)
+
+    return changed
+
+
+# wait until the chain has moved past the last block the tracker has seen
+def wait_for_block(tracker, poll_interval):
+    while tracker["w3"].eth.block_number <= tracker["block"]:
+        time.sleep(poll_interval)
+
+
+# copy the tracked reserves onto matched pools and keep only pools with reserves on both dexes
+def get_tracked_reserves(tracker, pools):
+    priced_pools = []
+    for pool in pools:
+        pool["reserves"] = tracker["reserves"].get(pool["pool_address"])
+        pool["s_reserves"] = tracker["reserves"].get(pool["s_pool_address"])
+        if pool["reserves"] != None and pool["s_reserves"] != None:
+            priced_pools.append(pool)
+    return priced_pools
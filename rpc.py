@@ -0,0 +1,164 @@
+# import modules to work with time, random jitter, asyncio and threads
+import time, random, asyncio, threading
+
+# import requests and aiohttp to tell the errors of the sync and async providers apart
+import requests, aiohttp
+
+# error classes that are worth another try, throttled and timeout also mean the provider is overloaded
+# behind is a node that hasn't got the block a call is pinned to yet
+TRANSIENT_ERRORS = ["throttled", "timeout", "connection", "server", "behind"]
+CONGESTION_ERRORS = ["throttled", "timeout"]
+
+# json-rpc error codes and messages that public nodes use when they throttle
+THROTTLE_CODES = [-32005, 429]
+THROTTLE_MESSAGES = ["rate limit", "limit exceeded", "too many requests"]
+BEHIND_MESSAGES = ["header not found", "unknown block", "missing trie node"]
+
+# how long a call waits before it looks for a free slot again
+SLOT_POLL = 0.005
+
+
+# raised when a call still fails for a transient reason after every retry
+class RetriesExhausted(Exception):
+    pass
+
+
+# open the limiter of an endpoint, settings come from the rpc entry of the config data
+# the limiter has a token bucket for the request rate and an in flight limit that is set by aimd:
+# every good call adds a little to the limit and a throttled or timed out call cuts it by a factor
+def make_limiter(settings):
+    return {
+        "settings": settings,
+        "rate": settings["rate"],
+        "capacity": settings["burst"],
+        "tokens": settings["burst"],
+        "updated": time.monotonic(),
+        "limit": float(settings["initial_concurrency"]),
+        "in_flight": 0,
+        "last_decrease": 0.0,
+        "calls": 0,
+        "retries": 0,
+        "errors": {},
+        "lock": threading.Lock(),
+    }
+
+
+# take a token and an in flight slot if both are free, otherwise return how long to wait
+def try_acquire(limiter):
+    with limiter["lock"]:
+        now = time.monotonic()
+        limiter["tokens"] = min(
+            limiter["capacity"],
+            limiter["tokens"] + (now - limiter["updated"]) * limiter["rate"],
+        )
+        limiter["updated"] = now
+        if limiter["in_flight"] >= int(limiter["limit"]):
+            return SLOT_POLL
+        if limiter["tokens"] < 1:
+            return (1 - limiter["tokens"]) / limiter["rate"]
+        limiter["tokens"] -= 1
+        limiter["in_flight"] += 1
+        return 0
+
+
+# wait for a token and an in flight slot
+def acquire(limiter):
+    wait = try_acquire(limiter)
+    while wait > 0:
+        time.sleep(wait)
+        wait = try_acquire(limiter)
+
+
+# async version of acquire, the limiter is shared with the sync client of the same endpoint
+async def async_acquire(limiter):
+    wait = try_acquire(limiter)
+    while wait > 0:
+        await asyncio.sleep(wait)
+        wait = try_acquire(limiter)
+
+
+# give back the slot of a call and adjust the in flight limit with the outcome of the call
+# error_class is None for a good call and "cancelled" for a call that was given up e.g. a hedged call that lost
+def release(limiter, error_class):
+    settings = limiter["settings"]
+    with limiter["lock"]:
+        limiter["in_flight"] -= 1
+        if error_class == "cancelled":
+            return
+        limiter["calls"] += 1
+        if error_class == None:
+            # additive increase, about one more slot for every limit good calls
+            limiter["limit"] = min(
+                settings["max_concurrency"],
+                limiter["limit"] + settings["increase"] / limiter["limit"],
+            )
+            return
+
+        limiter["errors"][error_class] = limiter["errors"].get(error_class, 0) + 1
+        # multiplicative decrease, the calls that were in flight when the provider pushed back
+        # fail together so the limit is cut at most once per cooldown
+        now = time.monotonic()
+        if (
+            error_class in CONGESTION_ERRORS
+            and now - limiter["last_decrease"] >= settings["cooldown"]
+        ):
+            limiter["limit"] = max(
+                settings["min_concurrency"], limiter["limit"] * settings["decrease"]
+            )
+            limiter["last_decrease"] = now
+
+
+# class of an exception raised by the sync or async provider
+def classify_error(error):
+    status = None
+    if isinstance(error, requests.HTTPError) and error.response != None:
+        status = error.response.status_code
+    elif isinstance(error, aiohttp.ClientResponseError):
+        status = error.status
+
+    if status == 429:
+        return "throttled"
+    if status != None and status >= 500:
+        return "server"
+    if isinstance(error, (requests.Timeout, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, (requests.ConnectionError, aiohttp.ClientConnectionError)):
+        return "connection"
+    return "other"
+
+
+# class of a json-rpc response, None when the response has no error
+# errors other than throttling e.g. a reverted call are counted but not tried again
+def classify_response(response):
+    error = response.get("error")
+    if error == None:
+        return None
+    if isinstance(error, dict):
+        code = error.get("code")
+        message = str(error.get("message", "")).lower()
+    else:
+        code = None
+        message = str(error).lower()
+    if code in THROTTLE_CODES or any(m in message for m in THROTTLE_MESSAGES):
+        return "throttled"
+    if any(m in message for m in BEHIND_MESSAGES):
+        return "behind"
+    return "rpc"
+
+
+# bounded exponential backoff with full jitter before the next try of a call
+def get_backoff(settings, attempt):
+    return random.uniform(
+        0, min(settings["backoff_cap"], settings["backoff_base"] * 2**attempt)
+    )
+
+
+# summary of the calls made through a limiter
+def get_rpc_stats(limiter):
+    with limiter["lock"]:
+        return {
+            "calls": limiter["calls"],
+            "retries": limiter["retries"],
+            "errors": dict(limiter["errors"]),
+            "concurrency": round(limiter["limit"], 1),
+        }
@@ -0,0 +1,155 @@
+# import modules to work with time and sort pools by priority
+import time, math
+
+# tiers from the most to the least often refreshed
+TIERS = ["hot", "warm", "cold"]
+
+
+# make a scheduler that spreads the reads of a scan over blocks, settings come from the scheduler entry of
+# the config data and cost is the number of contract calls it takes to read one pool e.g. two getReserves
+# every pool is put in a tier from how close it was to a profitable spread, how fast its spread moves and
+# its liquidity, hot pools are read every block and cold ones rarely, as long as the call budget allows
+# scan is what the scanner keeps between its rounds e.g. its setup and matched pools
+def make_scheduler(settings, cost):
+    return {
+        "settings": settings,
+        "cost": cost,
+        "pools": {},
+        "scan": None,
+        "block": None,
+        "credit": settings["call_budget"],
+        "refilled": time.monotonic(),
+    }
+
+
+# wait for a block after the one of the last round and start a round at it
+# the first round starts at the current block straight away
+def start_round(scheduler, w3):
+    block = w3.eth.block_number
+    while scheduler["block"] != None and block <= scheduler["block"]:
+        time.sleep(scheduler["settings"]["poll_interval"])
+        block = w3.eth.block_number
+    scheduler["block"] = block
+    return block
+
+
+# add the calls earned since the last refill, at most a minute of calls is kept so a pause doesn't turn into
+# a burst
+def refill_credit(scheduler):
+    now = time.monotonic()
+    budget = scheduler["settings"]["call_budget"]
+    scheduler["credit"] = min(
+        scheduler["credit"] + budget * (now - scheduler["refilled"]) / 60, budget
+    )
+    scheduler["refilled"] = now
+
+
+# pick the pools to read in this round from their keys e.g. pool ids or pair names
+# a pool is due when its tier says it should be read again, pools that were never read are due straight away
+# due pools are taken from the hottest tier down, the most overdue first, for as long as there is credit
+# pools left over stay due and go first in their tier next round
+def select_due(scheduler, keys):
+    refill_credit(scheduler)
+    every = scheduler["settings"]["every"]
+    block = scheduler["block"]
+    due = []
+    for key in keys:
+        state = scheduler["pools"].get(key)
+        if state == None:
+            # a new pool is read as a warm one that is as overdue as can be
+            due.append((TIERS.index("warm"), -math.inf, key))
+            continue
+        overdue = (block - state["block"]) / every[state["tier"]]
+        if overdue >= 1:
+            due.append((TIERS.index(state["tier"]), -overdue, key))
+
+    selected = set()
+    for rank, overdue, key in sorted(due, key=lambda d: (d[0], d[1])):
+        if scheduler["credit"] < scheduler["cost"]:
+            break
+        scheduler["credit"] -= scheduler["cost"]
+        selected.add(key)
+    return selected
+
+
+# edge of a round trip between two prices of the same pair, positive when buying on the cheaper side and
+# selling on the other makes a profit after fees
+# fee_factor is the share of a trade that is left after both swap fees e.g. 0.9975 * 0.998
+def get_edge(price, s_price, fee_factor):
+    if price <= 0 or s_price <= 0:
+        return -1.0
+    return max(price / s_price, s_price / price) * fee_factor - 1
+
+
+# edge and liquidity of a matched pool from its reserves on both dexes
+# liquidity is the base token reserve of the thinner pool in units of base_token_in
+def get_pool_edge(pool, base_token, base_token_in, fee_factor):
+    base = 0 if pool["token0"] == base_token else 1
+    reserves, s_reserves = pool["reserves"], pool["s_reserves"]
+    if reserves[base] == 0 or s_reserves[base] == 0:
+        return -1.0, 0.0
+    edge = get_edge(
+        reserves[1 - base] / reserves[base],
+        s_reserves[1 - base] / s_reserves[base],
+        fee_factor,
+    )
+    return edge, min(reserves[base], s_reserves[base]) / base_token_in
+
+
+# record a read of a pool and move it to its tier
+def record_read(scheduler, key, edge, liquidity):
+    settings = scheduler["settings"]
+    state = scheduler["pools"].setdefault(key, {"edges": []})
+    state["edges"] = (state["edges"] + [(scheduler["block"], edge)])[
+        -settings["window"] :
+    ]
+    state["block"] = scheduler["block"]
+    state["liquidity"] = liquidity
+    state["tier"] = get_tier(settings, state)
+
+
+# record the reads of a batch of matched pools of the scan pipeline
+def record_pools(scheduler, pools, base_token, base_token_in, fee, s_fee):
+    fee_factor = (fee[0] / fee[1]) * (s_fee[0] / s_fee[1])
+    for pool in pools:
+        edge, liquidity = get_pool_edge(pool, base_token, base_token_in, fee_factor)
+        record_read(scheduler, pool["id"], edge, liquidity)
+
+
+# average change of the edge of a pool per block over its recent reads, None before its second read
+def get_move(edges):
+    if len(edges) < 2:
+        return None
+    change = sum(abs(b[1] - a[1]) for a, b in zip(edges, edges[1:]))
+    blocks = edges[-1][0] - edges[0][0]
+    return change / max(blocks, 1)
+
+
+# tier of a pool from its recent reads
+# a pool with too little liquidity to trade is cold, a profitable one is hot and the others are put in a
+# tier by how many blocks their spread would take to become profitable if it kept moving at its recent pace
+def get_tier(settings, state):
+    if state["liquidity"] < settings["min_liquidity"]:
+        return "cold"
+    distance = -state["edges"][-1][1]
+    if distance <= 0:
+        return "hot"
+    move = get_move(state["edges"])
+    if move == None:
+        return "warm"
+    if move == 0:
+        return "cold"
+    blocks_to_profit = distance / move
+    if blocks_to_profit <= settings["hot_blocks"]:
+        return "hot"
+    if blocks_to_profit > settings["cold_blocks"]:
+        return "cold"
+    return "warm"
+
+
+# number of pools in each tier
+def count_tiers(scheduler):
+    counts = {tier: 0 for tier in TIERS}
+    for state in scheduler["pools"].values():
+        counts[state["tier"]] += 1
+    return counts
@@ -0,0 +1,73 @@
+# import modules to run work in a pool of processes and show progress from a thread
+import threading
+from multiprocessing import Pool, Manager
+
+# import tqdm for a progress bar
+from tqdm import tqdm
+
+
+# split a list of items e.g. factory indices into consecutive shards
+def split_shards(items, shard_size):
+    return [items[i : i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+# called by a worker to tell the main process how many items of its shard are done
+def report_progress(progress, shard_no, count):
+    if progress != None:
+        progress.put((shard_no, count))
+
+
+# run the worker function on one shard in a worker process
+def run_shard(args):
+    worker_fn, worker_args, shard_no, shard, progress = args
+    return worker_fn(*worker_args, shard, shard_no, progress)
+
+
+# show a progress bar for every shard that is being worked on until None is received
+def show_progress(progress, shards, processes, description):
+    bars = {}
+    while True:
+        item = progress.get()
+        if item == None:
+            break
+        shard_no, count = item
+        if shard_no not in bars:
+            bars[shard_no] = tqdm(
+                total=len(shards[shard_no]),
+                desc=f"{description} shard {shard_no + 1}/{len(shards)}: ",
+                position=shard_no % processes,
+                leave=False,
+            )
+        bars[shard_no].update(count)
+        if bars[shard_no].n >= bars[shard_no].total:
+            bars.pop(shard_no).close()
+
+    for bar in bars.values():
+        bar.close()
+
+
+# run worker_fn(*worker_args, shard, shard_no, progress) over every shard in a pool of processes
+# results are yielded in shard order as soon as they are ready so they can be merged into one sink
+# initializer runs once in every worker e.g. to make sure each worker opens its own rpc client
+def run_sharded(
+    worker_fn, worker_args, shards, processes, description, initializer=None
+):
+    manager = Manager()
+    progress = manager.Queue()
+    progress_thread = threading.Thread(
+        target=show_progress, args=(progress, shards, processes, description)
+    )
+    progress_thread.start()
+
+    tasks = [
+        (worker_fn, worker_args, shard_no, shard, progress)
+        for shard_no, shard in enumerate(shards)
+    ]
+    try:
+        with Pool(processes, initializer=initializer) as pool:
+            for result in pool.imap(run_shard, tasks):
+                yield result
+    finally:
+        progress.put(None)
+        progress_thread.join()
+        manager.shutdown()
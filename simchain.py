@@ -0,0 +1,436 @@
+# import modules to work with json, time, random numbers and threads and serve json-rpc over http
+import json, time, random, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# import the abi encoder to answer contract calls the way a node would
+from eth_abi import encode_abi, decode_abi
+from web3 import Web3
+
+# the events the scanners read from the logs of a uniswap v2 style factory and its pools
+SYNC_TOPIC = Web3.keccak(text="Sync(uint112,uint112)").hex()
+PAIR_CREATED_TOPIC = Web3.keccak(
+    text="PairCreated(address,address,address,uint256)"
+).hex()
+
+# the view functions of the simulated contracts by signature, the argument types are read from the signature
+SIM_FUNCTIONS = [
+    "allPairsLength()",
+    "allPairs(uint256)",
+    "getPair(address,address)",
+    "token0()",
+    "token1()",
+    "getReserves()",
+    "getAmountsOut(uint256,address[])",
+    "decimals()",
+    "symbol()",
+    "tryAggregate(bool,(address,bytes)[])",
+]
+
+
+# the 4 byte selector of every function signature and its name and argument types
+def get_selector_table(signatures):
+    table = {}
+    for signature in signatures:
+        name, args = signature[:-1].split("(", 1)
+        arg_types = []
+        # the only tuple argument is the call list of tryAggregate
+        if args.startswith("bool,"):
+            arg_types = ["bool", args[5:]]
+        elif args != "":
+            arg_types = args.split(",")
+        table[Web3.keccak(text=signature)[:4].hex()] = (name, arg_types)
+    return table
+
+
+SIM_SELECTORS = get_selector_table(SIM_FUNCTIONS)
+
+# first block of a simulated chain, high enough for scanners that read a number of blocks behind the head
+SIM_START_BLOCK = 1000
+
+
+# address of the n-th simulated contract
+def sim_address(n):
+    return Web3.toChecksumAddress("0x" + "%040x" % n)
+
+
+# build a simulated chain of uniswap v2 style dexes
+# dex_fees is a dictionary of dex name -> [fee numerator, fee denominator] e.g. {"biswap": [998, 1000], ...}
+# every token is listed on the first dex and on each other dex with a chance of overlap, 4 in 5 pools hold
+# the base token and the others pair neighbouring tokens, every token has one price on every dex so the spread
+# between dexes is the noise and stays under the swap fees
+def make_sim_chain(
+    dex_fees,
+    n_pools,
+    overlap,
+    base_symbol="wbnb",
+    multicall_address=None,
+    seed=1,
+    noise=0.001,
+):
+    rnd = random.Random(seed)
+    chain = {
+        "block": SIM_START_BLOCK,
+        "base_token": sim_address(0x10000),
+        "tokens": {},
+        "factories": {},
+        "routers": {},
+        "pairs": {},
+        "logs": {},
+        "forks": {},
+        "journal": [],
+        "multicall": multicall_address,
+        "requests": {},
+        "random": rnd,
+        "lock": threading.Lock(),
+    }
+    chain["tokens"][chain["base_token"]] = {"decimals": 18, "symbol": base_symbol}
+
+    prices = {chain["base_token"]: 1.0}
+    token_addresses = []
+    for i in range(n_pools):
+        address = sim_address(0x20000 + i)
+        chain["tokens"][address] = {
+            "decimals": rnd.choice([18, 18, 18, 9, 6]),
+            "symbol": "t" + str(i),
+        }
+        prices[address] = 10 ** rnd.uniform(-3, 3)
+        token_addresses.append(address)
+
+    for k, (dex_name, fee) in enumerate(dex_fees.items()):
+        factory = sim_address(0x30000 + k)
+        router = sim_address(0x40000 + k)
+        chain["factories"][factory] = {"name": dex_name, "pairs": [], "index": {}}
+        chain["routers"][router] = {"name": dex_name, "factory": factory, "fee": fee}
+        for i, token in enumerate(token_addresses):
+            if k > 0 and rnd.random() > overlap:
+                continue
+            other = chain["base_token"]
+            if rnd.random() > 0.8:
+                other = token_addresses[(i + 1) % n_pools]
+            # depth of the pool in base tokens and the reserves that give both tokens their price
+            depth = 10 ** rnd.uniform(1, 4)
+            reserves = [
+                int(
+                    depth
+                    / prices[t]
+                    * (1 + rnd.uniform(-noise, noise))
+                    * 10 ** chain["tokens"][t]["decimals"]
+                )
+                for t in [token, other]
+            ]
+            add_sim_pair(chain, factory, token, other, reserves)
+
+    return chain
+
+
+# sort two token addresses the way a uniswap v2 factory does
+def sort_tokens(token_a, token_b):
+    return sorted([token_a, token_b], key=lambda address: address.lower())
+
+
+# add a log to the current block of the chain
+def add_sim_log(chain, address, topics, data):
+    chain["logs"].setdefault(chain["block"], []).append(
+        {"address": address, "topics": topics, "data": data}
+    )
+
+
+# create a pool on a factory, reserves are given in the order of token_a and token_b
+def add_sim_pair(chain, factory, token_a, token_b, reserves):
+    token0, token1 = sort_tokens(token_a, token_b)
+    if token0 != token_a:
+        reserves = reserves[::-1]
+    pair = sim_address(0x50000 + len(chain["pairs"]))
+    chain["pairs"][pair] = {
+        "factory": factory,
+        "token0": token0,
+        "token1": token1,
+        "reserves": list(reserves),
+    }
+    chain["factories"][factory]["pairs"].append(pair)
+    chain["factories"][factory]["index"][(token0, token1)] = pair
+    add_sim_log(
+        chain,
+        factory,
+        [
+            PAIR_CREATED_TOPIC,
+            "0x" + "0" * 24 + token0[2:].lower(),
+            "0x" + "0" * 24 + token1[2:].lower(),
+        ],
+        "0x"
+        + encode_abi(
+            ["address", "uint256"], [pair, len(chain["factories"][factory]["pairs"])]
+        ).hex(),
+    )
+    return pair
+
+
+# set the reserves of a pool and emit its Sync event, the reserves it replaced are kept for a reorg
+def set_sim_reserves(chain, pair, reserves):
+    chain["journal"].append((chain["block"], pair, chain["pairs"][pair]["reserves"]))
+    chain["pairs"][pair]["reserves"] = list(reserves)
+    add_sim_log(
+        chain,
+        pair,
+        [SYNC_TOPIC],
+        "0x" + encode_abi(["uint112", "uint112"], reserves).hex(),
+    )
+
+
+# move the chain on by one block in which the liquidity of a number of random pools goes up or down
+# both reserves move together so prices and the spreads between dexes stay the same
+def mine_sim_block(chain, updates=0):
+    with chain["lock"]:
+        chain["block"] += 1
+        pairs = list(chain["pairs"])
+        for pair in chain["random"].sample(pairs, min(updates, len(pairs))):
+            scale = chain["random"].uniform(0.99, 1.01)
+            set_sim_reserves(
+                chain,
+                pair,
+                [int(r * scale) for r in chain["pairs"][pair]["reserves"]],
+            )
+
+
+# drop the last depth blocks as a reorg would, their logs are removed and the reserves they changed are set
+# back, blocks mined after this get new hashes so a client can tell the old ones were replaced
+def reorg_sim_chain(chain, depth):
+    with chain["lock"]:
+        fork = chain["block"] - depth
+        while len(chain["journal"]) > 0 and chain["journal"][-1][0] > fork:
+            _, pair, reserves = chain["journal"].pop()
+            chain["pairs"][pair]["reserves"] = reserves
+        for number in range(fork + 1, chain["block"] + 1):
+            chain["logs"].pop(number, None)
+            chain["forks"][number] = chain["forks"].get(number, 0) + 1
+        chain["block"] = fork
+
+
+# mine a block every block_time seconds in a background thread until stop_sim_miner is called
+def start_sim_miner(chain, block_time, updates):
+    miner = {"stop": threading.Event()}
+
+    def mine():
+        while miner["stop"].wait(block_time) == False:
+            mine_sim_block(chain, updates)
+
+    miner["thread"] = threading.Thread(target=mine, daemon=True)
+    miner["thread"].start()
+    return miner
+
+
+# stop the miner of start_sim_miner
+def stop_sim_miner(miner):
+    miner["stop"].set()
+    miner["thread"].join()
+
+
+# amount out of a swap with the same maths as a uniswap v2 router
+def get_sim_amount_out(fee, amount_in, reserve_in, reserve_out):
+    amount_in_with_fee = amount_in * fee[0]
+    return (
+        amount_in_with_fee * reserve_out // (reserve_in * fee[1] + amount_in_with_fee)
+    )
+
+
+# run a view call against the simulated contracts and return the encoded result
+# a call that a contract would revert raises a ValueError
+def call_sim_contract(chain, to, data):
+    to = Web3.toChecksumAddress(to)
+    if data[:10] not in SIM_SELECTORS:
+        raise ValueError("unknown function")
+    name, arg_types = SIM_SELECTORS[data[:10]]
+    args = decode_abi(arg_types, bytes.fromhex(data[10:])) if arg_types else []
+
+    if to == chain["multicall"] and name == "tryAggregate":
+        results = []
+        for target, call_data in args[1]:
+            try:
+                results.append(
+                    (True, call_sim_contract(chain, target, "0x" + call_data.hex()))
+                )
+            except ValueError:
+                results.append((False, b""))
+        return encode_abi(["(bool,bytes)[]"], [results])
+
+    if to in chain["factories"]:
+        factory = chain["factories"][to]
+        if name == "allPairsLength":
+            return encode_abi(["uint256"], [len(factory["pairs"])])
+        if name == "allPairs" and args[0] < len(factory["pairs"]):
+            return encode_abi(["address"], [factory["pairs"][args[0]]])
+        if name == "getPair":
+            key = tuple(sort_tokens(*[Web3.toChecksumAddress(a) for a in args]))
+            return encode_abi(["address"], [factory["index"].get(key, sim_address(0))])
+
+    if to in chain["pairs"]:
+        pair = chain["pairs"][to]
+        if name == "token0":
+            return encode_abi(["address"], [pair["token0"]])
+        if name == "token1":
+            return encode_abi(["address"], [pair["token1"]])
+        if name == "getReserves":
+            return encode_abi(
+                ["uint112", "uint112", "uint32"],
+                [pair["reserves"][0], pair["reserves"][1], chain["block"]],
+            )
+
+    if to in chain["routers"]:
+        router = chain["routers"][to]
+        factory = chain["factories"][router["factory"]]
+        amounts = [args[0]]
+        path = [Web3.toChecksumAddress(a) for a in args[1]]
+        for token_in, token_out in zip(path, path[1:]):
+            key = tuple(sort_tokens(token_in, token_out))
+            if key not in factory["index"]:
+                raise ValueError("no pool")
+            reserves = chain["pairs"][factory["index"][key]]["reserves"]
+            if key[0] != token_in:
+                reserves = reserves[::-1]
+            amounts.append(
+                get_sim_amount_out(router["fee"], amounts[-1], reserves[0], reserves[1])
+            )
+        return encode_abi(["uint256[]"], [amounts])
+
+    if to in chain["tokens"]:
+        token = chain["tokens"][to]
+        if name == "decimals":
+            return encode_abi(["uint8"], [token["decimals"]])
+        if name == "symbol":
+            return encode_abi(["string"], [token["symbol"]])
+
+    raise ValueError("execution reverted")
+
+
+# turn a block parameter e.g. "latest" or "0x3e8" into a block number
+def get_sim_block_number(chain, block_identifier):
+    if block_identifier in ["latest", "pending", "safe", "finalized"]:
+        return chain["block"]
+    if block_identifier == "earliest":
+        return 0
+    return int(block_identifier, 16)
+
+
+# hash of a block, a block number that was dropped by a reorg gets a new hash
+def get_sim_block_hash(chain, number):
+    return "0x%064x" % (chain["forks"].get(number, 0) << 128 | number)
+
+
+# block as returned by eth_getBlockByNumber
+def get_sim_block(chain, number):
+    return {
+        "number": hex(number),
+        "hash": get_sim_block_hash(chain, number),
+        "parentHash": get_sim_block_hash(chain, number - 1),
+        "timestamp": hex(number),
+        "gasLimit": hex(30000000),
+        "gasUsed": "0x0",
+        "transactions": [],
+    }
+
+
+# logs as returned by eth_getLogs for a filter with a block range, addresses and a first topic
+def get_sim_logs(chain, log_filter):
+    from_block = get_sim_block_number(chain, log_filter.get("fromBlock", "latest"))
+    to_block = get_sim_block_number(chain, log_filter.get("toBlock", "latest"))
+    addresses = log_filter.get("address")
+    if isinstance(addresses, str):
+        addresses = [addresses]
+    if addresses != None:
+        addresses = set(Web3.toChecksumAddress(a) for a in addresses)
+    topics = log_filter.get("topics") or [None]
+
+    logs = []
+    for number in range(from_block, to_block + 1):
+        for log_index, log in enumerate(chain["logs"].get(number, [])):
+            if addresses != None and log["address"] not in addresses:
+                continue
+            if topics[0] != None and log["topics"][0] != topics[0]:
+                continue
+            logs.append(
+                dict(
+                    log,
+                    blockNumber=hex(number),
+                    blockHash=get_sim_block_hash(chain, number),
+                    logIndex=hex(log_index),
+                    transactionIndex="0x0",
+                    transactionHash="0x%064x" % (number * 10000 + log_index),
+                    removed=False,
+                )
+            )
+    return logs
+
+
+# answer one json-rpc request, the state isn't kept per block so calls at any block see the latest state
+# evm_mine moves the chain on by one block like it does on a local development node
+def handle_sim_request(chain, method, params):
+    with chain["lock"]:
+        chain["requests"][method] = chain["requests"].get(method, 0) + 1
+    if method == "eth_chainId":
+        return "0x38"
+    if method == "net_version":
+        return "56"
+    if method == "eth_gasPrice":
+        return hex(5 * 10**9)
+    if method == "eth_blockNumber":
+        return hex(chain["block"])
+    if method == "eth_getBlockByNumber":
+        number = get_sim_block_number(chain, params[0])
+        if number > chain["block"]:
+            return None
+        return get_sim_block(chain, number)
+    if method == "eth_call":
+        return "0x" + call_sim_contract(chain, params[0]["to"], params[0]["data"]).hex()
+    if method == "eth_getLogs":
+        return get_sim_logs(chain, params[0])
+    if method == "evm_mine":
+        mine_sim_block(chain)
+        return hex(chain["block"])
+    raise NotImplementedError(f"method {method} is not simulated")
+
+
+# answers json-rpc posts from the chain of its server after the latency of the server
+class SimRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        requests = body if isinstance(body, list) else [body]
+        responses = []
+        for request in requests:
+            response = {"jsonrpc": "2.0", "id": request["id"]}
+            try:
+                response["result"] = handle_sim_request(
+                    self.server.chain, request["method"], request.get("params", [])
+                )
+            except NotImplementedError as e:
+                response["error"] = {"code": -32601, "message": str(e)}
+            except ValueError as e:
+                response["error"] = {"code": 3, "message": f"execution reverted: {e}"}
+            responses.append(response)
+
+        raw = json.dumps(responses if isinstance(body, list) else responses[0]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+# serve the chain as a json-rpc endpoint on localhost in a background thread, every request waits latency
+# seconds first, returns the server and its url, stop it with server.shutdown()
+def serve_sim_chain(chain, latency=0.0, port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), SimRequestHandler)
+    server.daemon_threads = True
+    server.chain = chain
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# number of json-rpc requests the chain has answered, a batch counts every request in it
+def count_sim_requests(chain):
+    with chain["lock"]:
+        return sum(chain["requests"].values())
@@ -0,0 +1,236 @@
+# import modules to interact with the os, write json and csv lines, work with time and delete folders
+import os, json, csv, time, shutil
+
+# import openpyxl in write only mode for the optional excel export at the end of a run
+from openpyxl import Workbook
+
+# parquet output needs pyarrow, the other formats work without it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# turn numpy values into plain python values so they can be written out
+def to_plain(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# pick the parquet type of a column from its first value
+# token amounts are uint256 so they don't fit into int64 and are kept as strings
+def get_parquet_type(value):
+    if isinstance(value, bool):
+        return pa.bool_()
+    if isinstance(value, float):
+        return pa.float64()
+    return pa.string()
+
+
+# convert a value to the parquet type picked for its column
+def to_parquet_value(value, column_type):
+    if value == None:
+        return None
+    if column_type == pa.bool_():
+        return bool(value)
+    if column_type == pa.float64():
+        return float(value)
+    return str(value)
+
+
+# open an append only sink for the hits of a scan
+# rows are kept in memory and written out in batches so result i/o stays flat as hits grow
+# settings come from the sink entry of the config data e.g. {"format": "jsonl", "batch_size": 100, ...}
+# the sink file has the same name as save_name with the extension of the format
+# a parquet sink is a folder of that name with one closed part file per flush, a parquet file only gets its
+# footer when it is closed so a file that is kept open would be unreadable after a crash
+# when excel_export is set an xlsx copy is written to save_name when the sink is closed
+# with append set the rows already in the sink file are kept e.g. when a scan is resumed
+def open_sink(save_name, col_list, settings, append=False):
+    file_format = settings["format"]
+    if file_format == "parquet" and pq == None:
+        raise ImportError("pyarrow is needed to write parquet sinks")
+
+    # make sure the folder for the output exists
+    folder = os.path.dirname(save_name)
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+
+    sink = {
+        "path": os.path.splitext(save_name)[0] + "." + file_format,
+        "save_name": save_name,
+        "format": file_format,
+        "columns": list(col_list),
+        "batch_size": settings["batch_size"],
+        "flush_interval": settings["flush_interval"],
+        "excel_export": settings["excel_export"],
+        "buffer": [],
+        "last_flush": time.time(),
+        "rows": 0,
+        "writer": None,
+        "file": None,
+        "schema": None,
+    }
+    append = append and os.path.exists(sink["path"])
+
+    if file_format == "jsonl":
+        sink["file"] = open(sink["path"], "a" if append else "w")
+    elif file_format == "csv":
+        sink["file"] = open(sink["path"], "a" if append else "w", newline="")
+        sink["writer"] = csv.writer(sink["file"])
+        if append == False:
+            sink["writer"].writerow(sink["columns"])
+    elif file_format == "parquet":
+        if os.path.isfile(sink["path"]):
+            # a sink written as a single file is moved into the folder as its first part
+            if append:
+                os.replace(sink["path"], sink["path"] + ".old")
+                os.makedirs(sink["path"])
+                os.replace(
+                    sink["path"] + ".old",
+                    os.path.join(sink["path"], f"part-{time.time_ns()}.parquet"),
+                )
+            else:
+                os.remove(sink["path"])
+        elif os.path.exists(sink["path"]) and append == False:
+            shutil.rmtree(sink["path"])
+        if os.path.exists(sink["path"]) == False:
+            os.makedirs(sink["path"])
+        # new parts keep the schema of the parts already in the sink
+        parts = get_parquet_parts(sink)
+        if len(parts) > 0:
+            sink["schema"] = pq.read_schema(parts[0])
+    else:
+        raise ValueError(f"unknown sink format {file_format}")
+
+    return sink
+
+
+# add a row to the sink, it is written out once the batch is full or the flush interval has passed
+def write_row(sink, return_list):
+    sink["buffer"].append([to_plain(value) for value in return_list])
+    sink["rows"] += 1
+    if (
+        len(sink["buffer"]) >= sink["batch_size"]
+        or time.time() - sink["last_flush"] >= sink["flush_interval"]
+    ):
+        flush_sink(sink)
+
+
+# part files of a parquet sink in the order they were written
+# files starting with an underscore are still being written and are skipped
+def get_parquet_parts(sink):
+    return [
+        os.path.join(sink["path"], f)
+        for f in sorted(os.listdir(sink["path"]))
+        if f.endswith(".parquet") and f.startswith("_") == False
+    ]
+
+
+# write a parquet table as a part of a sink, it is written under a temporary name first so a crash never
+# leaves a part without its footer
+def write_parquet_part(sink, table):
+    file_name = f"part-{time.time_ns()}.parquet"
+    pq.write_table(table, os.path.join(sink["path"], "_" + file_name))
+    os.replace(
+        os.path.join(sink["path"], "_" + file_name),
+        os.path.join(sink["path"], file_name),
+    )
+
+
+# write the buffered rows to the sink file
+# parquet gets one closed part file per flush, the schema is set by the first batch
+def flush_sink(sink):
+    sink["last_flush"] = time.time()
+    if len(sink["buffer"]) == 0:
+        return
+
+    if sink["format"] == "jsonl":
+        for row in sink["buffer"]:
+            sink["file"].write(
+                json.dumps(dict(zip(sink["columns"], row)), default=str) + "\n"
+            )
+        sink["file"].flush()
+
+    elif sink["format"] == "csv":
+        sink["writer"].writerows(sink["buffer"])
+        sink["file"].flush()
+
+    else:
+        if sink["schema"] == None:
+            sink["schema"] = pa.schema(
+                [
+                    (column, get_parquet_type(value))
+                    for column, value in zip(sink["columns"], sink["buffer"][0])
+                ]
+            )
+        schema = sink["schema"]
+        columns = {
+            field.name: [to_parquet_value(row[i], field.type) for row in sink["buffer"]]
+            for i, field in enumerate(schema)
+        }
+        write_parquet_part(sink, pa.Table.from_pydict(columns, schema=schema))
+
+    sink["buffer"] = []
+
+
+# read the rows back from a sink file in the order they were written
+def read_sink_rows(sink):
+    if sink["format"] == "jsonl":
+        with open(sink["path"]) as f:
+            for line in f:
+                row = json.loads(line)
+                yield [row[column] for column in sink["columns"]]
+
+    elif sink["format"] == "csv":
+        with open(sink["path"], newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                yield row
+
+    else:
+        for part in get_parquet_parts(sink):
+            for batch in pq.ParquetFile(part).iter_batches():
+                for row in batch.to_pylist():
+                    yield [row[column] for column in sink["columns"]]
+
+
+# write the whole sink to an xlsx file in one go with a write only workbook
+def export_excel(sink):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(sink["columns"])
+    for row in read_sink_rows(sink):
+        ws.append(row)
+    wb.save(sink["save_name"])
+
+
+# merge the parts of a parquet sink into a single part, the old parts are only removed once it is written
+def compact_parquet(sink):
+    parts = get_parquet_parts(sink)
+    if len(parts) < 2:
+        return
+    write_parquet_part(
+        sink,
+        pa.concat_tables(
+            [pq.read_table(part, schema=sink["schema"]) for part in parts]
+        ),
+    )
+    for part in parts:
+        os.remove(part)
+
+
+# write out what is left in the buffer, close the sink file and produce the excel export if it is set
+def close_sink(sink):
+    flush_sink(sink)
+    if sink["format"] == "parquet":
+        compact_parquet(sink)
+    else:
+        sink["file"].close()
+
+    if sink["excel_export"]:
+        export_excel(sink)
@@ -0,0 +1,127 @@
+# import asyncio to run the async scanners and json to read their output
+import asyncio, json
+
+# import the sync and async scanners that are checked against each other
+import components
+import async_components
+
+# import the simulated chain to see which contract calls the scanners make
+import simchain
+
+
+# keep the scans quiet, hits play an alert
+def mute_alerts(monkeypatch):
+    monkeypatch.setattr(components, "play_alert", lambda times: None)
+    monkeypatch.setattr(async_components, "play_alert", lambda times: None)
+
+
+# arguments of a blind scan of the simulated chain
+def get_blind_kwargs(sim, save_name):
+    return {
+        "primary_dex": "biswap",
+        "secondary_dex": "pancakeswap",
+        "blockchain": "binance",
+        "save_name": save_name,
+        "base_token": sim["chain"]["base_token"],
+        "small_cap_threshold": 0,
+        "exchange": "sim",
+    }
+
+
+def test_async_blind_scan_matches_sync(sim_scan, monkeypatch):
+    mute_alerts(monkeypatch)
+    trades = components.blind_scan(**get_blind_kwargs(sim_scan, "Outputs/sync.xlsx"))
+    async_trades = asyncio.run(
+        async_components.async_blind_scan(
+            **get_blind_kwargs(sim_scan, "Outputs/async.xlsx"), max_in_flight=4
+        )
+    )
+    assert len(trades) == 3
+    assert sorted(async_trades) == sorted(trades)
+
+
+def test_async_blind_scan_runs_again_on_a_new_event_loop(sim_scan, monkeypatch):
+    mute_alerts(monkeypatch)
+    kwargs = get_blind_kwargs(sim_scan, "Outputs/async.xlsx")
+    first = asyncio.run(async_components.async_blind_scan(**kwargs, max_in_flight=8))
+    second = asyncio.run(async_components.async_blind_scan(**kwargs, max_in_flight=8))
+    assert len(first) == 3
+    assert sorted(second) == sorted(first)
+
+
+# names of the contract functions the simulated chain is asked for, calls inside a multicall are counted too
+def record_calls(monkeypatch):
+    names = []
+    call = simchain.call_sim_contract
+
+    def recorded(chain, to, data):
+        names.append(simchain.SIM_SELECTORS.get(data[:10], ("",))[0])
+        return call(chain, to, data)
+
+    monkeypatch.setattr(simchain, "call_sim_contract", recorded)
+    return names
+
+
+# arguments of a scan by id of every pool of the primary dex of the simulated chain
+def get_id_kwargs(sim, save_name):
+    primary = list(sim["chain"]["factories"].values())[0]
+    return {
+        "primary_dex": "biswap",
+        "secondary_dex": "pancakeswap",
+        "blockchain": "binance",
+        "selected_ids": list(range(len(primary["pairs"]))),
+        "save_name": save_name,
+        "base_token": sim["chain"]["base_token"],
+    }
+
+
+def test_async_scan_by_id_matches_sync_without_get_pair(sim_scan, monkeypatch):
+    mute_alerts(monkeypatch)
+    calls = record_calls(monkeypatch)
+    components.scan_by_ID(**get_id_kwargs(sim_scan, "Outputs/sync.xlsx"), max_cycles=1)
+    asyncio.run(
+        async_components.async_scan_by_ID(
+            **get_id_kwargs(sim_scan, "Outputs/async.xlsx"), max_in_flight=4
+        )
+    )
+
+    rows = [json.loads(line) for line in open("Outputs/sync.jsonl")]
+    async_rows = [json.loads(line) for line in open("Outputs/async.jsonl")]
+    assert len(rows) == 3
+    assert sorted(map(str, async_rows)) == sorted(map(str, rows))
+    # the pools of the secondary dex come from the pair index, not a getPair call per pool
+    assert "allPairs" in calls and "getPair" not in calls
+
+
+def test_async_scan_by_id_reads_a_new_block_every_cycle(sim_scan, monkeypatch):
+    mute_alerts(monkeypatch)
+    chain = sim_scan["chain"]
+    # only a few pools without a spread are scanned so the scan runs until max_cycles
+    spread = set(pair for block, pair, reserves in chain["journal"])
+    primary, secondary = list(chain["factories"].values())
+    kwargs = get_id_kwargs(sim_scan, "Outputs/async.xlsx")
+    kwargs["selected_ids"] = [
+        i
+        for i, pair in enumerate(primary["pairs"])
+        if secondary["index"].get(
+            (chain["pairs"][pair]["token0"], chain["pairs"][pair]["token1"])
+        )
+        not in spread
+    ][:10]
+    config = sim_scan["config"]
+    config["binance"]["reserve_tracker"]["poll_interval"] = 0.01
+    with open("config.json", "w") as file:
+        json.dump(config, file)
+
+    miner = simchain.start_sim_miner(chain, 0.1, 0)
+    try:
+        first_block = chain["block"]
+        cycle_times = asyncio.run(
+            async_components.async_scan_by_ID(**kwargs, max_in_flight=4, max_cycles=3)
+        )
+    finally:
+        simchain.stop_sim_miner(miner)
+    assert len(cycle_times) == 3
+    # every cycle after the first waits for a new block
+    assert chain["block"] >= first_block + 2
+    assert open("Outputs/async.jsonl").read() == ""
@@ -0,0 +1,96 @@
+# import asyncio to run the async scanners
+import asyncio
+
+# import pytest to run the same checks for the sync and async scanners
+import pytest
+
+# import the scanners whose pair registries are checked and the registry they keep
+import components
+import async_components
+from registry import open_registry, get_stored_length
+from simchain import add_sim_pair, mine_sim_block, sim_address
+from test_async_components import mute_alerts, get_blind_kwargs
+
+
+# count the pairs that are read from a factory by index, the sync and async scanners read them differently
+def count_index_reads(monkeypatch):
+    reads = []
+
+    def counted(read):
+        def wrapper(*args):
+            reads.append(args[-1])
+            return read(*args)
+
+        return wrapper
+
+    async def async_counted(*args):
+        reads.append(args[-1])
+        return await async_read(*args)
+
+    async_read = async_components.async_get_pool_by_index
+    monkeypatch.setattr(
+        components, "get_pools_by_index", counted(components.get_pools_by_index)
+    )
+    monkeypatch.setattr(async_components, "async_get_pool_by_index", async_counted)
+    return reads
+
+
+# list a new token on both dexes of the simulated chain, 50% cheaper on the secondary dex
+def list_token(chain):
+    token = sim_address(0x60000)
+    chain["tokens"][token] = {"decimals": 18, "symbol": "NEW"}
+    primary, secondary = list(chain["factories"])
+    with chain["lock"]:
+        add_sim_pair(chain, primary, chain["base_token"], token, [10**21, 10**21])
+        add_sim_pair(
+            chain, secondary, chain["base_token"], token, [10**21, 3 * 10**21 // 2]
+        )
+    mine_sim_block(chain)
+    return token
+
+
+# run a blind scan with the sync or async scanner
+def run_blind_scan(sim, scanner):
+    kwargs = get_blind_kwargs(sim, "Outputs/blind.xlsx")
+    if scanner == "async":
+        return asyncio.run(async_components.async_blind_scan(**kwargs, max_in_flight=4))
+    return components.blind_scan(**kwargs)
+
+
+# number of pairs of each dex in the pair registry
+def get_stored_lengths(sim):
+    conn = open_registry(sim["config"]["binance"]["pair_registry"])
+    lengths = [
+        get_stored_length(conn, "binance", factory)
+        for factory in sim["chain"]["factories"]
+    ]
+    conn.close()
+    return lengths
+
+
+@pytest.mark.parametrize("scanner", ["sync", "async"])
+def test_blind_scan_discovers_new_pairs_from_events(sim_scan, monkeypatch, scanner):
+    mute_alerts(monkeypatch)
+    chain = sim_scan["chain"]
+    confirmations = sim_scan["config"]["binance"]["discovery"]["confirmations"]
+    reads = count_index_reads(monkeypatch)
+
+    # the first scan reads every pair by index and follows the events of the factories from there
+    assert len(run_blind_scan(sim_scan, scanner)) == 3
+    assert len(reads) > 0
+    lengths = get_stored_lengths(sim_scan)
+
+    # a new listing is scanned from its PairCreated event without reading anything by index
+    reads.clear()
+    list_token(chain)
+    assert len(run_blind_scan(sim_scan, scanner)) == 4
+    assert reads == []
+    # it isn't confirmed yet so the registry doesn't hold it
+    assert get_stored_lengths(sim_scan) == lengths
+
+    # once it is confirmed it is stored and still scanned
+    for _ in range(confirmations):
+        mine_sim_block(chain)
+    assert len(run_blind_scan(sim_scan, scanner)) == 4
+    assert reads == []
+    assert get_stored_lengths(sim_scan) == [length + 1 for length in lengths]
@@ -0,0 +1,154 @@
+# import modules to read the config data
+import os, json
+
+# import pytest to run the checks and web3 to talk to the simulated chain
+import pytest
+from web3 import Web3
+
+# import the batched calls that are checked and the simulated chain they are checked against
+import multicall as multicall_module
+import simchain
+from multicall import multicall, prune_call_cache
+from metrics import METRICS
+from providers import make_endpoint_pool, PoolProvider
+from simchain import make_sim_chain, serve_sim_chain, sim_address
+
+# the multicall contract of the config data, the simulated chain serves it at the same address
+CONFIG = json.load(open(os.path.join(os.path.dirname(__file__), "config.json")))
+MULTICALL = CONFIG["binance"]["multicall"]
+NETWORK = CONFIG["binance"]["network"]
+RPC = dict(CONFIG["binance"]["rpc"], max_retries=2, backoff_base=0.01, backoff_cap=0.05)
+
+# the view functions of a pool that the scanners read
+POOL_ABI = [
+    {
+        "inputs": [],
+        "name": "getReserves",
+        "outputs": [
+            {"name": "_reserve0", "type": "uint112"},
+            {"name": "_reserve1", "type": "uint112"},
+            {"name": "_blockTimestampLast", "type": "uint32"},
+        ],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "token0",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+
+# simulated chain of two dexes served on localhost and a web3 client for it
+@pytest.fixture
+def sim():
+    chain = make_sim_chain(
+        {"biswap": [998, 1000], "pancakeswap": [9975, 10000]},
+        40,
+        0.5,
+        multicall_address=MULTICALL["address"],
+    )
+    server, url = serve_sim_chain(chain)
+    yield chain, Web3(Web3.HTTPProvider(url))
+    server.shutdown()
+
+
+def test_multicall_matches_single_calls(sim):
+    chain, w3 = sim
+    pool_class = w3.eth.contract(abi=POOL_ABI)
+    pairs = list(chain["pairs"])
+    calls = []
+    for pair in pairs:
+        pool = pool_class(address=pair)
+        calls += [pool.functions.getReserves(), pool.functions.token0()]
+
+    results = multicall(w3, MULTICALL["address"], calls, MULTICALL["batch_size"])
+    assert len(results) == len(calls)
+    for k, pair in enumerate(pairs):
+        pool = pool_class(address=pair)
+        assert results[2 * k] == (True, pool.functions.getReserves().call())
+        assert results[2 * k + 1] == (True, pool.functions.token0().call())
+        assert results[2 * k][1][0:2] == chain["pairs"][pair]["reserves"]
+
+
+def test_multicall_batches_and_reports_failures_per_call(sim):
+    chain, w3 = sim
+    pool_class = w3.eth.contract(abi=POOL_ABI)
+    pairs = list(chain["pairs"])
+    # a pool that doesn't exist reverts, only its own call fails
+    addresses = pairs[:10] + [sim_address(0x99999)] + pairs[10:25]
+    calls = [pool_class(address=a).functions.getReserves() for a in addresses]
+
+    before = chain["requests"].get("eth_call", 0)
+    results = multicall(w3, MULTICALL["address"], calls, batch_size=10)
+    # 26 calls in batches of 10 are 3 eth_calls
+    assert chain["requests"]["eth_call"] - before == 3
+    assert results[10] == (False, None)
+    assert [r[0] for r in results].count(False) == 1
+    assert [r[1][0:2] for r in results if r[0]] == [
+        chain["pairs"][a]["reserves"] for a in pairs[:25]
+    ]
+    assert multicall(w3, MULTICALL["address"], [], batch_size=10) == []
+
+
+def test_multicall_cache_pruned_while_a_batch_is_sent(sim, monkeypatch):
+    chain, w3 = sim
+    pool_class = w3.eth.contract(abi=POOL_ABI)
+    calls = [pool_class(address=a).functions.getReserves() for a in chain["pairs"]]
+    expected = multicall(w3, MULTICALL["address"], calls, batch_size=5)
+
+    # half the calls are cached, then the prefetch thread of a scan moves the cache on to the next block
+    # while the other half is being sent
+    call_cache = {}
+    multicall(w3, MULTICALL["address"], calls[:20], 5, 7, call_cache)
+    run_batch = multicall_module.run_batch
+
+    def pruned_run_batch(*args):
+        prune_call_cache(call_cache, 8)
+        return run_batch(*args)
+
+    monkeypatch.setattr(multicall_module, "run_batch", pruned_run_batch)
+    results = multicall(w3, MULTICALL["address"], calls, 5, 7, call_cache)
+    assert results == expected
+
+
+# contract calls recorded as dropped in the metrics
+def count_dropped_calls():
+    return sum(
+        value
+        for (name, labels), value in METRICS["values"].items()
+        if name == "contract_calls_dropped_total"
+    )
+
+
+def test_multicall_drops_a_batch_the_endpoints_keep_refusing(sim, monkeypatch):
+    chain, w3 = sim
+    pool_w3 = Web3(
+        PoolProvider(make_endpoint_pool([w3.provider.endpoint_uri], NETWORK, RPC))
+    )
+    pairs = list(chain["pairs"])
+    pool_class = pool_w3.eth.contract(abi=POOL_ABI)
+    calls = [pool_class(address=a).functions.getReserves() for a in pairs[:26]]
+
+    # the endpoint throttles every batch with one of the pools of the second batch in it
+    handle_sim_request = simchain.handle_sim_request
+    throttled = pairs[12][2:].lower()
+
+    def throttle(chain, method, params):
+        if method == "eth_call" and throttled in params[0]["data"]:
+            raise ValueError("rate limit exceeded")
+        return handle_sim_request(chain, method, params)
+
+    monkeypatch.setattr(simchain, "handle_sim_request", throttle)
+    dropped = count_dropped_calls()
+    results = multicall(pool_w3, MULTICALL["address"], calls, batch_size=10)
+
+    # the calls of the second batch fail and the scan goes on with the other batches
+    assert results[10:20] == [(False, None)] * 10
+    assert [r[1][0:2] for r in results[:10] + results[20:]] == [
+        chain["pairs"][a]["reserves"] for a in pairs[:10] + pairs[20:26]
+    ]
+    assert count_dropped_calls() - dropped == 10
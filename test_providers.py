@@ -0,0 +1,101 @@
+# import modules to read the config data and time the calls
+import os, json, time
+
+# import pytest to run the checks and web3 to send requests through the pool
+import pytest
+from web3 import Web3
+
+# import the endpoint pool that is checked and the simulated chain its endpoints serve
+from providers import make_endpoint_pool, PoolProvider, get_pool_stats
+from simchain import make_sim_chain, serve_sim_chain
+
+# the rpc settings of the config data with short timeouts and backoffs so failures are quick
+CONFIG = json.load(open(os.path.join(os.path.dirname(__file__), "config.json")))
+RPC = dict(CONFIG["binance"]["rpc"], timeout=2, backoff_base=0.01, backoff_cap=0.05)
+
+
+# a copy of the same simulated chain for every latency, each served on its own port
+# every endpoint has a chain of its own so the requests it answered can be counted
+@pytest.fixture
+def endpoints():
+    servers = []
+
+    def serve(*latencies):
+        chains, urls = [], []
+        for latency in latencies:
+            chain = make_sim_chain({"biswap": [998, 1000]}, 5, 0)
+            server, url = serve_sim_chain(chain, latency)
+            servers.append(server)
+            chains.append(chain)
+            urls.append(url)
+        return chains, urls
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+
+
+# network settings of the pool, hedging is off unless a check turns it on
+def get_settings(**kwargs):
+    return dict(
+        {"pool_size": 4, "hedge_after": None, "eject_after": 3, "eject_for": 30},
+        **kwargs,
+    )
+
+
+def test_pool_prefers_the_faster_endpoint(endpoints):
+    (slow, fast), urls = endpoints(0.05, 0.0)
+    pool = make_endpoint_pool(urls, get_settings(), RPC)
+    w3 = Web3(PoolProvider(pool))
+
+    for _ in range(20):
+        assert w3.eth.block_number == fast["block"]
+    # both endpoints are tried once to learn their latency, then the faster one takes the calls
+    assert slow["requests"]["eth_blockNumber"] <= 2
+    assert fast["requests"]["eth_blockNumber"] >= 18
+    stats = get_pool_stats(pool)
+    assert (
+        stats["endpoints"][urls[0]]["latency"] > stats["endpoints"][urls[1]]["latency"]
+    )
+
+
+def test_pool_ejects_an_endpoint_that_is_down(endpoints):
+    chains, urls = endpoints(0.0)
+    # nothing listens on the first endpoint
+    down, down_url = serve_sim_chain(make_sim_chain({"biswap": [998, 1000]}, 0, 0))
+    down.shutdown()
+    down.server_close()
+    pool = make_endpoint_pool([down_url] + urls, get_settings(eject_after=1), RPC)
+    w3 = Web3(PoolProvider(pool))
+
+    for _ in range(5):
+        assert w3.eth.block_number == chains[0]["block"]
+    stats = get_pool_stats(pool)
+    assert stats["endpoints"][down_url]["ejected"] == True
+    assert stats["endpoints"][urls[0]]["ejected"] == False
+    assert chains[0]["requests"]["eth_blockNumber"] == 5
+
+
+def test_pool_hedges_a_slow_call(endpoints):
+    (slow, fast), urls = endpoints(1.0, 0.0)
+    pool = make_endpoint_pool(urls, get_settings(hedge_after=0.05), RPC)
+    # the slow endpoint looks the best so the call goes there first
+    pool["endpoints"][0]["latency"] = 0.001
+    pool["endpoints"][1]["latency"] = 0.01
+
+    start = time.monotonic()
+    assert Web3(PoolProvider(pool)).eth.block_number == fast["block"]
+    assert time.monotonic() - start < 0.5
+    assert get_pool_stats(pool)["hedges"] == 1
+    assert fast["requests"]["eth_blockNumber"] == 1
+
+
+def test_pool_answers_the_chain_id_from_memory(endpoints):
+    chains, urls = endpoints(0.0)
+    pool = make_endpoint_pool(urls, get_settings(), RPC)
+    w3 = Web3(PoolProvider(pool))
+
+    chain_id = w3.eth.chain_id
+    for _ in range(3):
+        assert w3.eth.chain_id == chain_id
+    assert chains[0]["requests"]["eth_chainId"] == 1
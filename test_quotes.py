@@ -0,0 +1,216 @@
+# import modules to read the config data and run the same checks for every pair of dexes
+import os, json, itertools
+
+# import pytest to run the checks and the abi encoder to call the simulated router
+import pytest
+from eth_abi import encode_abi, decode_abi
+from web3 import Web3
+
+# import the quote maths that is checked and the simulated chain whose router it is checked against
+from quotes import (
+    get_fee,
+    get_amount_out,
+    get_amount_out_array,
+    to_int_array,
+    get_amounts_out,
+    quote_pools,
+    solve_pools,
+)
+from simchain import make_sim_chain, add_sim_pair, call_sim_contract, sim_address
+
+# the swap fees of every dex in the config data
+CONFIG = json.load(open(os.path.join(os.path.dirname(__file__), "config.json")))
+FEES = {
+    xch_name: get_fee(CONFIG, "binance", xch_name)
+    for xch_name, settings in CONFIG["binance"].items()
+    if isinstance(settings, dict) and "fee" in settings
+}
+
+# swaps at the edges of the router maths as (amount_in, reserve_in, reserve_out)
+# nothing going in, amounts that round down to nothing, amounts far bigger than the pool and uint112 reserves
+EDGE_SWAPS = [
+    (0, 10**18, 10**18),
+    (1, 10**18, 10**18),
+    (1, 1, 10**30),
+    (999, 1000, 1000),
+    (1000, 1000, 2000),
+    (10**18, 10**18, 10**18),
+    (10**30, 10**18, 10**18),
+    (10**18, 10**24, 10**6),
+    (2**112 - 1, 2**112 - 1, 2**112 - 1),
+    (12345678901234567, 2**112 - 1, 3),
+]
+
+# price of the other token on the secondary dex relative to the primary dex for the round trip checks
+# some spreads are inside the fees and some are far outside them, in both directions
+SPREADS = [0.5, 0.9, 0.99, 0.998, 1.0, 1.002, 1.01, 1.1, 2.0]
+
+# depth of the pools in base tokens for the round trip checks, from a few wei to a deep pool
+DEPTHS = [10**3, 10**12, 10**21]
+
+
+# simulated chain with a router for every dex and no pools
+def make_chain(xch_names):
+    return make_sim_chain({xch_name: FEES[xch_name] for xch_name in xch_names}, 0, 0)
+
+
+# getAmountsOut of the router of a dex on the simulated chain
+def router_amounts_out(chain, xch_name, amount_in, path):
+    router = [k for k, v in chain["routers"].items() if v["name"] == xch_name][0]
+    data = (
+        Web3.keccak(text="getAmountsOut(uint256,address[])")[:4]
+        + encode_abi(["uint256", "address[]"], [amount_in, path])
+    ).hex()
+    return list(
+        decode_abi(["uint256[]"], call_sim_contract(chain, router, "0x" + data))[0]
+    )
+
+
+# factory of a dex on the simulated chain
+def get_factory(chain, xch_name):
+    return [k for k, v in chain["factories"].items() if v["name"] == xch_name][0]
+
+
+# add a pool of the base token and a new token on both dexes for every depth and spread
+# returns the matched pools in the format of the scanners
+def add_matched_pools(chain, xch_name, s_xch_name):
+    pools = []
+    for depth, spread in itertools.product(DEPTHS, SPREADS):
+        token = sim_address(0x20000 + len(pools))
+        # the other token is worth a few base tokens so the two reserves of a pool differ
+        other = depth * 3
+        pair = add_sim_pair(
+            chain,
+            get_factory(chain, xch_name),
+            chain["base_token"],
+            token,
+            [depth, other],
+        )
+        s_pair = add_sim_pair(
+            chain,
+            get_factory(chain, s_xch_name),
+            chain["base_token"],
+            token,
+            [depth, int(other * spread)],
+        )
+        pools.append(
+            {
+                "token0": chain["pairs"][pair]["token0"],
+                "token1": chain["pairs"][pair]["token1"],
+                "token": token,
+                "reserves": chain["pairs"][pair]["reserves"],
+                "s_reserves": chain["pairs"][s_pair]["reserves"],
+            }
+        )
+    return pools
+
+
+# profit of buying a token on one dex and selling it on another as the routers quote it
+def router_profit(chain, buy_xch, sell_xch, token, amount_in):
+    base_token = chain["base_token"]
+    bought = router_amounts_out(chain, buy_xch, amount_in, [base_token, token])[-1]
+    sold = router_amounts_out(chain, sell_xch, bought, [token, base_token])[-1]
+    return sold - amount_in
+
+
+@pytest.mark.parametrize("xch_name", list(FEES))
+def test_get_amount_out_matches_router(xch_name):
+    chain = make_chain([xch_name])
+    for i, (amount_in, reserve_in, reserve_out) in enumerate(EDGE_SWAPS):
+        token_in, token_out = sim_address(0x20000 + 2 * i), sim_address(0x20001 + 2 * i)
+        add_sim_pair(
+            chain,
+            get_factory(chain, xch_name),
+            token_in,
+            token_out,
+            [reserve_in, reserve_out],
+        )
+        expected = router_amounts_out(chain, xch_name, amount_in, [token_in, token_out])
+        fee = FEES[xch_name]
+        assert get_amount_out(amount_in, reserve_in, reserve_out, fee) == expected[1]
+        assert list(
+            get_amount_out_array(
+                amount_in, to_int_array([reserve_in]), to_int_array([reserve_out]), fee
+            )
+        ) == [expected[1]]
+
+
+@pytest.mark.parametrize("xch_name", list(FEES))
+def test_get_amounts_out_matches_router_path(xch_name):
+    chain = make_chain([xch_name])
+    tokens = [chain["base_token"]] + [sim_address(0x20000 + i) for i in range(3)]
+    reserves = [(10**21, 3 * 10**20), (5 * 10**19, 7 * 10**25), (10**25, 10**3)]
+    for (token_in, token_out), hop in zip(zip(tokens, tokens[1:]), reserves):
+        add_sim_pair(chain, get_factory(chain, xch_name), token_in, token_out, hop)
+
+    for amount_in in [0, 1, 10**15, 10**18, 10**24]:
+        assert get_amounts_out(amount_in, reserves, FEES[xch_name]) == (
+            router_amounts_out(chain, xch_name, amount_in, tokens)
+        )
+
+
+@pytest.mark.parametrize("xch_name,s_xch_name", list(itertools.permutations(FEES, 2)))
+def test_quote_pools_matches_router(xch_name, s_xch_name):
+    chain = make_chain([xch_name, s_xch_name])
+    pools = add_matched_pools(chain, xch_name, s_xch_name)
+    base_token = chain["base_token"]
+    base_token_in = 10**3
+
+    amount_out, s_amount_out, end_trade, valid = quote_pools(
+        pools, base_token, base_token_in, FEES[xch_name], FEES[s_xch_name]
+    )
+    for k, pool in enumerate(pools):
+        path = [base_token, pool["token"]]
+        bought = router_amounts_out(chain, xch_name, base_token_in, path)[-1]
+        s_bought = router_amounts_out(chain, s_xch_name, base_token_in, path)[-1]
+        assert (amount_out[k], s_amount_out[k]) == (bought, s_bought)
+
+        # the bigger amount is sold on the other dex
+        if bought >= s_bought:
+            sold = router_amounts_out(chain, s_xch_name, bought, path[::-1])[-1]
+        else:
+            sold = router_amounts_out(chain, xch_name, s_bought, path[::-1])[-1]
+        assert end_trade[k] == sold
+        assert valid[k] == (bought > 0 and s_bought > 0 and sold > 0)
+
+
+@pytest.mark.parametrize("xch_name,s_xch_name", list(itertools.permutations(FEES, 2)))
+def test_solve_pools_matches_router(xch_name, s_xch_name):
+    chain = make_chain([xch_name, s_xch_name])
+    pools = add_matched_pools(chain, xch_name, s_xch_name)
+    fee, s_fee = FEES[xch_name], FEES[s_xch_name]
+    fee_factor = (fee[0] / fee[1]) * (s_fee[0] / s_fee[1])
+
+    amount_in, profit, buy_on_primary = solve_pools(
+        pools, chain["base_token"], fee, s_fee
+    )
+    for k, pool in enumerate(pools):
+        if profit[k] == 0:
+            assert amount_in[k] == 0
+            continue
+        buy_xch, sell_xch = xch_name, s_xch_name
+        if buy_on_primary[k] == False:
+            buy_xch, sell_xch = s_xch_name, xch_name
+        assert (
+            router_profit(chain, buy_xch, sell_xch, pool["token"], amount_in[k])
+            == profit[k]
+        )
+
+        # a size a little either side of the optimal one doesn't make more
+        step = max(amount_in[k] // 100, 1)
+        for size in [amount_in[k] - step, amount_in[k] + step]:
+            assert router_profit(chain, buy_xch, sell_xch, pool["token"], size) <= (
+                profit[k]
+            )
+
+    # a spread far outside the fees is always found in the right direction, one inside them never is
+    # the secondary pool holds more of the other token when the spread is above 1 so it is the cheaper side
+    for k, (depth, spread) in enumerate(itertools.product(DEPTHS, SPREADS)):
+        if depth < 10**12:
+            continue
+        if spread * fee_factor > 1.001:
+            assert profit[k] > 0 and buy_on_primary[k] == False
+        elif spread / fee_factor < 0.999:
+            assert profit[k] > 0 and buy_on_primary[k] == True
+        elif fee_factor * max(spread, 1 / spread) < 1:
+            assert profit[k] == 0
@@ -0,0 +1,90 @@
+# import modules to read the config data
+import os, json
+
+# import pytest to run the checks and web3 to talk to the simulated chain
+import pytest
+from web3 import Web3
+
+# import the reserve tracker that is checked and the simulated chain it follows
+from reserve_tracker import start_tracker, update_tracker
+from simchain import (
+    make_sim_chain,
+    serve_sim_chain,
+    set_sim_reserves,
+    mine_sim_block,
+    reorg_sim_chain,
+)
+from conftest import REPO, POOL_ABI
+
+
+# simulated chain served on localhost, a web3 client for it and config data that points at it
+# blocks are confirmed after 3 blocks so a reorg of 2 blocks can be undone
+@pytest.fixture
+def sim():
+    config = json.load(open(os.path.join(REPO, "config.json")))
+    config["binance"]["reserve_tracker"]["confirmations"] = 3
+    chain = make_sim_chain(
+        {"biswap": [998, 1000], "pancakeswap": [9975, 10000]},
+        40,
+        0.5,
+        multicall_address=config["binance"]["multicall"]["address"],
+    )
+    server, url = serve_sim_chain(chain)
+    yield chain, Web3(Web3.HTTPProvider(url)), config
+    server.shutdown()
+
+
+# check the tracked reserves of every pool against the chain
+def assert_tracked(chain, tracker):
+    for pair, state in chain["pairs"].items():
+        assert tracker["reserves"][pair] == state["reserves"]
+
+
+def test_tracker_follows_sync_events(sim):
+    chain, w3, config = sim
+    tracker = start_tracker(w3, config, "binance", list(chain["pairs"]), POOL_ABI)
+    update_tracker(tracker)
+    assert_tracked(chain, tracker)
+
+    pairs = list(chain["pairs"])
+    calls = chain["requests"].get("eth_call", 0)
+    for block in range(5):
+        mine_sim_block(chain)
+        with chain["lock"]:
+            set_sim_reserves(chain, pairs[block], [block + 1, block + 2])
+        assert update_tracker(tracker) == {pairs[block]}
+        assert tracker["reserves"][pairs[block]] == [block + 1, block + 2]
+    assert_tracked(chain, tracker)
+    # reserves only come from the logs after the first read
+    assert chain["requests"].get("eth_call", 0) == calls
+
+    # nothing changes in an empty block
+    mine_sim_block(chain)
+    assert update_tracker(tracker) == set()
+
+
+def test_tracker_rolls_back_a_reorg(sim):
+    chain, w3, config = sim
+    pairs = list(chain["pairs"])
+    tracker = start_tracker(w3, config, "binance", pairs, POOL_ABI)
+    update_tracker(tracker)
+
+    # two blocks that change two pools, then a reorg drops both
+    for pair in pairs[0:2]:
+        mine_sim_block(chain)
+        with chain["lock"]:
+            set_sim_reserves(chain, pair, [111, 222])
+        update_tracker(tracker)
+    assert tracker["reserves"][pairs[0]] == [111, 222]
+    reorg_sim_chain(chain, 2)
+
+    # the new chain is longer and changes another pool
+    for block in range(3):
+        mine_sim_block(chain)
+    with chain["lock"]:
+        set_sim_reserves(chain, pairs[2], [333, 444])
+
+    changed = update_tracker(tracker)
+    assert set(pairs[0:3]) <= changed
+    assert tracker["reserves"][pairs[0]] != [111, 222]
+    assert_tracked(chain, tracker)
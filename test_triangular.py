@@ -0,0 +1,130 @@
+# import modules to run the same checks for every pair of dexes
+import itertools
+
+# import pytest to run the checks
+import pytest
+
+# import the cycle search that is checked, the simulated chain and the router helpers of the quote checks
+from triangular import build_pool_graph, find_cycles, quote_cycle
+from simchain import add_sim_pair, sim_address
+from test_quotes import FEES, make_chain, get_factory, router_amounts_out
+
+
+# add a triangle of pools base -> token -> s_token -> base and a round trip base -> r_token -> base
+# the first and last pool of the triangle are on the primary dex and the middle one on the secondary dex
+# gain is how much more base token the last pool of each cycle gives than the fair price
+# a factory has one pool per token pair so the round trip is left out when both dexes are the same
+def add_cycles(chain, xch_name, s_xch_name, first_token, gain, depth):
+    base_token = chain["base_token"]
+    token, s_token, r_token = [sim_address(first_token + i) for i in range(3)]
+    factory, s_factory = get_factory(chain, xch_name), get_factory(chain, s_xch_name)
+    # the token is worth 2 base tokens and the s_token 5
+    add_sim_pair(chain, factory, base_token, token, [depth, depth // 2])
+    add_sim_pair(chain, s_factory, token, s_token, [depth // 2, depth // 5])
+    add_sim_pair(chain, factory, s_token, base_token, [depth // 5, int(depth * gain)])
+    # the r_token is worth 3 base tokens on both dexes apart from the gain
+    if xch_name != s_xch_name:
+        add_sim_pair(chain, factory, base_token, r_token, [depth, depth // 3])
+        add_sim_pair(
+            chain, s_factory, r_token, base_token, [depth // 3, int(depth * gain)]
+        )
+    return token, s_token, r_token
+
+
+# pools of the simulated chain in the format of triangular_scan
+def get_graph_pools(chain):
+    return [
+        {
+            "dex": chain["factories"][pair["factory"]]["name"],
+            "pool_address": address,
+            "token0": pair["token0"],
+            "token1": pair["token1"],
+            "reserves": pair["reserves"],
+        }
+        for address, pair in chain["pairs"].items()
+    ]
+
+
+@pytest.mark.parametrize("xch_name,s_xch_name", list(itertools.permutations(FEES, 2)))
+def test_find_cycles_matches_router(xch_name, s_xch_name):
+    chain = make_chain([xch_name, s_xch_name])
+    base_token = chain["base_token"]
+    # cycles that are 5% better than the fair price and ones that are only 0.01% better, which the fees eat
+    found = add_cycles(chain, xch_name, s_xch_name, 0x20000, 1.05, 10**21)
+    lost = add_cycles(chain, xch_name, s_xch_name, 0x30000, 1.0001, 10**21)
+    graph = build_pool_graph(
+        get_graph_pools(chain), {xch: FEES[xch] for xch in [xch_name, s_xch_name]}
+    )
+
+    cycles = find_cycles(graph, base_token, 3)
+    paths = [cycle["path"] for cycle in cycles]
+    token, s_token, r_token = found
+    assert [base_token, token, s_token, base_token] in paths
+    assert [base_token, r_token, base_token] in paths
+    assert all(
+        set(path).isdisjoint(lost) for path in paths
+    ), "a cycle inside the fees was found"
+
+    for cycle in cycles:
+        assert cycle["rate"] > 1
+        # the exact amounts along the cycle are what the router of every hop gives
+        for amount_in in [1, 10**3, 10**15, 10**18, 10**24]:
+            amounts = quote_cycle(graph, cycle, amount_in)
+            for k, xch in enumerate(cycle["dexes"]):
+                assert amounts[k + 1] == (
+                    router_amounts_out(
+                        chain, xch, amounts[k], cycle["path"][k : k + 2]
+                    )[-1]
+                )
+        # a small trade makes about the marginal rate of the cycle
+        amounts = quote_cycle(graph, cycle, 10**15)
+        assert amounts[-1] / amounts[0] == pytest.approx(cycle["rate"], rel=1e-4)
+
+
+@pytest.mark.parametrize("xch_name", list(FEES))
+def test_find_cycles_on_one_dex_matches_router_path(xch_name):
+    chain = make_chain([xch_name])
+    base_token = chain["base_token"]
+    token, s_token, r_token = add_cycles(
+        chain, xch_name, xch_name, 0x20000, 1.05, 10**21
+    )
+    graph = build_pool_graph(get_graph_pools(chain), {xch_name: FEES[xch_name]})
+
+    cycles = find_cycles(graph, base_token, 3)
+    assert [base_token, token, s_token, base_token] in [c["path"] for c in cycles]
+    # a cycle on one dex is a single getAmountsOut along the whole path
+    for cycle in cycles:
+        for amount_in in [1, 10**18, 10**24]:
+            assert quote_cycle(graph, cycle, amount_in) == router_amounts_out(
+                chain, xch_name, amount_in, cycle["path"]
+            )
+
+    # with a lower limit on the rate than the cycles make nothing is found
+    rate = max(cycle["rate"] for cycle in cycles)
+    assert find_cycles(graph, base_token, 3, min_rate=rate * 1.01) == []
+
+
+def test_find_cycles_keeps_paths_that_are_not_the_best():
+    chain = make_chain(["biswap", "pancakeswap"])
+    base_token = chain["base_token"]
+    token_a, token_b, token_c = [sim_address(0x20000 + i) for i in range(3)]
+    factory, s_factory = get_factory(chain, "biswap"), get_factory(chain, "pancakeswap")
+    depth = 10**21
+    # every token is worth one base token apart from two pools, c is 10% cheaper on the pool of the secondary
+    # dex and 2% cheaper on the pool with the base token
+    add_sim_pair(chain, factory, base_token, token_a, [depth, depth])
+    add_sim_pair(chain, factory, token_a, token_b, [depth, depth])
+    add_sim_pair(chain, factory, token_b, token_c, [depth, depth])
+    add_sim_pair(chain, s_factory, token_b, token_c, [depth, depth * 110 // 100])
+    add_sim_pair(chain, factory, base_token, token_c, [depth, depth * 102 // 100])
+    graph = build_pool_graph(
+        get_graph_pools(chain), {xch: FEES[xch] for xch in ["biswap", "pancakeswap"]}
+    )
+
+    # the best path into c in 3 hops is base -> c -> b -> c, which can't be closed, so with one path per token
+    # the profitable cycle through a is missed
+    cycle = [base_token, token_a, token_b, token_c, base_token]
+    paths = [c["path"] for c in find_cycles(graph, base_token, 4, paths_per_token=1)]
+    assert cycle not in paths
+    paths = [c["path"] for c in find_cycles(graph, base_token, 4, paths_per_token=2)]
+    assert cycle in paths
@@ -1,6 +1,22 @@
 from time import time, sleep
-from components import scan_by_name, load_config, scan_by_ID, blind_scan
-from multiprocessing.dummy import freeze_support
+import asyncio
+from components import (
+    scan_by_name,
+    load_config,
+    get_web3,
+    scan_by_ID,
+    blind_scan,
+    triangular_scan,
+    print_rpc_stats,
+    BLIND_COL_LIST,
+)
+from sinks import open_sink, close_sink
+from checkpoint import open_checkpoints, load_checkpoint, clear_checkpoint
+from async_components import async_scan_by_name, async_scan_by_ID, async_blind_scan
+from metrics import start_metrics, export_metrics
+from profiler import start_profiling, print_profile_summary
+from scheduler import make_scheduler, start_round
+from multiprocessing import freeze_support
 
 
 # function to scan exchanges for a potential trade using one of three methods
@@ -15,13 +31,45 @@ def scan_exchanges():
         "pancakeswap",
     ]  # ["sushiswapB", "pancakeswap"]
     SCANBY = "blind"
+    # seconds between sweeps of every pool, with the scheduler turned on in config.json the sync name and blind
+    # scans read the pools that are due at every new block instead
     NAP = 300
+    # set to True to use the async scanners, the number of requests in flight is set in config.json
+    ASYNC = False
+    # set to True to carry on from the last checkpoint of an interrupted blind scan
+    RESUME = False
 
     config = load_config()
+    # serve or write the rpc and scan metrics as set in config.json
+    start_metrics(config[BLOCKCHAIN]["metrics"])
+    # time the phases of every scan cycle and profile a chosen cycle as set in config.json
+    start_profiling(config[BLOCKCHAIN]["profiling"])
     PAIR_NAMES = config[BLOCKCHAIN][EXCHANGES]["selected_names"]
     SELECTED_IDS = config[BLOCKCHAIN][EXCHANGES]["selected_ids"]
+    SCHEDULE = config[BLOCKCHAIN]["scheduler"]
 
-    if SCANBY == "name":
+    if SCANBY == "name" and ASYNC:
+        asyncio.run(
+            async_scan_by_name(
+                pair_names=PAIR_NAMES,
+                xch_names=EXCHANGE_NAMES,
+                blockchain=BLOCKCHAIN,
+                base_token=BASE_TOKEN,
+            )
+        )
+
+    elif SCANBY == "name" and SCHEDULE["enabled"]:
+        # a pair costs a getReserves, token0 and token1 call on every exchange
+        scan_by_name(
+            pair_names=PAIR_NAMES,
+            xch_names=EXCHANGE_NAMES,
+            blockchain=BLOCKCHAIN,
+            base_token=BASE_TOKEN,
+            hour=SCHEDULE["rounds"],
+            scheduler=make_scheduler(SCHEDULE, 3 * len(EXCHANGE_NAMES)),
+        )
+
+    elif SCANBY == "name":
         scan_by_name(
             pair_names=PAIR_NAMES,
             xch_names=EXCHANGE_NAMES,
@@ -29,6 +77,18 @@ def scan_exchanges():
             base_token=BASE_TOKEN,
         )
 
+    elif SCANBY == "id" and ASYNC:
+        asyncio.run(
+            async_scan_by_ID(
+                primary_dex=EXCHANGE_NAMES[0],
+                secondary_dex=EXCHANGE_NAMES[1],
+                blockchain=BLOCKCHAIN,
+                selected_ids=SELECTED_IDS,
+                save_name="./Outputs/binance_pairs.xlsx",
+                base_token=BASETOKEN,
+            )
+        )
+
     elif SCANBY == "id":
         scan_by_ID(
             primary_dex=EXCHANGE_NAMES[0],
@@ -39,18 +99,77 @@ def scan_exchanges():
             base_token=BASETOKEN,
         )
 
+    elif SCANBY == "triangular":
+        # search every pool of these dexes for cycles through the base token, the hop count is set in config.json
+        triangular_scan(
+            blockchain=BLOCKCHAIN,
+            dex_names=["sushiswapB", "pancakeswap", "biswap", "mdex", "apeswap"],
+            save_name="./Outputs/binance_cycles.xlsx",
+            base_token=BASETOKEN,
+        )
+
     else:
-        for i in range(100):
-            blind_scan(
-                primary_dex=EXCHANGE_NAMES[0],
-                secondary_dex=EXCHANGE_NAMES[1],
-                blockchain=BLOCKCHAIN,
-                save_name="./Outputs/binance_pairs.xlsx",
-                base_token=BASETOKEN,
-                small_cap_threshold=SMALL_CAP_THRESHOLD,
-                exchange=EXCHANGE_NAMES,
-            )
-            sleep(NAP)
+        # pick up from the cycle the last run stopped in, the chunks it finished are skipped by blind_scan
+        conn = open_checkpoints(config[BLOCKCHAIN]["checkpoints"]["file"])
+        scan = "blind_scan:" + EXCHANGE_NAMES[1]
+        checkpoint = load_checkpoint(conn, scan, EXCHANGE_NAMES[0])
+        start_cycle = 0
+        if RESUME and checkpoint != None:
+            start_cycle = checkpoint[0]
+
+        # keep the hits of every cycle in one sink instead of starting a new file each cycle
+        sink = open_sink(
+            "./Outputs/binance_pairs.xlsx",
+            BLIND_COL_LIST,
+            config[BLOCKCHAIN]["sink"],
+            append=RESUME,
+        )
+        # a pool costs a getReserves call on both exchanges
+        scheduler = None
+        cycles = 100
+        if SCHEDULE["enabled"] and ASYNC == False:
+            scheduler = make_scheduler(SCHEDULE, 2)
+            cycles = SCHEDULE["rounds"]
+        for i in range(start_cycle, cycles):
+            if scheduler != None:
+                start_round(scheduler, get_web3(BLOCKCHAIN))
+            if ASYNC:
+                asyncio.run(
+                    async_blind_scan(
+                        primary_dex=EXCHANGE_NAMES[0],
+                        secondary_dex=EXCHANGE_NAMES[1],
+                        blockchain=BLOCKCHAIN,
+                        save_name="./Outputs/binance_pairs.xlsx",
+                        base_token=BASETOKEN,
+                        small_cap_threshold=SMALL_CAP_THRESHOLD,
+                        exchange=EXCHANGE_NAMES,
+                        sink=sink,
+                    )
+                )
+            else:
+                blind_scan(
+                    primary_dex=EXCHANGE_NAMES[0],
+                    secondary_dex=EXCHANGE_NAMES[1],
+                    blockchain=BLOCKCHAIN,
+                    save_name="./Outputs/binance_pairs.xlsx",
+                    base_token=BASETOKEN,
+                    small_cap_threshold=SMALL_CAP_THRESHOLD,
+                    exchange=EXCHANGE_NAMES,
+                    sink=sink,
+                    resume=RESUME,
+                    cycle=i,
+                    scheduler=scheduler,
+                )
+            if scheduler == None:
+                sleep(NAP)
+        close_sink(sink)
+        clear_checkpoint(conn, scan, EXCHANGE_NAMES[0])
+        conn.close()
+
+    # calls, retries and errors by class against the rpc endpoint during the scan
+    print_rpc_stats(BLOCKCHAIN)
+    export_metrics()
+    print_profile_summary()
 
 
 def main():
@@ -0,0 +1,110 @@
+# import modules to interact with the os and work with sqlite
+import os, sqlite3
+
+# minimal erc20 abi - only decimals and symbol are needed to describe a token
+# every token has the same functions so there is no need to download the abi of each token
+ERC20_ABI = [
+    {
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"internalType": "uint8", "name": "", "type": "uint8"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"internalType": "string", "name": "", "type": "string"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# some older tokens e.g. MKR return their symbol as bytes32 instead of a string
+ERC20_BYTES32_ABI = [
+    {
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"internalType": "bytes32", "name": "", "type": "bytes32"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# tokens whose decimals can't be read are assumed to have 18 like most tokens
+DEFAULT_DECIMALS = 18
+
+# sqlite limits the number of values in a query so addresses are looked up in chunks
+LOOKUP_CHUNK = 500
+
+
+# function to open the token cache and create the table the first time
+def open_token_cache(file_path):
+    # make sure the folder for the database exists
+    folder = os.path.dirname(file_path)
+    if folder != "" and os.path.exists(folder) == False:
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(file_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tokens (
+            chain TEXT NOT NULL,
+            address TEXT NOT NULL,
+            decimals INTEGER NOT NULL,
+            symbol TEXT,
+            PRIMARY KEY (chain, address)
+        )
+        """)
+    conn.commit()
+    return conn
+
+
+# load the stored tokens of a chain as a dictionary of address -> {"decimals": ..., "symbol": ...}
+# only the given addresses are loaded, tokens that aren't stored are left out
+def load_tokens(conn, chain, addresses):
+    addresses = list(addresses)
+    tokens = {}
+    for i in range(0, len(addresses), LOOKUP_CHUNK):
+        chunk = addresses[i : i + LOOKUP_CHUNK]
+        rows = conn.execute(
+            "SELECT address, decimals, symbol FROM tokens WHERE chain = ? AND address IN ("
+            + ", ".join("?" * len(chunk))
+            + ")",
+            [chain] + chunk,
+        ).fetchall()
+        for row in rows:
+            tokens[row[0]] = {"decimals": row[1], "symbol": row[2]}
+    return tokens
+
+
+# store tokens in the format returned by load_tokens
+def store_tokens(conn, chain, tokens):
+    conn.executemany(
+        "INSERT OR REPLACE INTO tokens (chain, address, decimals, symbol) VALUES (?, ?, ?, ?)",
+        [
+            (chain, address, token["decimals"], token["symbol"])
+            for address, token in tokens.items()
+        ],
+    )
+    conn.commit()
+
+
+# turn a bytes32 symbol into a string, the unused bytes are zero
+def decode_bytes32_symbol(value):
+    return value.rstrip(b"\x00").decode("utf-8", errors="ignore")
+
+
+# build a token from the (success, value) results of its decimals and symbol calls
+# tokens without readable decimals are not returned so they can be tried again later
+def read_token(decimals_result, symbol_result, bytes32_symbol_result=None):
+    decimals_success, decimals = decimals_result
+    if decimals_success == False:
+        return None
+
+    symbol_success, symbol = symbol_result
+    if symbol_success == False:
+        symbol = None
+        if bytes32_symbol_result != None and bytes32_symbol_result[0] == True:
+            symbol = decode_bytes32_symbol(bytes32_symbol_result[1])
+
+    return {"decimals": decimals, "symbol": symbol}
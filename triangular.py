@@ -0,0 +1,196 @@
+# import numpy to relax every edge of the pool graph at once
+import numpy as np
+
+# import the integer swap maths so cycles are checked with the same amounts the router would give
+from quotes import get_amount_out
+
+
+# a pool with a token that isn't in any other pool can't be part of a cycle
+# drop those pools again and again until every token left is in at least two pools
+def prune_leaf_pools(pools):
+    while True:
+        degree = {}
+        for pool in pools:
+            degree[pool["token0"]] = degree.get(pool["token0"], 0) + 1
+            degree[pool["token1"]] = degree.get(pool["token1"], 0) + 1
+        kept = [p for p in pools if degree[p["token0"]] > 1 and degree[p["token1"]] > 1]
+        if len(kept) == len(pools):
+            return kept
+        pools = kept
+
+
+# weight of a swap edge is minus the log of the fee adjusted marginal price
+# a cycle with a negative total weight gives back more than it takes at the margin
+# pools with empty reserves get an infinite weight so they are never used
+def get_edge_weights(reserve_in, reserve_out, fee_ratio):
+    weights = np.full(len(reserve_in), np.inf)
+    valid = (reserve_in > 0) & (reserve_out > 0)
+    weights[valid] = -(
+        np.log(fee_ratio[valid])
+        + np.log(reserve_out[valid])
+        - np.log(reserve_in[valid])
+    )
+    return weights
+
+
+# build a directed token graph from pools on any number of dexes
+# pools need a dex, pool_address, token0, token1 and reserves, fees is a dictionary of dex -> (numerator, denominator)
+# every pool gives two edges, edge 2 * i sells token0 into pool i and edge 2 * i + 1 sells token1
+def build_pool_graph(pools, fees):
+    tokens = list(
+        dict.fromkeys([p["token0"] for p in pools] + [p["token1"] for p in pools])
+    )
+    token_ids = {token: i for i, token in enumerate(tokens)}
+    token0_ids = np.array([token_ids[p["token0"]] for p in pools], dtype=np.int64)
+    token1_ids = np.array([token_ids[p["token1"]] for p in pools], dtype=np.int64)
+
+    graph = {
+        "pools": pools,
+        "fees": fees,
+        "tokens": tokens,
+        "token_ids": token_ids,
+        "pool_ids": {p["pool_address"]: i for i, p in enumerate(pools)},
+        "src": np.stack([token0_ids, token1_ids], axis=1).reshape(-1),
+        "dst": np.stack([token1_ids, token0_ids], axis=1).reshape(-1),
+        "fee_ratio": np.repeat(
+            [fees[p["dex"]][0] / fees[p["dex"]][1] for p in pools], 2
+        ).astype(float),
+        "weight": np.full(2 * len(pools), np.inf),
+    }
+    update_graph_reserves(graph, [p["pool_address"] for p in pools])
+    return graph
+
+
+# recompute the edge weights of pools whose reserves changed, every other edge is left alone
+def update_graph_reserves(graph, pool_addresses, reserves_by_address=None):
+    pool_ids = []
+    for address in pool_addresses:
+        if address not in graph["pool_ids"]:
+            continue
+        pool = graph["pools"][graph["pool_ids"][address]]
+        if reserves_by_address != None:
+            pool["reserves"] = reserves_by_address[address]
+        pool_ids.append(graph["pool_ids"][address])
+    if len(pool_ids) == 0:
+        return
+
+    pool_ids = np.array(pool_ids, dtype=np.int64)
+    # floats are fine here, the exact amounts are worked out in quote_cycle
+    reserve0 = np.array(
+        [float((graph["pools"][i]["reserves"] or [0, 0])[0]) for i in pool_ids]
+    )
+    reserve1 = np.array(
+        [float((graph["pools"][i]["reserves"] or [0, 0])[1]) for i in pool_ids]
+    )
+    graph["weight"][2 * pool_ids] = get_edge_weights(
+        reserve0, reserve1, graph["fee_ratio"][2 * pool_ids]
+    )
+    graph["weight"][2 * pool_ids + 1] = get_edge_weights(
+        reserve1, reserve0, graph["fee_ratio"][2 * pool_ids + 1]
+    )
+
+
+# walk the predecessor edges back from a path into a node to the start token
+# a path is an edge and the slot of the path it extends, predecessors holds the (edge, slot) of every kept path
+def trace_path(graph, predecessors, last_edge, slot):
+    edges = [last_edge]
+    node = graph["src"][last_edge]
+    for pred_edge, pred_slot in reversed(predecessors):
+        edge, slot = pred_edge[node, slot], pred_slot[node, slot]
+        edges.append(edge)
+        node = graph["src"][edge]
+    return edges[::-1]
+
+
+# find cycles that start and end at a token and have a negative total weight, up to max_hops swaps
+# this is a bellman ford relaxation over hop layers, each layer keeps the paths_per_token best paths into every
+# token and every edge back into the start token from each kept path is checked, so several cycles can be found
+# per layer
+# it isn't a full search, a cycle is missed when its path into one of its tokens isn't among the best
+# paths_per_token paths into that token at that hop e.g. when better paths loop through a profitable pair of
+# pools and are dropped later for using a token twice, more paths per token find more of these cycles
+def find_cycles(graph, start_token, max_hops, min_rate=1.0, paths_per_token=4):
+    start = graph["token_ids"][start_token]
+    src = graph["src"]
+    dst = graph["dst"]
+    weight = graph["weight"]
+    n_tokens = len(graph["tokens"])
+    k = paths_per_token
+    max_weight = -np.log(min_rate)
+
+    # dist holds the weight of the kept paths into every token, one path per slot
+    dist = np.full((n_tokens, k), np.inf)
+    dist[start, 0] = 0.0
+    predecessors = []
+    cycles = []
+    for hop in range(1, max_hops + 1):
+        candidate = dist[src] + weight[:, None]
+
+        # close the cycle back into the start token from every path kept so far
+        if hop > 1:
+            edges, slots = np.nonzero(
+                (dst == start)[:, None] & (candidate < max_weight)
+            )
+            for c in np.argsort(candidate[edges, slots]):
+                path = trace_path(graph, predecessors, edges[c], slots[c])
+                cycle = get_cycle(graph, path, candidate[edges[c], slots[c]])
+                if cycle != None:
+                    cycles.append(cycle)
+
+        if hop == max_hops:
+            break
+
+        # best paths into every token with one more hop, sorted by token and weight and ranked within a token
+        flat = candidate.reshape(-1)
+        found = np.nonzero(np.isfinite(flat))[0]
+        into = dst[found // k]
+        found = found[np.lexsort((flat[found], into))]
+        into = dst[found // k]
+        rank = np.arange(len(found)) - np.searchsorted(into, into)
+        kept = rank < k
+        found, into, rank = found[kept], into[kept], rank[kept]
+
+        new_dist = np.full((n_tokens, k), np.inf)
+        pred_edge = np.full((n_tokens, k), -1, dtype=np.int64)
+        pred_slot = np.full((n_tokens, k), -1, dtype=np.int64)
+        new_dist[into, rank] = flat[found]
+        pred_edge[into, rank] = found // k
+        pred_slot[into, rank] = found % k
+        # paths only touch the start token at both ends
+        new_dist[start] = np.inf
+        predecessors.append((pred_edge, pred_slot))
+        dist = new_dist
+
+    return cycles
+
+
+# turn a list of edges into a cycle, paths that use a token or a pool twice are dropped
+def get_cycle(graph, edges, total_weight):
+    pool_ids = [int(edge // 2) for edge in edges]
+    path = [int(graph["src"][edge]) for edge in edges]
+    if len(set(pool_ids)) != len(pool_ids) or len(set(path)) != len(path):
+        return None
+    return {
+        "path": [graph["tokens"][i] for i in path] + [graph["tokens"][path[0]]],
+        "pools": [graph["pools"][i]["pool_address"] for i in pool_ids],
+        "dexes": [graph["pools"][i]["dex"] for i in pool_ids],
+        "edges": [int(edge) for edge in edges],
+        "rate": float(np.exp(-total_weight)),
+    }
+
+
+# work out the exact amounts along a cycle with the integer maths of the router
+def quote_cycle(graph, cycle, amount_in):
+    amounts = [amount_in]
+    for edge in cycle["edges"]:
+        pool = graph["pools"][edge // 2]
+        reserves = pool["reserves"]
+        reserve_in, reserve_out = (
+            (reserves[0], reserves[1]) if edge % 2 == 0 else (reserves[1], reserves[0])
+        )
+        amounts.append(
+            get_amount_out(
+                amounts[-1], reserve_in, reserve_out, graph["fees"][pool["dex"]]
+            )
+        )
+    return amounts
@@ -5,10 +5,106 @@ import json
 config = {
     "binance": {
         "abi_api": "https://api.bscscan.com/api",
-        "network": {"mainnet": "https://bsc-dataseed.binance.org/"},
+        "abi_fetcher": {"rate": 5, "burst": 5, "workers": 5},
+        "network": {
+            "mainnet": "https://bsc-dataseed.binance.org/",
+            "endpoints": [
+                "https://bsc-dataseed.binance.org/",
+                "https://bsc-dataseed1.defibit.io/",
+                "https://bsc-dataseed1.ninicoin.io/",
+            ],
+            "pool_size": 20,
+            "hedge_after": 0.5,
+            "eject_after": 3,
+            "eject_for": 30,
+        },
+        "gas_allowance": 0.00166,
+        "pair_registry": "./Outputs/pair_registry.db",
+        "token_cache": "./Outputs/token_cache.db",
+        "async": {"max_in_flight": 32},
+        "rpc": {
+            "rate": 50,
+            "burst": 50,
+            "initial_concurrency": 8,
+            "min_concurrency": 1,
+            "max_concurrency": 32,
+            "increase": 1,
+            "decrease": 0.5,
+            "cooldown": 1,
+            "max_retries": 5,
+            "backoff_base": 0.25,
+            "backoff_cap": 8,
+            "timeout": 10,
+        },
+        "multicall": {
+            "address": "0xcA11bde05977b3631167028862bE2a173976CA11",
+            "batch_size": 500,
+        },
+        "reserve_tracker": {
+            "confirmations": 15,
+            "max_block_range": 2000,
+            "address_chunk": 500,
+            "poll_interval": 3,
+        },
+        "discovery": {
+            "enabled": True,
+            "confirmations": 15,
+            "max_block_range": 2000,
+            "max_catch_up": 20000,
+        },
+        "triangular": {"max_hops": 3, "paths_per_token": 4},
+        "sharding": {"processes": 4, "shard_size": 20000},
+        "history": {
+            "folder": "./Outputs/history",
+            "retention_days": 30,
+            "excel_report": "./Outputs/scanned_pairs_results.xlsx",
+        },
+        "sink": {
+            "format": "jsonl",
+            "batch_size": 100,
+            "flush_interval": 5,
+            "excel_export": True,
+        },
+        "checkpoints": {"file": "./Outputs/checkpoints.db", "chunk_size": 2000},
+        "metrics": {"port": None, "file": "./Outputs/metrics.prom"},
+        "pipeline": {"prefetch": 1},
+        "scheduler": {
+            "enabled": False,
+            "call_budget": 6000,
+            "every": {"hot": 1, "warm": 10, "cold": 100},
+            "hot_blocks": 20,
+            "cold_blocks": 2000,
+            "min_liquidity": 1,
+            "window": 20,
+            "rounds": 10000,
+            "poll_interval": 1,
+        },
+        "benchmark": {
+            "dexes": ["biswap", "pancakeswap"],
+            "base_symbol": "wbnb",
+            "pools": 2000,
+            "overlap": 0.6,
+            "latency": 0.02,
+            "block_time": 0.5,
+            "updates_per_block": 20,
+            "cycles": 5,
+            "name_pairs": 20,
+            "folder": "./Outputs/benchmark",
+            "results": "./Outputs/benchmark_results.jsonl",
+            "tolerance": 0.1,
+        },
+        "profiling": {
+            "enabled": False,
+            "profile_scan": None,
+            "profile_cycle": None,
+            "profiler": "cprofile",
+            "sample_interval": 0.005,
+            "folder": "./Outputs/profiles",
+        },
         "sushiswapB": {
             "sushiswapB_factory": "0xc35DADB65012eC5796536bD9864eD8773aBc74C4",
             "sushiswapB_router": "0x1b02dA8Cb0d097eB8D57A175b88c7D8b47997506",
+            "fee": [997, 1000],
             "pool_pairs": {
                 "sushi_wbnb": "0x96337674D5545f357BA353aAa6312d614DcF20cC",
                 "tet_czr": "0x047C4afFbbD55524342447f84DfC63568AE84778",
@@ -23,6 +119,7 @@ config = {
         "pancakeswap": {
             "pancakeswap_factory": "0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73",
             "pancakeswap_router": "0x10ED43C718714eb63d5aA57B78B54704E256024E",
+            "fee": [9975, 10000],
             "pool_pairs": {
                 "sushi_wbnb": "0x7fbD09099838dD0b70068f07a9021d69d9b4813a",
                 "tet_czr": "0x7025D47Bf333316aCCdD6EB83658D3ef594958f4",
@@ -43,6 +140,7 @@ config = {
         "biswap": {
             "biswap_factory": "0x858E3312ed3A876947EA49d572A7C42DE08af7EE",
             "biswap_router": "0x3a6d8cA21D1CF76F653A67577FA0D27453350dD8",
+            "fee": [999, 1000],
             "pool_pairs": {
                 "wbnb_bin": "0x7BF229D3E50E2E64f2fb16309291B7e83280808D",
                 "safemoon_wbnb": "0x3668Ca2009aF4c0a4a9e258EF69eAD1FabbfB7da",
@@ -55,11 +153,13 @@ config = {
         "apeswap": {
             "apeswap_factory": "0x0841BD0B734E4F5853f0dD8d7Ea041c241fb0Da6",
             "apeswap_router": "0xcF0feBd3f17CEf5b47b0cD257aCf6025c5BFf3b7",
+            "fee": [998, 1000],
             "pool_pairs": {},
         },
         "mdex": {
             "mdex_factory": "0x3CD1C46068dAEa5Ebb0d3f55F6915B10648062B8",
             "mdex_router": "0x7DAe51BD3E3376B8c7c4900E9107f12Be3AF1bA8",
+            "fee": [9970, 10000],
             "pool_pairs": {},
         },
         "sushi": 18,